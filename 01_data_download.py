@@ -1,6 +1,7 @@
-import yfinance as yf
-import pandas as pd
+import argparse
 from datetime import datetime, timedelta
+from bar_store import BarStore, PartitionedBarStore
+from downloader import YahooProvider, LocalFileProvider, SyntheticProvider, download_symbols
 
 # Define target symbols
 #microsoft, tesla, palantir
@@ -9,18 +10,51 @@ symbols = ["TSLA", "MSFT", "PLTR"]
 end_date = datetime.today()
 start_date = end_date - timedelta(days=5 * 365)
 
-# Download and resample data
-data = {}
+parser = argparse.ArgumentParser(description="Download bars into the bar store")
+parser.add_argument('--provider', choices=['yahoo', 'local', 'synthetic'], default='yahoo')
+parser.add_argument('--source-dir', default='data', help="directory read by the local provider")
+parser.add_argument('--workers', type=int, default=4)
+parser.add_argument('--retries', type=int, default=3)
+parser.add_argument('--interval', default='1D',
+                    help="bar interval; intraday intervals (e.g. 1m, 5m, 1h) go to the partitioned store")
+parser.add_argument('--synthetic-bars', type=int, default=1260, help="bars per symbol for the synthetic provider")
+args = parser.parse_args()
+intraday = args.interval != '1D'
+
+if args.provider == 'local':
+    provider = LocalFileProvider(args.source_dir)
+elif args.provider == 'synthetic':
+    provider = SyntheticProvider(start=start_date.strftime('%Y-%m-%d'), n_bars=args.synthetic_bars)
+else:
+    provider = YahooProvider()
+
+# Intraday bars are kept in monthly partitions, read back one at a time
+store = PartitionedBarStore() if intraday else BarStore()
+
+# Only fetch bars newer than what is already stored for each symbol
+starts = {}
 for symbol in symbols:
-    df = yf.download(symbol, start=start_date.strftime('%Y-%m-%d'), interval="1D", progress=False)
-    df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
-    df.dropna(inplace=True)
-    data[symbol] = df
-
-# Save to disk or cache for next steps
-import os
-os.makedirs("data", exist_ok=True)
-for symbol, df in data.items():
-    df.to_csv(f"data/{symbol}_1D.csv")
+    last = store.last_timestamp(symbol, args.interval)
+    # Intraday refreshes refetch the last stored day; append() drops the bars already stored
+    if last is None:
+        fetch_start = start_date
+    else:
+        fetch_start = last if intraday else last + timedelta(days=1)
+    if fetch_start.date() > end_date.date():
+        print(f"{symbol} is up to date.")
+        continue
+    starts[symbol] = fetch_start.strftime('%Y-%m-%d')
+
+data, failures = download_symbols(provider, list(starts), starts, interval=args.interval,
+                                  max_workers=args.workers, retries=args.retries)
+
+for symbol in starts:
+    if symbol in failures:
+        print(f"Download failed for {symbol}: {failures[symbol]}")
+    elif symbol not in data:
+        print(f"No new bars for {symbol}.")
+    else:
+        added = store.append(symbol, data[symbol], args.interval)
+        print(f"{symbol}: appended {added} bars.")
 
 print("Data download complete.")
@@ -1,190 +1,200 @@
-import backtrader as bt
+import argparse
 import pandas as pd
 import os
 import strategy_logic
 from performance_metrics import calculate_backtest_metrics
-from plotly_visualization import create_backtest_dashboard
-from export_to_excel import export_trades_and_dashboard_to_excel
 from calculate_indicators import params
+from bar_store import BarStore
+from backtest_runner import BROKER_SETTINGS, run_parallel
+from portfolio import run_portfolio
+from reporting import build_reports
+from instrumentation import Instrumentation, capture, span
+from checkpoint import SHARD_DIR, ShardedRun
+from result_cache import CACHE_DIR, MAX_BYTES, ResultCache
+from memmap_feed import MEMMAP_DIR, write_memmap_bars
+import strategy_logging
 
 # einstieg macd donchian
 
-class TradeLogger(bt.Analyzer):
-    def __init__(self):
-        self.trades = []
-        self.trade_ids = set()
-        
-    def notify_trade(self, trade):
-        current_dt = self._convert_datetime(trade.data, trade.data.datetime[0])
-        trade_id = trade.ref or id(trade)
-        
-        if trade_id not in self.trade_ids:
-            self._create_trade(trade, trade_id, current_dt)
-            self.trade_ids.add(trade_id)
-        else:
-            self._update_trade(trade, trade_id, current_dt)
-
-    def _create_trade(self, trade, trade_id, dt):
-        self.trades.append({
-            'trade_id': trade_id,
-            'symbol': trade.data._name,
-            'entry_time': dt,
-            'exit_time': pd.NaT,
-            'entry_price': trade.price,
-            'exit_price': None,
-            'size': trade.size,
-            'status': 'open',
-            'pnl': 0,
-            'pnlcomm': 0,
-            'duration': 0  # Initialize duration
-        })
-
-    def _update_trade(self, trade, trade_id, dt):
-        for t in reversed(self.trades):
-            if t['trade_id'] == trade_id:
-                # Update exit information
-                is_closed = trade.isclosed
-                t.update({
-                    'exit_time': self._convert_datetime(trade.data, trade.dtclose) if is_closed else dt,
-                    'exit_price': trade.price if is_closed else None,
-                    'status': 'closed' if is_closed else 'open',
-                    'pnl': trade.pnl,
-                    'pnlcomm': trade.pnlcomm
-                })
-                
-                # Calculate duration when trade closes
-                if is_closed:
-                    entry = t['entry_time']
-                    exit = t['exit_time']
-                    if pd.notnull(entry) and pd.notnull(exit):
-                        t['duration'] = (exit - entry).total_seconds() / (3600 * 24) #in days
-                    else:
-                        t['duration'] = 0
-                break
-
-    def _convert_datetime(self, data, dt):
-        try:
-            return data.num2date(int(dt)).replace(tzinfo=None)
-        except:
-            return pd.NaT
-
-    def get_analysis(self):
-        return pd.DataFrame(self.trades)
-    
-
-
-
 # Run backtest for each stock
 
-# Load preprocessed indicator data
-data_dir = "data"
-data = {}
-for file in os.listdir(data_dir):
-    if file.endswith("_1D_indicators.csv"):
-        symbol = file.split("_")[0]
-        df = pd.read_csv(os.path.join(data_dir, file), index_col=0, parse_dates=True)
-        # Fix column names and filter
+def load_data(store, instrumentation=None):
+    # Load preprocessed indicator data
+    data = {}
+    for symbol in store.symbols('1D_indicators'):
+        with span(instrumentation, 'load', symbol=symbol):
+            df = store.read(symbol, '1D_indicators', columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        # Fix column names
         df = df.rename(columns={
             'Open': 'open',
             'High': 'high',
             'Low': 'low',
             'Close': 'close',
             'Volume': 'volume'
-        })[['open', 'high', 'low', 'close', 'volume']]  # Keep only essential columns
+        })
         data[symbol] = df
-
-results = []
-number_of_stocks = len(data)
-number_of_errors = 0
-for symbol, df in data.items():
-    cerebro = bt.Cerebro()
-    cerebro.broker.setcash(100000)
-    cerebro.broker.set_shortcash(False)  # Required for proper trade history
-    cerebro.broker.setcommission(commission=0.001)  
-    cerebro.broker.set_eosbar(False)  # Don't close trades at end of day
-    cerebro.broker.set_coo(True)  # Enable Cheat-On-Open for better execution prices
-    cerebro.broker.set_coc(True)
-
-
-    # Add closing timer
-    cerebro.add_timer(
-        when=bt.Timer.SESSION_END,
-        timername='force_close',
-        monthdays=[1],  # Force close on 1st of each month
-        callback=lambda self: self.close() if self.position else None
-    )
-
-
-    data_feed = bt.feeds.PandasData(
-        dataname=df,
-        datetime=None,  # Use index as datetime
-        open=0,  # Adjust column indices based on your CSV structure
-        high=1,
-        low=2,
-        close=3,
-        volume=4,
-        openinterest=-1
-    )
-    data_feed._name = symbol  # Sets data name for tracking
-    cerebro.adddata(data_feed)
-
-    # Use params to configure strategy
-    cerebro.addstrategy(strategy_logic.EMAMACDStrategy)
-    #cerebro.addstrategy(strategy_logic.EMAFILTERCROSS)
-    cerebro.addanalyzer(TradeLogger, _name='trade_logger')
-
-
-    print(f"Running backtest for {symbol}...")
-    strat_results = cerebro.run()
-    
-    trades_df = strat_results[0].analyzers.trade_logger.get_analysis()
-
-    if not trades_df.empty:  # Check if results exist
-        trades_df['symbol'] = symbol
-        results.append(trades_df)
-        metrics = calculate_backtest_metrics(trades_df)
-        # Generate dashboard
-        dashboard = create_backtest_dashboard(
-            trades_df, df,
-            metrics,
-            symbol=symbol
-        )
-        # Save dashboard HTML
-        if not os.path.exists("backtest_results"):
-            os.mkdir("backtest_results") 
-        dashboard_html_path = os.path.join("backtest_results", f"backtest_{symbol}.html")
-        dashboard.write_html(dashboard_html_path)
-        
-        dashboard.show()
-
-        # Export trades and dashboard link to Excel
-        excel_path = f"./backtest_results/backtest_{symbol}_report.xlsx"
-        with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-            trades_df.to_excel(writer, sheet_name='Trades', index=False)
-            workbook = writer.book
-            worksheet = workbook.add_worksheet('Dashboard')
-            # Insert hyperlink to dashboard HTML file
-            worksheet.write_url('A1', f'file://{os.path.abspath(dashboard_html_path)}', string='Open Dashboard HTML')
-
+    return data
+
+
+def run_portfolio_mode(data, fraction, max_positions, instrumentation=None):
+    # All symbols in one Cerebro sharing one broker
+    print(f"Running portfolio backtest over {len(data)} symbols...")
+    trades = run_portfolio(data, strategy=strategy_logic.EMAMACDStrategy,
+                           fraction=fraction, max_positions=max_positions, instrumentation=instrumentation)
+    if trades.empty:
+        return [], len(data)
+
+    # Portfolio equity follows the order in which trades are closed
+    portfolio_trades = trades.sort_values('exit_time', kind='stable', ignore_index=True)
+    with span(instrumentation, 'metrics'):
+        metrics = calculate_backtest_metrics(portfolio_trades, initial_capital=BROKER_SETTINGS['cash'])
+    print(f"Portfolio: {metrics}")
+
+    results = [trades_df.reset_index(drop=True) for _, trades_df in trades.groupby('symbol', sort=False)]
+    return results, len(data) - len(results)
+
+
+def run_isolated_mode(data, shards, workers, timeout, instrumentation=None, log_level=strategy_logging.INFO,
+                      log_sink=None, cache_root=None, memmap_root=None):
+    # One Cerebro per symbol, each with its own cash; every result is saved
+    # to its shard as soon as it arrives
+    pending, digests = shards.pending(data)
+    if len(pending) < len(data):
+        print(f"Resuming: {len(data) - len(pending)} symbols already finished")
+    if memmap_root is not None and pending:
+        # Workers map the bars from here instead of each receiving a pickled frame
+        with span(instrumentation, 'memmap', symbols=len(pending)):
+            write_memmap_bars(pending, memmap_root)
+    print(f"Running backtests for {len(pending)} symbols on {workers} workers...")
+    cached = 0
+    for result in run_parallel(pending, strategy=strategy_logic.EMAMACDStrategy, max_workers=workers,
+                               timeout=timeout, instrument=instrumentation is not None, log_level=log_level,
+                               cache_root=cache_root, memmap_root=memmap_root):
+        symbol = result['symbol']
+        cached += result['cached']
+        if result['profile'] is not None:
+            instrumentation.merge(result['profile'])
+        # Each symbol's strategy log arrives whole, so workers never interleave
+        if result['log']:
+            lines = [f"[{symbol}] {line}" for line in result['log']]
+            if log_sink is not None:
+                log_sink.write_lines(lines)
+            else:
+                print("\n".join(lines))
+        entry = shards.record(result, digests[symbol])
+        metrics = result['metrics']
+
+        if entry['status'] == 'failed':
+            print(f"Backtest failed for {symbol}: {result['error']}")
+        elif entry['status'] == 'empty':  # Check if results exist
+            print(f"No results for {symbol}")
+        elif 'Error' in metrics:
+            print(f"{symbol}: {metrics['Error']}")
+    if cache_root is not None:
+        print(f"{cached} of {len(pending)} results taken from the cache")
+    # Symbols finished in an earlier, interrupted run count as well
+    return sum(shards.entries[symbol]['status'] != 'done' for symbol in data)
+
+
+def run(args):
+    instrumentation = Instrumentation() if args.instrument else None
+    data = load_data(BarStore(), instrumentation)
+
+    number_of_stocks = len(data)
+    shards = None
+    if args.portfolio:
+        results, number_of_errors = run_portfolio_mode(data, args.fraction, args.max_positions, instrumentation)
     else:
-        print(f"No results for {symbol}")
-        number_of_errors += 1
-
-if number_of_errors < number_of_stocks:
-    print(f"Backtest completed with {number_of_errors} errors.")
-    # Combine all trades into a single DataFrame
-    all_trades_df = pd.concat(results, ignore_index=True)
-    all_trades_df.to_csv("backtest_trades.csv", index=False)
-    print("Backtest complete and trades logged.")
-
-else:
-    print("All backtests failed. Please check your data and strategy.")
-
-
-
-
-
+        log_level = strategy_logging.LEVELS[args.log_level]
+        log_sink = strategy_logging.BatchedFileSink(args.log_file) if args.log_file else None
+        config = {'strategy': strategy_logic.EMAMACDStrategy.__name__, 'params': params,
+                  'broker_settings': BROKER_SETTINGS}
+        shards = ShardedRun(args.shards, config=config, resume=args.resume)
+        cache_root = None if args.no_cache else args.cache
+        # A single worker runs in this process and needs no shared copy
+        memmap_root = None if args.no_memmap or args.workers == 1 else args.memmap
+        number_of_errors = run_isolated_mode(data, shards, args.workers, args.timeout, instrumentation,
+                                             log_level, log_sink, cache_root, memmap_root)
+        if cache_root is not None:
+            evicted = ResultCache(cache_root).prune(int(args.cache_max_mb * 1024 ** 2))
+            if evicted:
+                print(f"{evicted} least recently used cache entries evicted")
+
+    if number_of_errors < number_of_stocks:
+        print(f"Backtest completed with {number_of_errors} errors.")
+        if shards is not None:
+            # Stream the per-symbol shards into the combined files
+            shards.consolidate("backtest_trades.csv", "backtest_metrics.csv")
+        else:
+            # Combine all trades into a single DataFrame
+            all_trades_df = pd.concat(results, ignore_index=True)
+            all_trades_df.to_csv("backtest_trades.csv", index=False)
+        print("Backtest complete and trades logged.")
 
+        if not args.no_report:
+            # Dashboards and workbooks are rendered headless from the logged trades
+            rendered, skipped = build_reports("backtest_trades.csv", max_workers=args.workers,
+                                              instrumentation=instrumentation)
+            print(f"{rendered} reports rendered, {skipped} unchanged.")
 
+    else:
+        print("All backtests failed. Please check your data and strategy.")
+
+    if instrumentation is not None:
+        print(instrumentation.span_summary().to_string(float_format=lambda v: f"{v:.4f}"))
+        print(instrumentation.latency_summary().to_string(float_format=lambda v: f"{v:.1f}"))
+        instrumentation.write(args.instrument, args.trace_format)
+        print(f"Instrumentation written to {args.instrument}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest every stored symbol")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="backtest processes (1 runs in this process)")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds allowed per symbol")
+    parser.add_argument('--portfolio', action='store_true',
+                        help="trade all symbols in one run with shared cash")
+    parser.add_argument('--fraction', type=float, default=None,
+                        help="portfolio mode: share of portfolio value per position (default: equal weight)")
+    parser.add_argument('--max-positions', type=int, default=None,
+                        help="portfolio mode: cap on open positions")
+    parser.add_argument('--shards', default=SHARD_DIR,
+                        help="directory receiving each symbol's results as it finishes")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip symbols already finished in --shards on the same bars")
+    parser.add_argument('--cache', default=CACHE_DIR,
+                        help="reuse results of unchanged runs from this cache (see result_cache.py)")
+    parser.add_argument('--no-cache', action='store_true', help="always re-simulate every symbol")
+    parser.add_argument('--cache-max-mb', type=float, default=MAX_BYTES / 1024 ** 2,
+                        help="evict least recently used cache entries beyond this size")
+    parser.add_argument('--memmap', default=MEMMAP_DIR,
+                        help="directory the bars are memory-mapped from by the worker processes")
+    parser.add_argument('--no-memmap', action='store_true', help="send each worker its symbol's frame instead")
+    parser.add_argument('--no-report', action='store_true',
+                        help="only log trades; render reports later with reporting.py")
+    parser.add_argument('--log-level', choices=list(strategy_logging.LEVELS), default='info',
+                        help="strategy log level ('off' skips formatting entirely)")
+    parser.add_argument('--log-file', default=None, help="append strategy logs to this file instead of stdout")
+    parser.add_argument('--instrument', metavar='PATH', default=None,
+                        help="write stage timings and callback latencies to PATH")
+    parser.add_argument('--trace-format', choices=['json', 'chrome'], default='json',
+                        help="format of the --instrument output (chrome: chrome://tracing / Perfetto)")
+    parser.add_argument('--capture', choices=['cprofile', 'pyinstrument'], default=None,
+                        help="profile this process (use --workers 1 to include the backtests)")
+    parser.add_argument('--capture-out', default=None,
+                        help="profile output (default: backtest.prof or backtest_profile.html)")
+    args = parser.parse_args()
+    if args.resume and args.portfolio:
+        parser.error("--resume shards isolated runs; a portfolio run is one shared-cash backtest")
+
+    if args.capture:
+        default_out = "backtest.prof" if args.capture == 'cprofile' else "backtest_profile.html"
+        with capture(args.capture, args.capture_out or default_out):
+            run(args)
+        print(f"Profile written to {args.capture_out or default_out}")
+    else:
+        run(args)
 
 
+if __name__ == '__main__':
+    main()
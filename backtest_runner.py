@@ -0,0 +1,219 @@
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import backtrader as bt
+import strategy_logic
+from performance_metrics import calculate_backtest_metrics
+from trade_logger import TradeLogger
+from equity_logger import EquityLogger
+from equity_metrics import equity_metrics
+from precomputed_feed import make_precomputed_feed
+from memmap_feed import MemmapBars, MemmapData
+from instrumentation import Instrumentation, instrument_strategy, span
+from result_cache import ResultCache, result_key
+import strategy_logging
+
+# Cerebro setup shared by the backtest script, the fast simulator's
+# equivalence checks and the parallel per-symbol runner.
+
+BROKER_SETTINGS = dict(
+    cash=100000,
+    commission=0.001,
+    shortcash=False,  # Required for proper trade history
+    eosbar=False,  # Don't close trades at end of day
+    coo=True,  # Enable Cheat-On-Open for better execution prices
+    coc=True,
+)
+
+
+def build_cerebro(broker_settings=BROKER_SETTINGS):
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(broker_settings['cash'])
+    cerebro.broker.set_shortcash(broker_settings['shortcash'])
+    cerebro.broker.setcommission(commission=broker_settings['commission'])
+    cerebro.broker.set_eosbar(broker_settings['eosbar'])
+    cerebro.broker.set_coo(broker_settings['coo'])
+    cerebro.broker.set_coc(broker_settings['coc'])
+
+    # Add closing timer
+    cerebro.add_timer(
+        when=bt.Timer.SESSION_END,
+        timername='force_close',
+        monthdays=[1],  # Force close on 1st of each month
+        callback=lambda self: self.close() if self.position else None
+    )
+    return cerebro
+
+
+def run_backtest(symbol, df, strategy=strategy_logic.EMAMACDStrategy, precomputed=True,
+                 strategy_kwargs=None, broker_settings=BROKER_SETTINGS, indicators=None, equity=False,
+                 instrumentation=None, memmap_root=None):
+    """Run one symbol through Cerebro and return the TradeLogger frame.
+
+    indicators optionally supplies the strategy's precompute() columns
+    (precomputed=True only), e.g. cached over the full history of df.
+    With precomputed=False and a memmap_root, the bars are read by a
+    MemmapData feed from that directory rather than from df.
+    With equity=True returns (trades, EquityLogger arrays) instead.
+    instrumentation, an Instrumentation, receives the stage spans and the
+    strategy's callback latencies.
+    """
+    strategy_kwargs = strategy_kwargs or {}
+    cerebro = build_cerebro(broker_settings)
+    strategy_cls = instrument_strategy(strategy) if instrumentation is not None else strategy
+
+    with span(instrumentation, 'feed', symbol=symbol):
+        if precomputed:
+            # Indicators are precomputed into the feed instead of rebuilt bar by bar
+            data_feed = make_precomputed_feed(df, strategy, name=symbol, indicators=indicators, **strategy_kwargs)
+            cerebro.addstrategy(strategy_cls, precomputed=True, **strategy_kwargs)
+        elif memmap_root is not None:
+            data_feed = MemmapData(root=memmap_root, symbol=symbol)
+            data_feed._name = symbol
+            cerebro.addstrategy(strategy_cls, **strategy_kwargs)
+        else:
+            data_feed = bt.feeds.PandasData(dataname=df, datetime=None, openinterest=-1)
+            data_feed._name = symbol  # Sets data name for tracking
+            cerebro.addstrategy(strategy_cls, **strategy_kwargs)
+    cerebro.adddata(data_feed)
+    cerebro.addanalyzer(TradeLogger, _name='trade_logger')
+    if equity:
+        cerebro.addanalyzer(EquityLogger, _name='equity_logger')
+
+    with span(instrumentation, 'cerebro.run', symbol=symbol):
+        strat_results = cerebro.run()
+    if instrumentation is not None:
+        instrumentation.add_latencies(strat_results[0].latency)
+
+    with span(instrumentation, 'analyzers', symbol=symbol):
+        trades = strat_results[0].analyzers.trade_logger.get_analysis()
+        if equity:
+            return trades, strat_results[0].analyzers.equity_logger.get_analysis()
+    return trades
+
+
+class BacktestTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise BacktestTimeout()
+
+
+def backtest_symbol(symbol, df, strategy=strategy_logic.EMAMACDStrategy, precomputed=True,
+                    strategy_kwargs=None, broker_settings=BROKER_SETTINGS, timeout=None, instrument=False,
+                    log_level=strategy_logging.INFO, cache_root=None, memmap_root=None):
+    """Backtest one symbol and compute its metrics, never raising.
+
+    Returns a picklable dict with the trades frame, the metrics dict, the
+    bar-level equity arrays and their equity_metrics, the error message if
+    the run failed and the elapsed seconds, so it can be sent back from a
+    worker process. With instrument=True, 'profile' holds the run's
+    Instrumentation.to_dict(). The strategy's log lines at log_level and
+    above are captured into 'log' rather than printed.
+
+    With cache_root, the run is first looked up in that ResultCache
+    directory; a hit skips the simulation ('cached' is True and there is no
+    log) and a miss is stored.
+
+    df may be None when memmap_root names a memmap_feed directory holding
+    the symbol; its bars are then read from there.
+    """
+    result = {'symbol': symbol, 'trades': None, 'metrics': None, 'equity': None,
+              'equity_metrics': None, 'error': None, 'profile': None, 'log': [], 'cached': False}
+    instrumentation = Instrumentation() if instrument else None
+    start = time.perf_counter()
+    # SIGALRM interrupts a run that overstays its timeout without killing the
+    # worker process; it is only available on Unix
+    use_alarm = timeout is not None and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        if df is None:
+            with span(instrumentation, 'memmap', symbol=symbol):
+                df = MemmapBars(memmap_root).to_frame(symbol)
+        cache = cached = None
+        if cache_root is not None:
+            with span(instrumentation, 'cache', symbol=symbol):
+                cache = ResultCache(cache_root)
+                key = result_key(symbol, df, strategy, strategy_kwargs, precomputed, broker_settings)
+                cached = cache.get(key)
+        if cached is not None:
+            trades_df, equity = cached['trades'], cached['equity']
+            result['cached'] = True
+        else:
+            with strategy_logging.capture(log_level) as log:
+                try:
+                    trades_df, equity = run_backtest(symbol, df, strategy=strategy, precomputed=precomputed,
+                                                     strategy_kwargs=strategy_kwargs,
+                                                     broker_settings=broker_settings, equity=True,
+                                                     instrumentation=instrumentation, memmap_root=memmap_root)
+                finally:
+                    result['log'] = log.sink.lines()
+        result['trades'] = trades_df
+        result['equity'] = equity
+        if cached is not None and cached['equity_metrics'] is not None:
+            result['metrics'] = cached['metrics']
+            result['equity_metrics'] = cached['equity_metrics']
+        else:
+            with span(instrumentation, 'metrics', symbol=symbol):
+                result['equity_metrics'] = equity_metrics(equity['value'], equity['cash'])
+                if not trades_df.empty:
+                    result['metrics'] = calculate_backtest_metrics(trades_df,
+                                                                   initial_capital=broker_settings['cash'])
+            if cached is not None:
+                # Stored by older metrics code; the simulation itself still holds
+                cache.update_metrics(key, trades_df, result['metrics'], result['equity_metrics'])
+        if cache is not None and cached is None:
+            cache.put(key, trades_df, equity, result['metrics'], result['equity_metrics'],
+                      symbol=symbol, strategy=strategy.__name__)
+    except BacktestTimeout:
+        result['error'] = f"timed out after {timeout}s"
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    result['elapsed'] = time.perf_counter() - start
+    if instrumentation is not None:
+        result['profile'] = instrumentation.to_dict()
+    return result
+
+
+def run_parallel(data, strategy=strategy_logic.EMAMACDStrategy, max_workers=None, timeout=None,
+                 precomputed=True, strategy_kwargs=None, broker_settings=BROKER_SETTINGS, instrument=False,
+                 log_level=strategy_logging.INFO, cache_root=None, memmap_root=None):
+    """Backtest {symbol: frame} across a process pool.
+
+    Yields backtest_symbol() results as symbols finish. A worker that dies
+    (segfault, out of memory) marks the symbols it leaves behind as failed
+    instead of aborting the whole run.
+
+    With memmap_root, a directory written by memmap_feed.write_memmap_bars(),
+    workers are sent only the symbol and read its bars from the shared
+    mapping, rather than each receiving a pickled copy of its frame; data
+    then only needs the symbols as keys.
+    """
+    if max_workers == 1:
+        for symbol, df in data.items():
+            yield backtest_symbol(symbol, df, strategy, precomputed, strategy_kwargs, broker_settings, timeout,
+                                  instrument, log_level, cache_root)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(backtest_symbol, symbol, None if memmap_root is not None else df, strategy,
+                            precomputed, strategy_kwargs, broker_settings, timeout, instrument, log_level,
+                            cache_root, memmap_root): symbol
+            for symbol, df in data.items()
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {'symbol': symbol, 'trades': None, 'metrics': None, 'equity': None,
+                       'equity_metrics': None, 'error': f"worker failed: {type(e).__name__}: {e}",
+                       'elapsed': None, 'profile': None, 'log': [], 'cached': False}
@@ -0,0 +1,177 @@
+import os
+import pandas as pd
+
+# Columnar on-disk store for OHLCV bars and indicator frames.
+# One Parquet file per symbol and timeframe, e.g. data/store/TSLA_1D.parquet,
+# with a DatetimeIndex named 'Date' and typed float64 columns. Parquet keeps
+# the dtypes so readers don't need date parsing or the skiprows hacks the
+# yfinance CSV headers required.
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def normalize_bars(df):
+    """Flatten yfinance output into a typed OHLCV frame"""
+    if isinstance(df.columns, pd.MultiIndex):
+        # yf.download returns (Price, Ticker) columns even for one symbol
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df[BAR_COLUMNS].dropna()
+    df = df.astype('float64')
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index
+    df.index.name = 'Date'
+    return df.sort_index()
+
+
+class BarStore:
+    def __init__(self, root=os.path.join("data", "store")):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, symbol, timeframe='1D'):
+        return os.path.join(self.root, f"{symbol}_{timeframe}.parquet")
+
+    def state_path(self, symbol, timeframe='1D'):
+        """Sidecar file for incremental indicator state of a stored frame"""
+        return os.path.join(self.root, f"{symbol}_{timeframe}.state.json")
+
+    def exists(self, symbol, timeframe='1D'):
+        return os.path.exists(self.path(symbol, timeframe))
+
+    def symbols(self, timeframe='1D'):
+        """Symbols stored for a timeframe, sorted"""
+        suffix = f"_{timeframe}.parquet"
+        return sorted(f[:-len(suffix)] for f in os.listdir(self.root) if f.endswith(suffix))
+
+    def read(self, symbol, timeframe='1D', columns=None, start=None, end=None):
+        df = pd.read_parquet(self.path(symbol, timeframe), columns=columns)
+        if start is not None or end is not None:
+            df = df.loc[start:end]
+        return df
+
+    def write(self, symbol, df, timeframe='1D'):
+        """Replace the stored frame for symbol"""
+        path = self.path(symbol, timeframe)
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def last_timestamp(self, symbol, timeframe='1D'):
+        """Last stored bar time, or None if the symbol is not stored yet"""
+        if not self.exists(symbol, timeframe):
+            return None
+        # Only the index column is needed to find the last bar
+        index = pd.read_parquet(self.path(symbol, timeframe), columns=[]).index
+        return index.max() if len(index) else None
+
+    def append(self, symbol, df, timeframe='1D'):
+        """Append bars newer than the last stored one and return how many were added"""
+        if not self.exists(symbol, timeframe):
+            if df.empty:
+                return 0
+            self.write(symbol, df, timeframe)
+            return len(df)
+        stored = self.read(symbol, timeframe)
+        if len(stored):
+            df = df[df.index > stored.index.max()]
+        if df.empty:
+            return 0
+        self.write(symbol, pd.concat([stored, df]), timeframe)
+        return len(df)
+
+
+class PartitionedBarStore:
+    """Time-partitioned store for intraday bars.
+
+    Each symbol and timeframe is a directory of Parquet files, one per
+    calendar period (a month by default), e.g.
+    data/partitions/1m/TSLA/2024-03.parquet. Readers go through
+    iter_chunks(), which loads one partition at a time, so a history of any
+    length is processed in memory bounded by a single partition. Appends
+    rewrite only the partitions that receive bars.
+    """
+
+    def __init__(self, root=os.path.join("data", "partitions"), period='M'):
+        self.root = root
+        self.period = period
+        os.makedirs(self.root, exist_ok=True)
+
+    def directory(self, symbol, timeframe='1m'):
+        return os.path.join(self.root, timeframe, symbol)
+
+    def path(self, symbol, timeframe, partition):
+        return os.path.join(self.directory(symbol, timeframe), f"{partition}.parquet")
+
+    def exists(self, symbol, timeframe='1m'):
+        return bool(self.partitions(symbol, timeframe))
+
+    def symbols(self, timeframe='1m'):
+        """Symbols stored for a timeframe, sorted"""
+        directory = os.path.join(self.root, timeframe)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(s for s in os.listdir(directory) if self.partitions(s, timeframe))
+
+    def partitions(self, symbol, timeframe='1m', start=None, end=None):
+        """Partition names in time order, limited to those overlapping [start, end]"""
+        directory = self.directory(symbol, timeframe)
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(f[:-len(".parquet")] for f in os.listdir(directory) if f.endswith(".parquet"))
+        if start is None and end is None:
+            return names
+        # Names are period strings ('2024-03', '2024-03-15', '2024'); the period is implied by the name
+        periods = [pd.Period(name) for name in names]
+        return [name for name, p in zip(names, periods)
+                if (start is None or p.end_time >= pd.Timestamp(start))
+                and (end is None or p.start_time <= pd.Timestamp(end))]
+
+    def iter_chunks(self, symbol, timeframe='1m', columns=None, start=None, end=None):
+        """Yield the stored bars one non-empty partition at a time"""
+        for partition in self.partitions(symbol, timeframe, start, end):
+            df = pd.read_parquet(self.path(symbol, timeframe, partition), columns=columns)
+            if start is not None or end is not None:
+                df = df.loc[start:end]
+            if len(df):
+                yield df
+
+    def read(self, symbol, timeframe='1m', columns=None, start=None, end=None):
+        """Concatenated bars; for ranges small enough to hold in memory"""
+        chunks = list(self.iter_chunks(symbol, timeframe, columns, start, end))
+        if not chunks:
+            return pd.DataFrame(columns=columns or BAR_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+        return pd.concat(chunks)
+
+    def _write_partition(self, symbol, df, timeframe, partition):
+        path = self.path(symbol, timeframe, partition)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def last_timestamp(self, symbol, timeframe='1m'):
+        """Last stored bar time, or None if the symbol is not stored yet"""
+        partitions = self.partitions(symbol, timeframe)
+        if not partitions:
+            return None
+        index = pd.read_parquet(self.path(symbol, timeframe, partitions[-1]), columns=[]).index
+        return index.max() if len(index) else None
+
+    def append(self, symbol, df, timeframe='1m'):
+        """Append bars newer than the last stored one and return how many were added"""
+        last = self.last_timestamp(symbol, timeframe)
+        if last is not None:
+            df = df[df.index > last]
+        if df.empty:
+            return 0
+        for period, part in df.groupby(df.index.to_period(self.period), sort=True):
+            partition = str(period)
+            path = self.path(symbol, timeframe, partition)
+            # Only the partition holding the last stored bar can already exist
+            if os.path.exists(path):
+                part = pd.concat([pd.read_parquet(path), part])
+            self._write_partition(symbol, part, timeframe, partition)
+        return len(df)
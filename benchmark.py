@@ -0,0 +1,231 @@
+import io
+import os
+import gc
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import pandas as pd
+import backtrader as bt
+import strategy_logic
+import strategy_logging
+from calculate_indicators import (params, calculate_indicators_emavolmacd, calculate_indicatorsEMACrossOver,
+                                  calculate_indicatorsEMAMACD)
+from downloader import generate_ohlcv
+from backtest_runner import BROKER_SETTINGS, build_cerebro
+from precomputed_feed import make_precomputed_feed
+from trade_logger import TradeLogger
+from performance_metrics import calculate_backtest_metrics
+from plotly_visualization import create_backtest_dashboard
+from export_to_excel import export_workbook
+
+# Offline benchmark of the pipeline stages on seeded synthetic bars.
+#
+# Each stage (indicators, a Cerebro run per strategy, TradeLogger
+# collection, metrics, dashboard build, Excel export) is timed on its own
+# over every symbol, best of `repeat` runs. Peak memory is measured in one
+# extra run under tracemalloc, which slows Python down too much to time
+# with. Results can be saved as a JSON baseline and later runs compared
+# against it to catch regressions.
+
+STRATEGIES = (strategy_logic.EMAVolMACDStrategy, strategy_logic.EMACrossoverStrategy,
+              strategy_logic.EMAMACDStrategy)
+BASELINE = os.path.join("benchmarks", "baseline.json")
+
+
+def synthetic_data(n_bars=2520, n_symbols=4, seed=0):
+    """{symbol: lowercase OHLCV frame} of seeded random walks"""
+    return {f"SYN{i}": generate_ohlcv(n_bars, seed=seed + i).rename(columns=str.lower)
+            for i in range(n_symbols)}
+
+
+def _measure(fn, repeat):
+    # Best-of timing, then one traced run for the peak of new allocations
+    seconds = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        seconds = min(seconds, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _calculate_indicators(data):
+    for df in data.values():
+        frame = df.rename(columns=str.capitalize)
+        calculate_indicators_emavolmacd(frame.copy(), params)
+        calculate_indicatorsEMACrossOver(frame.copy(), params)
+        calculate_indicatorsEMAMACD(frame.copy(), params)
+
+
+def _run_cerebro(data, strategy_cls, precomputed):
+    # Strategies are run without collecting, so the collection stage is separate
+    runs = {}
+    for symbol, df in data.items():
+        cerebro = build_cerebro(BROKER_SETTINGS)
+        if precomputed:
+            cerebro.adddata(make_precomputed_feed(df, strategy_cls, name=symbol))
+            cerebro.addstrategy(strategy_cls, precomputed=True)
+        else:
+            feed = bt.feeds.PandasData(dataname=df, datetime=None, openinterest=-1)
+            feed._name = symbol
+            cerebro.adddata(feed)
+            cerebro.addstrategy(strategy_cls)
+        cerebro.addanalyzer(TradeLogger, _name='trade_logger')
+        with strategy_logging.disabled():
+            runs[symbol] = cerebro.run()[0]
+    return runs
+
+
+def _collect_trades(runs):
+    return {symbol: strat.analyzers.trade_logger.get_analysis() for symbol, strat in runs.items()}
+
+
+def _calculate_metrics(trades):
+    return {symbol: calculate_backtest_metrics(df, initial_capital=BROKER_SETTINGS['cash'])
+            for symbol, df in trades.items() if not df.empty}
+
+
+def _build_dashboards(trades, metrics, data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [create_backtest_dashboard(trades[symbol], data[symbol], metrics[symbol], symbol=symbol)
+                for symbol in metrics if 'Error' not in metrics[symbol]]
+
+
+def _export_excel(trades, out_dir):
+    frames = ((symbol, df) for symbol, df in trades.items() if not df.empty)
+    return export_workbook(frames, os.path.join(out_dir, "benchmark.xlsx"),
+                           initial_capital=BROKER_SETTINGS['cash'])
+
+
+def run_benchmark(n_bars=2520, n_symbols=4, seed=0, strategies=STRATEGIES, repeat=3, precomputed=True):
+    """Time every stage on synthetic data.
+
+    Returns {'config': ..., 'stages': {stage: {'seconds', 'bars', 'bars_per_sec',
+    'peak_mb'}}}. bars/sec is over all n_bars * n_symbols input bars for
+    every stage, including the per-trade ones, so stages compare directly.
+    """
+    data = synthetic_data(n_bars, n_symbols, seed)
+    total_bars = n_bars * n_symbols
+    stages = {}
+
+    def record(stage, fn):
+        result, seconds, peak = _measure(fn, repeat)
+        stages[stage] = {'seconds': seconds, 'bars': total_bars,
+                         'bars_per_sec': total_bars / seconds if seconds > 0 else float('inf'),
+                         'peak_mb': peak / 1e6}
+        return result
+
+    record('indicators', lambda: _calculate_indicators(data))
+    trades = {}
+    for strategy_cls in strategies:
+        name = strategy_cls.__name__
+        runs = record(f"cerebro:{name}", lambda: _run_cerebro(data, strategy_cls, precomputed))
+        trades[name] = record(f"trade_logger:{name}", lambda: _collect_trades(runs))
+
+    # Reporting stages work on the trades of the last strategy
+    trades = trades[strategies[-1].__name__]
+    metrics = record('metrics', lambda: _calculate_metrics(trades))
+    record('dashboard', lambda: _build_dashboards(trades, metrics, data))
+    out_dir = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        record('excel', lambda: _export_excel(trades, out_dir))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    config = {'n_bars': n_bars, 'n_symbols': n_symbols, 'seed': seed, 'repeat': repeat,
+              'precomputed': precomputed, 'strategies': [s.__name__ for s in strategies],
+              'n_trades': int(sum(len(df) for df in trades.values())),
+              'python': platform.python_version(), 'machine': platform.machine()}
+    return {'config': config, 'stages': stages}
+
+
+def save_baseline(result, path=BASELINE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_baseline(path=BASELINE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(result, baseline, tolerance=0.25, memory_tolerance=0.25):
+    """Stages slower (or using more memory) than baseline beyond the tolerances.
+
+    Returns a frame with one row per stage present in both, with the ratios
+    to the baseline and a regression flag. Timings are only comparable for
+    the same n_bars / n_symbols / seed on the same machine.
+    """
+    rows = []
+    for stage, current in result['stages'].items():
+        previous = baseline['stages'].get(stage)
+        if previous is None:
+            continue
+        time_ratio = current['seconds'] / previous['seconds'] if previous['seconds'] else float('inf')
+        memory_ratio = current['peak_mb'] / previous['peak_mb'] if previous['peak_mb'] else 1.0
+        rows.append({'stage': stage, 'seconds': current['seconds'], 'baseline_seconds': previous['seconds'],
+                     'time_ratio': time_ratio, 'peak_mb': current['peak_mb'],
+                     'baseline_peak_mb': previous['peak_mb'], 'memory_ratio': memory_ratio,
+                     'regression': time_ratio > 1 + tolerance or memory_ratio > 1 + memory_tolerance})
+    return pd.DataFrame(rows)
+
+
+def _comparable(config, baseline_config):
+    keys = ('n_bars', 'n_symbols', 'seed', 'precomputed', 'strategies')
+    return all(config.get(k) == baseline_config.get(k) for k in keys)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the backtest pipeline on synthetic bars")
+    parser.add_argument('--bars', type=int, default=2520, help="bars per symbol")
+    parser.add_argument('--symbols', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument('--strategy', action='append', default=[], help="class name in strategy_logic")
+    parser.add_argument('--line-indicators', action='store_true',
+                        help="run strategies with bt.indicators instead of precomputed columns")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument('--out', default=None, help="also write this run's results as JSON")
+    args = parser.parse_args()
+
+    strategies = tuple(getattr(strategy_logic, name) for name in args.strategy) or STRATEGIES
+    result = run_benchmark(args.bars, args.symbols, args.seed, strategies, args.repeat,
+                           precomputed=not args.line_indicators)
+    print(f"{args.symbols} symbols x {args.bars} bars, {result['config']['n_trades']} trades")
+    print(pd.DataFrame(result['stages']).T.to_string(float_format=lambda v: f"{v:,.3f}"))
+    if args.out:
+        save_baseline(result, args.out)
+
+    if args.save_baseline:
+        save_baseline(result, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        baseline = load_baseline(args.baseline)
+        if not _comparable(result['config'], baseline['config']):
+            print(f"Baseline {args.baseline} was run with a different configuration; not compared")
+        else:
+            report = compare(result, baseline, tolerance=args.tolerance, memory_tolerance=args.tolerance)
+            print(report.to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+            regressions = report[report['regression']]
+            if not regressions.empty:
+                print(f"{len(regressions)} stages regressed: {', '.join(regressions['stage'])}")
+                sys.exit(1)
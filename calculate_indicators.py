@@ -34,8 +34,7 @@ params = {
 # 3 fast 10 slow _ 16 signal 
 # Standard MACD 12 26 9
 
-import pandas as pd
-import numpy as np
+import os
 
 # Calculate indicators with consistent parameters for Backtrader
 
@@ -88,18 +87,28 @@ def calculate_indicatorsEMAMACD(df, params=params):
 
 
 # Apply to all dataframes
-import os
-
-data = {}
-for file in os.listdir("data"):
-    if file.endswith("_1D.csv"):
-        symbol = file.split("_")[0]
-        date_format = '%Y-%m-%d'
-        df = pd.read_csv(f"data/{file}", index_col=0, parse_dates=True, date_format=date_format, skiprows=[1,2])
-        data[symbol] = calculate_indicatorsEMAMACD(df, params=params)
-
-# Save with indicators
-for symbol, df in data.items():
-    df.to_csv(f"data/{symbol}_1D_indicators.csv")
-
-print("Indicator calculation complete.")
+if __name__ == '__main__':
+    from bar_store import BarStore
+    from indicator_state import IndicatorState, emamacd_state
+
+    store = BarStore()
+    for symbol in store.symbols('1D'):
+        state_path = store.state_path(symbol, '1D_indicators')
+        state = emamacd_state(params)
+        # Resume from saved state unless it was built with different periods
+        if os.path.exists(state_path) and store.exists(symbol, '1D_indicators'):
+            saved = IndicatorState.load(state_path)
+            if saved.spec() == state.spec():
+                state = saved
+
+        if state.last_timestamp is None:
+            df = state.update(store.read(symbol, '1D'))
+            store.write(symbol, df, '1D_indicators')
+        else:
+            # Only bars after the last processed one go through the state
+            df = state.update(store.read(symbol, '1D', start=state.last_timestamp))
+            store.append(symbol, df, '1D_indicators')
+        state.save(state_path)
+        print(f"{symbol}: {len(df)} bars updated.")
+
+    print("Indicator calculation complete.")
@@ -0,0 +1,193 @@
+import os
+import json
+import math
+import hashlib
+import pandas as pd
+
+# Sharded, resumable universe runs.
+#
+# Each symbol's backtest result is persisted as soon as it arrives, so a
+# crash late in a long run loses at most the symbols still in flight.
+# Layout of a shard directory:
+#   run.json          the run's configuration (strategy, parameters, broker)
+#   manifest.jsonl    one line per finished symbol, appended and fsynced
+#                     after its shard files are in place
+#   trades/SYM.parquet, metrics/SYM.json
+#                     the symbol's trades and metrics, each written to a
+#                     temporary file and renamed into place
+# A symbol counts as done only once its manifest line exists, so shard
+# files left by an interrupted write are simply rewritten. A resumed run
+# skips symbols whose manifest entry was recorded for the same bars and
+# retries the ones that failed. consolidate() streams the shards into one
+# CSV, holding one symbol's trades in memory at a time.
+
+SHARD_DIR = "backtest_shards"
+RUN_FILE = "run.json"
+MANIFEST = "manifest.jsonl"
+
+
+def bars_hash(df):
+    """Hash of the bars a shard was computed from"""
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()
+
+
+def _json_default(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class ShardedRun:
+    """Per-symbol result shards of one universe run, plus their manifest.
+
+    config is any JSON-serialisable description of how the results were
+    produced. Opening an existing directory with resume=True requires the
+    same config; otherwise the previous run's manifest is discarded.
+    """
+
+    def __init__(self, root=SHARD_DIR, config=None, resume=False):
+        self.root = root
+        self.config = json.loads(json.dumps(config or {}, default=_json_default))
+        self.entries = {}
+        os.makedirs(os.path.join(root, "trades"), exist_ok=True)
+        os.makedirs(os.path.join(root, "metrics"), exist_ok=True)
+        run_path = os.path.join(root, RUN_FILE)
+        if resume and os.path.exists(run_path):
+            with open(run_path) as f:
+                previous = json.load(f)
+            if previous != self.config:
+                raise ValueError(f"{root} holds a run with a different configuration; "
+                                 f"start a fresh run instead of resuming")
+            self.entries = self._read_manifest()
+        else:
+            _write_atomic(run_path, lambda p: self._dump(p, self.config))
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST)
+
+    def trades_path(self, symbol):
+        return os.path.join(self.root, "trades", f"{symbol}.parquet")
+
+    def metrics_path(self, symbol):
+        return os.path.join(self.root, "metrics", f"{symbol}.json")
+
+    @staticmethod
+    def _dump(path, obj):
+        with open(path, "w") as f:
+            json.dump(obj, f, default=_json_default)
+
+    def _read_manifest(self):
+        """Entries of the manifest, truncating it after its last complete line.
+
+        A crash can leave a torn last line; cutting it off keeps the lines
+        appended by the resumed run readable.
+        """
+        entries = {}
+        if not os.path.exists(self.manifest_path):
+            return entries
+        end = 0
+        with open(self.manifest_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                entries[entry['symbol']] = entry
+                end += len(line)
+        if end != os.path.getsize(self.manifest_path):
+            with open(self.manifest_path, "r+b") as f:
+                f.truncate(end)
+        return entries
+
+    def is_done(self, symbol, digest):
+        """Whether symbol finished (with or without trades) on bars hashing to digest"""
+        entry = self.entries.get(symbol)
+        return entry is not None and entry['status'] != 'failed' and entry['bars_hash'] == digest
+
+    def pending(self, data):
+        """The {symbol: frame} items still to run, with their bars hashes"""
+        digests = {symbol: bars_hash(df) for symbol, df in data.items()}
+        todo = {symbol: df for symbol, df in data.items() if not self.is_done(symbol, digests[symbol])}
+        return todo, digests
+
+    def record(self, result, digest):
+        """Persist one backtest_symbol() result, then mark it done in the manifest"""
+        symbol = result['symbol']
+        trades = result['trades']
+        if result['error'] is not None:
+            status = 'failed'
+        elif trades is None or trades.empty:
+            status = 'empty'
+        else:
+            status = 'done'
+            trades = trades.assign(symbol=symbol)
+            _write_atomic(self.trades_path(symbol), lambda p: trades.to_parquet(p, index=False))
+        _write_atomic(self.metrics_path(symbol), lambda p: self._dump(p, {
+            'metrics': result['metrics'], 'equity_metrics': result.get('equity_metrics'),
+            'error': result['error'], 'elapsed': result.get('elapsed')}))
+
+        entry = {'symbol': symbol, 'status': status, 'rows': 0 if status != 'done' else len(trades),
+                 'bars_hash': digest, 'error': result['error']}
+        with open(self.manifest_path, "a") as f:
+            f.write(json.dumps(entry, default=_json_default) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[symbol] = entry
+        return entry
+
+    def symbols(self, status=None):
+        """Recorded symbols, sorted, optionally only those with the given status"""
+        return sorted(s for s, e in self.entries.items() if status is None or e['status'] == status)
+
+    def iter_trades(self, symbols=None):
+        """(symbol, trades frame) per shard with trades, read one at a time"""
+        for symbol in self.symbols('done') if symbols is None else symbols:
+            yield symbol, pd.read_parquet(self.trades_path(symbol))
+
+    def read_metrics(self, symbol):
+        with open(self.metrics_path(symbol)) as f:
+            return json.load(f)
+
+    def consolidate(self, trades_path="backtest_trades.csv", metrics_path=None):
+        """Stream every shard's trades into one CSV (and metrics into another).
+
+        Symbols are written in sorted order whatever order they finished in.
+        Returns the number of trade rows written.
+        """
+        rows = 0
+
+        def write_trades(path):
+            nonlocal rows
+            header = True
+            with open(path, "w", newline="") as f:
+                for symbol, trades in self.iter_trades():
+                    trades.to_csv(f, index=False, header=header)
+                    header = False
+                    rows += len(trades)
+        _write_atomic(trades_path, write_trades)
+
+        if metrics_path is not None:
+            def write_metrics(path):
+                records = []
+                for symbol in self.symbols():
+                    shard = self.read_metrics(symbol)
+                    records.append({'symbol': symbol, 'status': self.entries[symbol]['status'],
+                                    'error': shard['error'], **(shard['metrics'] or {})})
+                pd.DataFrame(records).to_csv(path, index=False)
+            _write_atomic(metrics_path, write_metrics)
+        return rows
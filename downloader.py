@@ -0,0 +1,185 @@
+import os
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bar_store import BAR_COLUMNS, normalize_bars
+
+# Multi-symbol bar downloader. Providers hide where the bars come from so the
+# same download loop works against Yahoo, local files or synthetic data.
+
+
+class BarProvider:
+    """Interface for bar sources. fetch() returns {symbol: OHLCV frame}"""
+    batch_size = 1  # symbols per fetch() call
+    # Whether a requested symbol missing from fetch()'s result is a failed
+    # download (retried, then reported) rather than a symbol without bars
+    missing_is_error = False
+
+    def fetch(self, symbols, start, end=None, interval="1D"):
+        raise NotImplementedError
+
+
+class YahooProvider(BarProvider):
+    batch_size = 20
+    # yf.download does not raise when one symbol of a batch fails; it comes
+    # back as empty or all-NaN columns, which normalize_bars() drops
+    missing_is_error = True
+
+    def fetch(self, symbols, start, end=None, interval="1D"):
+        import yfinance as yf
+
+        raw = yf.download(list(symbols), start=start, end=end, interval=interval,
+                          group_by='ticker', progress=False, threads=False)
+        data = {}
+        for symbol in symbols:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if symbol not in raw.columns.get_level_values(0):
+                    continue
+                df = raw[symbol]
+            else:
+                df = raw
+            df = normalize_bars(df)
+            if not df.empty:
+                data[symbol] = df
+        return data
+
+
+def read_bar_csv(path):
+    """Read a bar CSV, including the yfinance layout with Ticker and Date rows under the header"""
+    with open(path) as f:
+        head = [f.readline() for _ in range(3)]
+    # yf.download(...).to_csv() writes the (Price, Ticker) column levels and
+    # the index name as two extra rows below the header
+    skiprows = [1, 2] if head[1].startswith('Ticker,') and head[2].startswith('Date,') else None
+    return pd.read_csv(path, index_col=0, parse_dates=True, skiprows=skiprows)
+
+
+class LocalFileProvider(BarProvider):
+    """Reads {symbol}_{interval}.parquet or .csv files from a directory"""
+    batch_size = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, symbols, start, end=None, interval="1D"):
+        data = {}
+        for symbol in symbols:
+            base = os.path.join(self.directory, f"{symbol}_{interval}")
+            if os.path.exists(base + ".parquet"):
+                df = pd.read_parquet(base + ".parquet")
+            elif os.path.exists(base + ".csv"):
+                df = read_bar_csv(base + ".csv")
+            else:
+                continue
+            df = normalize_bars(df).loc[start:end]
+            if not df.empty:
+                data[symbol] = df
+        return data
+
+
+def generate_ohlcv(n_bars, start="2020-01-01", freq="B", seed=0, start_price=100.0,
+                   drift=0.0003, volatility=0.02):
+    """Seeded random-walk OHLCV frame in the store's column layout"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start=start, periods=n_bars, freq=freq, name='Date')
+    returns = rng.normal(drift, volatility, n_bars)
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1] * np.exp(rng.normal(0, volatility / 4, n_bars - 1))
+    spread = np.abs(rng.normal(0, volatility / 2, n_bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.maximum(np.minimum(open_, close) - spread, 0.01)
+    volume = rng.lognormal(mean=14, sigma=0.5, size=n_bars).round()
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=index)[BAR_COLUMNS]
+
+
+# Bar spacing of generated bars per interval name
+SYNTHETIC_FREQ = {'1m': 'min', '5m': '5min', '15m': '15min', '30m': '30min', '1h': 'h', '1D': 'B'}
+
+
+class SyntheticProvider(BarProvider):
+    """Deterministic random-walk bars, seeded per symbol. For tests and offline runs"""
+    batch_size = 50
+
+    def __init__(self, seed=0, start="2020-01-01", n_bars=1260):
+        self.seed = seed
+        self.start = start
+        self.n_bars = n_bars
+
+    def fetch(self, symbols, start, end=None, interval="1D"):
+        data = {}
+        for symbol in symbols:
+            seed = self.seed + zlib.crc32(symbol.encode())
+            df = generate_ohlcv(self.n_bars, start=self.start, freq=SYNTHETIC_FREQ.get(interval, 'B'), seed=seed)
+            df = df.loc[start:end]
+            if not df.empty:
+                data[symbol] = df
+        return data
+
+
+def _fetch_with_retry(provider, symbols, start, end, interval, retries, backoff):
+    # Returns (data, errors); errors maps each symbol still failing after the
+    # retries to a message. Only the failed symbols are fetched again
+    data = {}
+    pending = list(symbols)
+    delay = backoff
+    for attempt in range(retries + 1):
+        try:
+            result = provider.fetch(pending, start, end, interval)
+        except Exception as e:
+            errors = {symbol: f"{type(e).__name__}: {e}" for symbol in pending}
+        else:
+            data.update((symbol, result[symbol]) for symbol in pending if symbol in result)
+            missing = [symbol for symbol in pending if symbol not in result] if provider.missing_is_error else []
+            errors = {symbol: "no bars returned" for symbol in missing}
+        if not errors:
+            break
+        pending = list(errors)
+        if attempt < retries:
+            time.sleep(delay)
+            delay *= 2
+    return data, errors
+
+
+def download_symbols(provider, symbols, start, end=None, interval="1D",
+                     max_workers=4, retries=3, backoff=1.0):
+    """Download symbols in batches from a bounded thread pool.
+
+    start is either one date for all symbols or a {symbol: date} dict, so
+    incremental refreshes can ask each symbol for its own missing range.
+    Returns (data, failures) where failures maps symbol -> error message for
+    symbols that still failed after retries. A symbol missing from a
+    provider's result counts as failed when the provider sets
+    missing_is_error; otherwise symbols the provider had no bars for are
+    simply missing from data.
+    """
+    # Group symbols sharing a start date so batching providers can fetch them together
+    if isinstance(start, dict):
+        groups = {}
+        for symbol in symbols:
+            groups.setdefault(start[symbol], []).append(symbol)
+    else:
+        groups = {start: list(symbols)}
+
+    batches = []
+    for group_start, group in groups.items():
+        size = max(provider.batch_size, 1)
+        for i in range(0, len(group), size):
+            batches.append((group_start, group[i:i + size]))
+
+    data = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_fetch_with_retry, provider, batch, batch_start, end, interval, retries, backoff)
+            for batch_start, batch in batches
+        ]
+        for future in as_completed(futures):
+            result, errors = future.result()
+            data.update(result)
+            failures.update(errors)
+    return data, failures
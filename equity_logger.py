@@ -0,0 +1,60 @@
+import numpy as np
+import backtrader as bt
+
+
+_ORIGIN = np.datetime64('0001-01-01', 'us')
+
+
+def num2datetime64(dtnums):
+    """Vectorized bt.num2date (UTC, naive) to datetime64[us]"""
+    # bt date numbers count days from 0001-01-01 as day 1
+    micros = np.round((np.asarray(dtnums, dtype='float64') - 1.0) * 86400e6).astype('int64')
+    return _ORIGIN + micros.astype('timedelta64[us]')
+
+
+class EquityLogger(bt.Analyzer):
+    """Broker value and cash at the close of every bar, in numpy buffers.
+
+    get_analysis() returns {'datetime', 'value', 'cash'} arrays (datetime as
+    datetime64[us]), ready for equity_metrics. Buffers start at the length of
+    the preloaded data, or initial_capacity, and double when full.
+    """
+    params = (
+        ('initial_capacity', 4096),
+    )
+
+    def start(self):
+        capacity = max(self.data.buflen(), self.p.initial_capacity)
+        self.dtnums = np.empty(capacity, dtype='float64')
+        self.value = np.empty(capacity, dtype='float64')
+        self.cash = np.empty(capacity, dtype='float64')
+        self.count = 0
+
+    def prenext(self):
+        # Record warmup bars too; the account exists from the first bar
+        self.next()
+
+    def next(self):
+        if self.count == len(self.value):
+            self._grow()
+        i = self.count
+        broker = self.strategy.broker
+        self.dtnums[i] = self.strategy.datetime[0]
+        self.value[i] = broker.getvalue()
+        self.cash[i] = broker.getcash()
+        self.count += 1
+
+    def _grow(self):
+        for name in ('dtnums', 'value', 'cash'):
+            values = getattr(self, name)
+            grown = np.empty(2 * len(values), dtype=values.dtype)
+            grown[:self.count] = values[:self.count]
+            setattr(self, name, grown)
+
+    def get_analysis(self):
+        n = self.count
+        return {
+            'datetime': num2datetime64(self.dtnums[:n]),
+            'value': self.value[:n],
+            'cash': self.cash[:n],
+        }
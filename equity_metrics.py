@@ -0,0 +1,82 @@
+import numpy as np
+
+# Performance metrics from bar-level equity curves (EquityLogger output).
+#
+# Every function works on the last axis, so a single curve (1-D) and a whole
+# sweep stacked as runs x bars (2-D) go through the same NumPy operations in
+# one pass. Runs of different lengths are stacked with stack_curves(), which
+# pads with NaN; NaN bars are ignored throughout.
+
+
+def stack_curves(curves):
+    """runs x bars float array from 1-D curves, right-padded with NaN"""
+    curves = [np.asarray(c, dtype='float64') for c in curves]
+    out = np.full((len(curves), max((len(c) for c in curves), default=0)), np.nan)
+    for i, c in enumerate(curves):
+        out[i, :len(c)] = c
+    return out
+
+
+def bar_returns(value):
+    """Simple returns between consecutive bars (one fewer column)"""
+    value = np.asarray(value, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return value[..., 1:] / value[..., :-1] - 1.0
+
+
+def drawdown_pct(value):
+    """Percent below the running peak at each bar (0 at new highs)"""
+    value = np.asarray(value, dtype='float64')
+    # fmax skips NaN padding when carrying the peak forward
+    peak = np.fmax.accumulate(value, axis=-1)
+    return (value / peak - 1.0) * 100
+
+
+def _last_valid(value):
+    counts = np.sum(~np.isnan(value), axis=-1)
+    index = np.maximum(counts - 1, 0)
+    return np.take_along_axis(value, index[..., None], axis=-1)[..., 0], counts
+
+
+def equity_metrics(value, cash=None, trading_days=252, bars_per_day=1, risk_free=0.0):
+    """Sharpe, Sortino, drawdown, exposure and returns of equity curves.
+
+    value (and cash, for exposure) is one curve or a runs x bars array.
+    Ratios are annualized with trading_days * bars_per_day bars per year;
+    risk_free is an annual rate. Returns a dict of floats for a 1-D input and
+    of per-run arrays for a 2-D input.
+    """
+    value = np.asarray(value, dtype='float64')
+    periods = trading_days * bars_per_day
+    returns = bar_returns(value) - risk_free / periods
+    n_returns = np.sum(~np.isnan(returns), axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nansum(returns, axis=-1) / n_returns
+        deviation = returns - mean[..., None]
+        std = np.sqrt(np.nansum(deviation ** 2, axis=-1) / (n_returns - 1))
+        downside = np.sqrt(np.nansum(np.minimum(returns, 0.0) ** 2, axis=-1) / n_returns)
+
+        initial = value[..., 0]
+        final, n_bars = _last_valid(value)
+        total_return = final / initial - 1.0
+        years = (n_bars - 1) / periods
+        metrics = {
+            'total_return_pct': total_return * 100,
+            'annualized_return_pct': ((1.0 + total_return) ** (1.0 / years) - 1.0) * 100,
+            'sharpe_ratio': np.where(std > 0, mean / std * np.sqrt(periods), 0.0),
+            'sortino_ratio': np.where(downside > 0, mean / downside * np.sqrt(periods), 0.0),
+            'max_drawdown_pct': np.nanmin(drawdown_pct(value), axis=-1),
+            'final_equity': final,
+        }
+        if cash is not None:
+            cash = np.asarray(cash, dtype='float64')
+            # A bar counts as exposed when part of the account sits in positions
+            invested = value - cash
+            exposed = np.where(np.isnan(invested), 0.0, np.abs(invested) > 1e-9 * np.abs(value))
+            metrics['exposure_pct'] = exposed.sum(axis=-1) / n_bars * 100
+            metrics['avg_invested_pct'] = np.nansum(invested / value, axis=-1) / n_bars * 100
+
+    if value.ndim == 1:
+        return {k: float(v) for k, v in metrics.items()}
+    return metrics
@@ -1,37 +1,164 @@
-import pandas as pd
-import xlsxwriter
 import os
+import re
+import math
+import shutil
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import xlsxwriter
+from performance_metrics import METRIC_COLUMNS, batch_backtest_metrics
+
+# Excel export.
+#
+# export_workbook() writes one consolidated workbook: a Summary sheet with
+# each symbol's metrics and one sheet of trades per symbol. It uses
+# xlsxwriter's constant_memory mode, where each row is flushed to disk once
+# the next one starts, so memory stays flat however many trades there are;
+# rows are therefore written strictly in order with write_row(). Dashboard
+# images are optional; render_dashboard_images() renders them in parallel,
+# each to its own file.
+
+DATE_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _sheet_name(symbol, used):
+    # Excel sheet names: at most 31 characters, none of []:*?/\, unique
+    name = re.sub(r'[\[\]:*?/\\]', '_', str(symbol))[:31] or 'Sheet'
+    base, n = name, 1
+    while name.lower() in used:
+        suffix = f"~{n}"
+        name = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(name.lower())
+    return name
+
+
+def _cell_columns(frame):
+    """Column values as plain Python lists, NaN/NaT/inf as None (blank cells)"""
+    columns = []
+    for name in frame.columns:
+        series = frame[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = [None if pd.isna(v) else v.to_pydatetime() for v in series]
+        elif pd.api.types.is_bool_dtype(series):
+            values = series.tolist()
+        elif pd.api.types.is_numeric_dtype(series):
+            values = [v if math.isfinite(v) else None for v in series.to_numpy(dtype='float64').tolist()]
+        else:
+            values = [None if v is None or (isinstance(v, float) and math.isnan(v)) else v
+                      for v in series.tolist()]
+        columns.append(values)
+    return columns
+
+
+def _write_frame(worksheet, frame, header_format, first_row=0):
+    """Write frame row by row (constant_memory order); returns the next free row"""
+    worksheet.write_row(first_row, 0, list(map(str, frame.columns)), header_format)
+    for col, name in enumerate(frame.columns):
+        if pd.api.types.is_datetime64_any_dtype(frame[name]):
+            worksheet.set_column(col, col, 19)
+    row = first_row + 1
+    for values in zip(*_cell_columns(frame)):
+        worksheet.write_row(row, 0, values)
+        row += 1
+    return row
+
+
+def export_workbook(trades, excel_path, initial_capital=100000, images=None):
+    """Consolidated workbook of trades with a Summary sheet.
+
+    trades is one frame with a symbol column (e.g. backtest_trades.csv) or
+    an iterable of (symbol, frame) pairs, which is consumed one symbol at a
+    time. images maps symbol to a PNG placed beside that symbol's trades.
+    Returns the summary metrics frame.
+    """
+    if isinstance(trades, pd.DataFrame):
+        trades = trades.groupby('symbol', sort=True)
+    images = images or {}
+
+    workbook = xlsxwriter.Workbook(excel_path, {'constant_memory': True, 'default_date_format': DATE_FORMAT})
+    header_format = workbook.add_format({'bold': True})
+    # Added first so it is the first tab; written once every symbol is known
+    summary_sheet = workbook.add_worksheet('Summary')
+    used = {'summary'}
+
+    summaries = []
+    for symbol, frame in trades:
+        frame = frame.reset_index(drop=True)
+        summaries.append(batch_backtest_metrics(frame.assign(symbol=symbol), run_key='symbol',
+                                                initial_capital=initial_capital))
+        worksheet = workbook.add_worksheet(_sheet_name(symbol, used))
+        _write_frame(worksheet, frame, header_format)
+        worksheet.freeze_panes(1, 0)
+        if symbol in images:
+            worksheet.insert_image(1, len(frame.columns) + 1, images[symbol])
+
+    summary = pd.concat(summaries) if summaries else pd.DataFrame(columns=METRIC_COLUMNS)
+    _write_frame(summary_sheet, summary.reset_index(), header_format)
+    summary_sheet.freeze_panes(1, 1)
+    workbook.close()
+    return summary
+
+
+def _render_image(symbol, trades_df, prices, path, initial_capital):
+    from performance_metrics import calculate_backtest_metrics
+    from plotly_visualization import create_backtest_dashboard
+
+    trades_df = trades_df.reset_index(drop=True)
+    metrics = calculate_backtest_metrics(trades_df, initial_capital=initial_capital)
+    if 'Error' in metrics:
+        return symbol, None
+    dashboard = create_backtest_dashboard(trades_df, prices, metrics, symbol=symbol)
+    # Requires kaleido or orca installed for static image export
+    dashboard.write_image(path)
+    return symbol, path
+
+
+def render_dashboard_images(trades, prices, out_dir, initial_capital=100000, max_workers=None):
+    """Dashboard PNG per symbol, rendered on a process pool.
+
+    trades and prices map symbol to frames. Every image gets its own file in
+    out_dir, so concurrent renders never share a path. Returns {symbol: path}
+    for symbols with closed trades.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(symbol, frame, prices[symbol], os.path.join(out_dir, f"dashboard_{i:05d}.png"), initial_capital)
+            for i, (symbol, frame) in enumerate(trades.items())]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_render_image, *zip(*jobs))) if jobs else []
+    return {symbol: path for symbol, path in results if path is not None}
+
 
 # Function to export trades_df and dashboard to Excel
 # dashboard is a Plotly figure
 
 def export_trades_and_dashboard_to_excel(trades_df: pd.DataFrame, dashboard, excel_path: str):
-    # Create a Pandas Excel writer using XlsxWriter as the engine
-    with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-        # Write trades_df to the first sheet
-        trades_df.to_excel(writer, sheet_name='Trades', index=False)
-
-        # Save the dashboard as a static image temporarily
-        tmp_dir = tempfile.gettempdir()
-        img_path = os.path.join(tmp_dir, 'dashboard_image.png')
+    # Render the dashboard to a private temp file; xlsxwriter reads the image
+    # when the workbook is closed, so it is removed only after that
+    tmp_dir = tempfile.mkdtemp(prefix='dashboard-')
+    try:
+        img_path = os.path.join(tmp_dir, 'dashboard.png')
         # Requires kaleido or orca installed for static image export
         dashboard.write_image(img_path)
 
-        # Access the XlsxWriter workbook and worksheet objects
-        workbook  = writer.book
-        worksheet = workbook.add_worksheet('Dashboard')
+        with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
+            # Write trades_df to the first sheet
+            trades_df.to_excel(writer, sheet_name='Trades', index=False)
+            # Insert the image into a Dashboard sheet
+            worksheet = writer.book.add_worksheet('Dashboard')
+            worksheet.insert_image('B2', img_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
 
-        # Insert the image into the worksheet
-        worksheet.insert_image('B2', img_path)
 
-        # Save the Excel file
-        writer.save()
-
-        # Optionally remove the temporary image file
-        if os.path.exists(img_path):
-            os.remove(img_path)
+if __name__ == '__main__':
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Write all logged trades to one consolidated workbook")
+    parser.add_argument('trades', nargs='?', default="backtest_trades.csv")
+    parser.add_argument('--out', default=os.path.join("backtest_results", "backtest_report.xlsx"))
+    args = parser.parse_args()
 
-if __name__ == '__main__':
-    print("This module provides export_trades_and_dashboard_to_excel(trades_df, dashboard, excel_path) function.")
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    summary = export_workbook(pd.read_csv(args.trades, parse_dates=['entry_time', 'exit_time']), args.out)
+    print(f"{len(summary)} symbols written to {args.out}")
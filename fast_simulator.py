@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import strategy_logic
+import strategy_logging
+from backtest_runner import BROKER_SETTINGS, run_backtest
+
+# Vectorized fast path for the strategy_logic strategies, for screening large
+# symbol x parameter grids before sending survivors through Cerebro.
+#
+# Indicators come from each strategy's precompute(), so they are the exact
+# backtrader values. The strategy's own entry_rule() and exit_rule() run on
+# whole arrays: entry signals are a boolean array, and a small state machine
+# then jumps from entry to exit. It reproduces the broker setup in
+# backtest_runner: market orders fill at the signal bar's close (cheat on
+# close) and are processed on the following bar, and commission is a
+# percentage of traded value. The monthly force-close timer is a no-op in
+# Cerebro (its callback is passed as a timer kwarg and never invoked), so it
+# is not modelled.
+#
+# simulate() returns trades in TradeLogger's schema, with TradeLogger's
+# quirks: times are truncated to the day, exit_price repeats the entry price
+# (trade.price is the average entry price), and the fill is stamped on the
+# bar after the order. trade_id counts from 1 per run; in Cerebro it is the
+# process-wide Trade.ref.
+
+TRADE_COLUMNS = ['trade_id', 'symbol', 'entry_time', 'exit_time', 'entry_price', 'exit_price',
+                 'size', 'status', 'pnl', 'pnlcomm', 'duration']
+
+
+def simulate(df, strategy_cls, symbol='', cash=BROKER_SETTINGS['cash'],
+             commission=BROKER_SETTINGS['commission'], indicators=None, **kwargs):
+    """Trades of strategy_cls on df (lowercase OHLCV columns) without Cerebro.
+
+    indicators can hold precompute() output for a longer history than df; it
+    is aligned to df's index instead of being recomputed.
+    """
+    p = strategy_logic._resolve_params(strategy_cls, kwargs)
+    if indicators is None:
+        columns = strategy_cls.precompute(df, **kwargs)
+    else:
+        columns = indicators.reindex(df.index)
+    close = df['close'].to_numpy(dtype='float64')
+    arrays = {'close': close, 'low': df['low'].to_numpy(dtype='float64')}
+    arrays.update((column, columns[column].to_numpy(dtype='float64')) for column in strategy_cls.precomputed_lines)
+    with np.errstate(invalid='ignore'):
+        entry, stop, take = strategy_cls.entry_rule(p, strategy_logic.array_bar(arrays))
+    n = len(close)
+    days = df.index.values.astype('datetime64[D]').astype('datetime64[ns]')
+
+    # next() first runs once every indicator has a value
+    first_bar = strategy_cls.warmup_bars(p) - 1
+    entries = np.flatnonzero(entry)
+    entries = entries[entries >= first_bar]
+    fraction = strategy_cls.position_fraction
+
+    records = []
+    t = first_bar
+    while True:
+        # Next entry signal while flat; an order on the last bar never fills
+        k = np.searchsorted(entries, t)
+        if k == len(entries) or entries[k] >= n - 1:
+            break
+        t = entries[k]
+        price = close[t]
+        size = cash * fraction / price
+        comm_in = size * price * commission
+        cash -= size * price + comm_in
+
+        # Exit checks start on the fill bar
+        with np.errstate(invalid='ignore'):
+            hit = strategy_cls.exit_rule(p, strategy_logic.array_bar(arrays, t + 1), stop[t], take[t])
+        hits = np.flatnonzero(hit)
+        j = t + 1 + hits[0] if len(hits) else None
+
+        record = {
+            'trade_id': len(records) + 1,
+            'symbol': symbol,
+            'entry_time': pd.Timestamp(days[t + 1]),
+            'exit_time': pd.NaT,
+            'entry_price': price,
+            'exit_price': None,
+            'size': size,
+            'status': 'open',
+            'pnl': 0,
+            'pnlcomm': 0,
+            'duration': 0,
+        }
+        records.append(record)
+        if j is None or j >= n - 1:
+            # Still open at the end of the data
+            break
+
+        exit_price = close[j]
+        pnl = size * (exit_price - price)
+        comm_out = size * exit_price * commission
+        cash += size * exit_price - comm_out
+        exit_time = pd.Timestamp(days[j + 1])
+        record.update({
+            'exit_time': exit_time,
+            'exit_price': price,
+            'status': 'closed',
+            'pnl': pnl,
+            'pnlcomm': pnl - comm_in - comm_out,
+            'duration': (exit_time - record['entry_time']).total_seconds() / (3600 * 24),
+        })
+        t = j + 1
+
+    return pd.DataFrame(records, columns=TRADE_COLUMNS)
+
+
+def compare_with_cerebro(df, strategy_cls, symbol='X', rtol=1e-6, **kwargs):
+    """Equivalence check of simulate() against a line-based Cerebro run.
+
+    Returns (ok, report) where report lists the first differences found.
+    trade_id is not compared.
+    """
+    with strategy_logging.disabled():
+        expected = run_backtest(symbol, df, strategy=strategy_cls, precomputed=False, strategy_kwargs=kwargs)
+    actual = simulate(df, strategy_cls, symbol=symbol, **kwargs)
+
+    report = []
+    if len(expected) != len(actual):
+        report.append(f"trade count: cerebro {len(expected)}, simulator {len(actual)}")
+        return False, report
+    if expected.empty:
+        return True, report
+
+    for column in ['status', 'entry_time', 'exit_time']:
+        same = (expected[column].isna() & actual[column].isna()) | (expected[column] == actual[column])
+        if not same.all():
+            i = int(np.flatnonzero(~same.to_numpy())[0])
+            report.append(f"{column} differs at trade {i}: {expected[column].iloc[i]} vs {actual[column].iloc[i]}")
+    for column in ['entry_price', 'exit_price', 'size', 'pnl', 'pnlcomm', 'duration']:
+        e = pd.to_numeric(expected[column]).to_numpy(dtype='float64')
+        a = pd.to_numeric(actual[column]).to_numpy(dtype='float64')
+        if not np.allclose(e, a, rtol=rtol, atol=1e-6, equal_nan=True):
+            i = int(np.flatnonzero(~np.isclose(e, a, rtol=rtol, atol=1e-6, equal_nan=True))[0])
+            report.append(f"{column} differs at trade {i}: {e[i]} vs {a[i]}")
+    return not report, report
+
+
+def screen(data, strategy_cls, param_sets, min_trades=1, top=None):
+    """Run every symbol x parameter set through simulate() and rank by total return.
+
+    data is {symbol: OHLCV frame}, param_sets a list of strategy kwargs dicts.
+    Returns one row per combination with its closed-trade summary; pass the
+    best rows to Cerebro for the full analysis.
+    """
+    rows = []
+    for symbol, df in data.items():
+        for i, kwargs in enumerate(param_sets):
+            trades = simulate(df, strategy_cls, symbol=symbol, **kwargs)
+            closed = trades[trades['status'] == 'closed']
+            pnlcomm = closed['pnlcomm'].to_numpy(dtype='float64')
+            rows.append({
+                'symbol': symbol,
+                'param_set': i,
+                **kwargs,
+                'total_trades': len(closed),
+                'win_rate': (pnlcomm > 0).mean() * 100 if len(pnlcomm) else np.nan,
+                'total_return_pct': pnlcomm.sum() / BROKER_SETTINGS['cash'] * 100,
+            })
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    results = results[results['total_trades'] >= min_trades]
+    results = results.sort_values('total_return_pct', ascending=False, ignore_index=True)
+    return results.head(top) if top is not None else results
+
+
+if __name__ == '__main__':
+    # Equivalence harness: simulator vs Cerebro on stored symbols, or on
+    # synthetic bars when the store is empty
+    from bar_store import BarStore
+    from downloader import generate_ohlcv
+
+    store = BarStore()
+    symbols = store.symbols('1D')
+    if symbols:
+        data = {s: store.read(s, '1D').rename(columns=str.lower) for s in symbols}
+    else:
+        data = {f"SYN{i}": generate_ohlcv(1260, seed=i).rename(columns=str.lower) for i in range(3)}
+
+    failures = 0
+    for symbol, df in data.items():
+        for strategy_cls in strategy_logic.STRATEGIES:
+            ok, report = compare_with_cerebro(df, strategy_cls, symbol=symbol)
+            print(f"{symbol} {strategy_cls.__name__}: {'OK' if ok else 'MISMATCH'}")
+            for line in report:
+                print(f"    {line}")
+            failures += not ok
+    print(f"{failures} mismatches.")
@@ -0,0 +1,247 @@
+import numpy as np
+from itertools import product
+
+# Batched indicator engine for parameter sweeps.
+#
+# Every function takes one price/volume series and a list of periods (or
+# parameter tuples) and returns a 2-D float64 array of shape
+# (bars, parameter sets), column j matching the j-th parameter set.
+# Values follow the pandas definitions used in calculate_indicators.py:
+# ewm(span=p, adjust=False) for EMAs and rolling(p) for SMA/min/max, with
+# NaN where the rolling window is not full yet.
+
+EMA_BLOCK = 16
+
+
+def _as_series(x):
+    return np.ascontiguousarray(x, dtype='float64')
+
+
+def _ema_columns(x, alphas, block=EMA_BLOCK):
+    """EMA recursion y[t] = (1 - a) * y[t-1] + a * x[t] for every column at once.
+
+    x is (bars, k) and alphas is (k,). Bars are processed in blocks: inside a
+    block the recursion is unrolled into a lower-triangular matrix of decay
+    weights, so there is one matrix product per block instead of one Python
+    step per bar. All weights are powers of (1 - a) <= 1, so long series and
+    short spans stay numerically stable.
+    """
+    n, k = x.shape
+    out = np.empty((n, k))
+    if n == 0:
+        return out
+    alphas = np.asarray(alphas, dtype='float64')
+    decay = 1.0 - alphas
+
+    lags = np.arange(block)[:, None] - np.arange(block)[None, :]  # i - j
+    # weights[c, i, j] = a * (1 - a) ** (i - j) for j <= i
+    weights = np.where(lags[None, :, :] >= 0,
+                       alphas[:, None, None] * decay[:, None, None] ** np.maximum(lags, 0)[None, :, :],
+                       0.0)
+    # carry[i, c] = (1 - a) ** (i + 1), the weight of the previous block's last value
+    carry = decay[None, :] ** np.arange(1, block + 1)[:, None]
+
+    # pandas seeds the recursion with the first observation
+    prev = x[0].copy()
+    start = 1
+    out[0] = prev
+    while start < n:
+        stop = min(start + block, n)
+        m = stop - start
+        chunk = np.einsum('cij,jc->ic', weights[:, :m, :m], x[start:stop])
+        chunk += carry[:m] * prev[None, :]
+        out[start:stop] = chunk
+        prev = chunk[-1]
+        start = stop
+    return out
+
+
+def ema_grid(close, periods):
+    """EMA(span=p) for every p in periods"""
+    close = _as_series(close)
+    periods = np.asarray(periods, dtype='float64')
+    x = np.broadcast_to(close[:, None], (len(close), len(periods)))
+    return _ema_columns(x, 2.0 / (periods + 1.0))
+
+
+def sma_grid(x, periods):
+    """Rolling mean over every window length in periods, from one cumulative sum"""
+    x = _as_series(x)
+    n = len(x)
+    periods = np.asarray(periods, dtype='int64')
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    rows = np.arange(n)[:, None]
+    lo = rows + 1 - periods[None, :]
+    out = (csum[rows + 1] - csum[np.maximum(lo, 0)]) / periods[None, :]
+    out[lo < 0] = np.nan
+    return out
+
+
+def _rolling_extreme_grid(x, periods, reduce):
+    """Rolling min/max for every period from a shared sparse table.
+
+    level j holds the extreme over windows of 2**j bars; any window of p
+    bars is covered by two overlapping level-floor(log2 p) windows.
+    """
+    x = _as_series(x)
+    n = len(x)
+    periods = np.asarray(periods, dtype='int64')
+    out = np.full((n, len(periods)), np.nan)
+    if n == 0 or len(periods) == 0:
+        return out
+
+    levels = [x]
+    width = 1
+    while width * 2 <= min(periods.max(), n):
+        prev = levels[-1]
+        levels.append(reduce(prev[:-width], prev[width:]))
+        width *= 2
+
+    for col, p in enumerate(periods):
+        if p > n:
+            continue
+        j = int(np.log2(p))
+        table = levels[j]
+        span = 1 << j
+        # Window ending at bar i starts at i - p + 1
+        ends = np.arange(p - 1, n)
+        out[p - 1:, col] = reduce(table[ends - p + 1], table[ends - span + 1])
+    return out
+
+
+def donchian_low_grid(low, periods):
+    """Rolling minimum of low for every period (Donchian lower band)"""
+    return _rolling_extreme_grid(low, periods, np.minimum)
+
+
+def donchian_high_grid(high, periods):
+    """Rolling maximum of high for every period (Donchian upper band)"""
+    return _rolling_extreme_grid(high, periods, np.maximum)
+
+
+def macd_hist_grid(close, combos):
+    """MACD histogram for every (fast, slow, signal) tuple in combos.
+
+    Each distinct EMA span is computed once and shared by all combos using
+    it; the signal EMAs of all combos then run as one batch.
+    """
+    close = _as_series(close)
+    combos = [tuple(int(v) for v in c) for c in combos]
+    spans = sorted({c[0] for c in combos} | {c[1] for c in combos})
+    emas = ema_grid(close, spans)
+    column = {span: i for i, span in enumerate(spans)}
+
+    macd = np.empty((len(close), len(combos)))
+    for j, (fast, slow, _) in enumerate(combos):
+        macd[:, j] = emas[:, column[fast]] - emas[:, column[slow]]
+    signal_periods = np.array([c[2] for c in combos], dtype='float64')
+    signal = _ema_columns(macd, 2.0 / (signal_periods + 1.0))
+    return macd - signal
+
+
+def volume_osc_grid(volume, pairs):
+    """(SMA(short) - SMA(long)) / SMA(long) for every (short, long) pair"""
+    pairs = [tuple(int(v) for v in p) for p in pairs]
+    periods = sorted({p[0] for p in pairs} | {p[1] for p in pairs})
+    smas = sma_grid(volume, periods)
+    column = {period: i for i, period in enumerate(periods)}
+    short = smas[:, [column[p[0]] for p in pairs]]
+    long = smas[:, [column[p[1]] for p in pairs]]
+    return (short - long) / long
+
+
+def macd_combos(fast, slow, signal):
+    """All (fast, slow, signal) combinations with fast < slow"""
+    return [c for c in product(fast, slow, signal) if c[0] < c[1]]
+
+
+def indicator_grid(df, ema=(), sma=(), macd=(), donchian=(), volume_osc=()):
+    """Compute every requested grid for one OHLCV frame.
+
+    Returns {name: (values, parameter sets)}; donchian produces both the
+    'donchian_low' and 'donchian_high' entries.
+    """
+    close = df['Close'].to_numpy(dtype='float64')
+    grids = {}
+    if len(ema):
+        grids['ema'] = (ema_grid(close, ema), list(ema))
+    if len(sma):
+        grids['sma'] = (sma_grid(close, sma), list(sma))
+    if len(macd):
+        grids['macd_hist'] = (macd_hist_grid(close, macd), list(macd))
+    if len(donchian):
+        grids['donchian_low'] = (donchian_low_grid(df['Low'].to_numpy(dtype='float64'), donchian), list(donchian))
+        grids['donchian_high'] = (donchian_high_grid(df['High'].to_numpy(dtype='float64'), donchian), list(donchian))
+    if len(volume_osc):
+        grids['volume_osc'] = (volume_osc_grid(df['Volume'].to_numpy(dtype='float64'), volume_osc), list(volume_osc))
+    return grids
+
+
+# Single-series versions following backtrader's definitions, used to feed
+# precomputed lines to the strategies. backtrader seeds an EMA with the SMA of
+# its first `period` valid inputs instead of the first observation, leaves
+# NaN while an indicator is warming up, and keeps the last non-zero
+# difference when deciding whether two lines crossed.
+
+def bt_sma(x, period):
+    """bt.indicators.SMA"""
+    x = _as_series(x)
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(x, period)
+        out[period - 1:] = windows.sum(axis=1) / period
+    return out
+
+
+def bt_ema(x, period):
+    """bt.indicators.EMA, also valid for inputs with a NaN warm-up prefix"""
+    x = _as_series(x)
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0 or len(x) - valid[0] < period:
+        return out
+    seed_at = valid[0] + period - 1
+    alpha = 2.0 / (period + 1.0)
+    alpha1 = 1.0 - alpha
+    # One column is cheaper as a plain loop than as blocks, and this is
+    # backtrader's own update order
+    prev = x[valid[0]:seed_at + 1].sum() / period
+    values = [prev]
+    for value in x[seed_at + 1:].tolist():
+        prev = prev * alpha1 + value * alpha
+        values.append(prev)
+    out[seed_at:] = values
+    return out
+
+
+def bt_lowest(x, period):
+    """bt.indicators.Lowest"""
+    return donchian_low_grid(x, [period])[:, 0]
+
+
+def bt_highest(x, period):
+    """bt.indicators.Highest"""
+    return donchian_high_grid(x, [period])[:, 0]
+
+
+def bt_crossover(a, b):
+    """bt.indicators.CrossOver: 1.0 on an upward cross, -1.0 downward, else 0.0"""
+    a = _as_series(a)
+    b = _as_series(b)
+    out = np.full(len(a), np.nan)
+    diff = a - b
+    valid = np.flatnonzero(~np.isnan(diff))
+    if len(valid) < 2:
+        return out
+    start = valid[0]
+    # Last non-zero difference, seeded with the first valid one
+    keep = diff != 0
+    keep[start] = True
+    keep[:start] = False
+    last = np.maximum.accumulate(np.where(keep, np.arange(len(diff)), 0))
+    nzd = diff[last]
+    prev = nzd[start:-1]
+    up = (prev < 0.0) & (a[start + 1:] > b[start + 1:])
+    down = (prev > 0.0) & (a[start + 1:] < b[start + 1:])
+    out[start + 1:] = up.astype('float64') - down.astype('float64')
+    return out
@@ -0,0 +1,376 @@
+import json
+import math
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+from calculate_indicators import params
+from indicator_engine import bt_sma, bt_lowest, bt_highest, bt_crossover
+
+# Incremental indicator state.
+#
+# Each state object carries exactly what its indicator needs to produce the
+# next value: the last EMA value, the rolling window for SMAs, or a monotonic
+# deque for rolling min/max. Feeding new bars through update() costs O(new
+# bars) and gives the same values as recomputing the pandas columns in
+# calculate_indicators.py over the full history.
+
+
+class EMAState:
+    """pandas ewm(span, adjust=False).mean(), one value at a time"""
+
+    def __init__(self, span, value=None):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = value
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def spec(self):
+        return [self.span]
+
+    def to_dict(self):
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['span'], d['value'])
+
+
+class RollingMeanState:
+    """pandas rolling(window).mean(), NaN until the window is full"""
+
+    def __init__(self, window, buffer=()):
+        self.window = window
+        self.buffer = deque(buffer, maxlen=window)
+
+    def update(self, x):
+        self.buffer.append(x)
+        if len(self.buffer) < self.window:
+            return math.nan
+        return math.fsum(self.buffer) / self.window
+
+    def spec(self):
+        return [self.window]
+
+    def to_dict(self):
+        return {'window': self.window, 'buffer': list(self.buffer)}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['window'], d['buffer'])
+
+
+class RollingExtremeState:
+    """pandas rolling(window).min() / .max() using a monotonic deque.
+
+    The deque holds (bar number, value) pairs with values increasing (min) or
+    decreasing (max) from the front, so the front is always the window's
+    extreme and each bar is pushed and popped at most once.
+    """
+
+    def __init__(self, window, kind='min', count=0, candidates=()):
+        self.window = window
+        self.kind = kind
+        self.count = count
+        self.candidates = deque(tuple(c) for c in candidates)
+
+    def update(self, x):
+        candidates = self.candidates
+        if self.kind == 'min':
+            while candidates and candidates[-1][1] >= x:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] <= x:
+                candidates.pop()
+        candidates.append((self.count, x))
+        # Drop the front once it falls out of the window ending at this bar
+        if candidates[0][0] <= self.count - self.window:
+            candidates.popleft()
+        self.count += 1
+        if self.count < self.window:
+            return math.nan
+        return candidates[0][1]
+
+    def spec(self):
+        return [self.window, self.kind]
+
+    def to_dict(self):
+        return {'window': self.window, 'kind': self.kind, 'count': self.count,
+                'candidates': [list(c) for c in self.candidates]}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['window'], d['kind'], d['count'], d['candidates'])
+
+
+class MACDHistState:
+    """EMA(fast) - EMA(slow) minus its EMA(signal), as in calculate_indicators.py"""
+
+    def __init__(self, fast, slow, signal, states=None):
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        states = states or {}
+        self.ema_fast = EMAState.from_dict(states['ema_fast']) if 'ema_fast' in states else EMAState(fast)
+        self.ema_slow = EMAState.from_dict(states['ema_slow']) if 'ema_slow' in states else EMAState(slow)
+        self.ema_signal = EMAState.from_dict(states['ema_signal']) if 'ema_signal' in states else EMAState(signal)
+
+    def update(self, x):
+        macd = self.ema_fast.update(x) - self.ema_slow.update(x)
+        return macd - self.ema_signal.update(macd)
+
+    def spec(self):
+        return [self.fast, self.slow, self.signal]
+
+    def to_dict(self):
+        return {'fast': self.fast, 'slow': self.slow, 'signal': self.signal,
+                'states': {'ema_fast': self.ema_fast.to_dict(),
+                           'ema_slow': self.ema_slow.to_dict(),
+                           'ema_signal': self.ema_signal.to_dict()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['fast'], d['slow'], d['signal'], d['states'])
+
+
+class VolumeOscState:
+    """(SMA(short) - SMA(long)) / SMA(long)"""
+
+    def __init__(self, short, long, states=None):
+        self.short = short
+        self.long = long
+        states = states or {}
+        self.short_mean = RollingMeanState.from_dict(states['short']) if 'short' in states else RollingMeanState(short)
+        self.long_mean = RollingMeanState.from_dict(states['long']) if 'long' in states else RollingMeanState(long)
+
+    def update(self, x):
+        short = self.short_mean.update(x)
+        long = self.long_mean.update(x)
+        if long == 0:
+            # Zero-volume bars: what pandas gives for division by zero
+            diff = short - long
+            return math.copysign(math.inf, diff) if diff else math.nan
+        return (short - long) / long
+
+    def spec(self):
+        return [self.short, self.long]
+
+    def to_dict(self):
+        return {'short': self.short, 'long': self.long,
+                'states': {'short': self.short_mean.to_dict(), 'long': self.long_mean.to_dict()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['short'], d['long'], d['states'])
+
+
+STATE_TYPES = {cls.__name__: cls for cls in
+               (EMAState, RollingMeanState, RollingExtremeState, MACDHistState, VolumeOscState)}
+
+
+class IndicatorState:
+    """Named indicator columns, each fed from one input column of the bar frame"""
+
+    def __init__(self, columns, last_timestamp=None):
+        # columns: {output column: (input column, state object)}
+        self.columns = columns
+        self.last_timestamp = last_timestamp
+
+    def update(self, df):
+        """Feed bars after last_timestamp and return them with the indicator columns"""
+        if self.last_timestamp is not None:
+            df = df[df.index > self.last_timestamp]
+        df = df.copy()
+        if df.empty:
+            for name in self.columns:
+                df[name] = pd.Series(dtype='float64')
+            return df
+
+        inputs = {col: df[col].to_numpy(dtype='float64').tolist()
+                  for col in {source for source, _ in self.columns.values()}}
+        for name, (source, state) in self.columns.items():
+            update = state.update
+            df[name] = [update(x) for x in inputs[source]]
+        self.last_timestamp = df.index[-1]
+        return df
+
+    def spec(self):
+        """Column layout and periods, to detect saved state built from other params"""
+        return {name: [source, type(state).__name__, state.spec()]
+                for name, (source, state) in self.columns.items()}
+
+    def to_dict(self):
+        return {
+            'last_timestamp': None if self.last_timestamp is None else self.last_timestamp.isoformat(),
+            'columns': {name: [source, type(state).__name__, state.to_dict()]
+                        for name, (source, state) in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        columns = {name: (source, STATE_TYPES[kind].from_dict(state))
+                   for name, (source, kind, state) in d['columns'].items()}
+        last = d['last_timestamp']
+        return cls(columns, None if last is None else pd.Timestamp(last))
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# State builders producing the same columns as the calculate_indicators.py functions
+
+def emavolmacd_state(params=params):
+    return IndicatorState({
+        f'EMA_{params["emavolmacd_ema_period"]}': ('Close', EMAState(params['emavolmacd_ema_period'])),
+        'Volume_Osc': ('Volume', VolumeOscState(params['volume_short_period'], params['volume_long_period'])),
+        'MACD_Hist': ('Close', MACDHistState(params['emavolmacd_macd_fast'], params['emavolmacd_macd_slow'],
+                                             params['emavolmacd_macd_signal'])),
+        f'Donchian_Lower_{params["emavolmacd_donchian_period"]}': (
+            'Low', RollingExtremeState(params['emavolmacd_donchian_period'], 'min')),
+    })
+
+
+def emacrossover_state(params=params):
+    return IndicatorState({
+        f'EMA_{params["emacrossover_ema_fast"]}': ('Close', EMAState(params['emacrossover_ema_fast'])),
+        f'SMA_long_{params["emacrossover_sma_medium"]}': ('Close', RollingMeanState(params['emacrossover_sma_medium'])),
+    })
+
+
+def emamacd_state(params=params):
+    return IndicatorState({
+        f'EMA_{params["emamacd_ema_period"]}': ('Close', EMAState(params['emamacd_ema_period'])),
+        'MACD_Hist': ('Close', MACDHistState(params['emamacd_macd_fast'], params['emamacd_macd_slow'],
+                                             params['emamacd_macd_signal'])),
+        # calculate_indicatorsEMAMACD names the column after the EMAMACD period
+        # but sizes the window with the EMAVolMACD one; kept identical here
+        f'Donchian_Lower_{params["emamacd_donchian_period"]}': (
+            'Low', RollingExtremeState(params['emavolmacd_donchian_period'], 'min')),
+    })
+
+
+
+# Chunked counterparts of indicator_engine's bt_* functions.
+#
+# The strategies' precompute() columns are built from these, so a long
+# (e.g. minute-bar) history can be fed through update() one chunk at a time
+# and give exactly the values of one pass over the whole history. Window
+# indicators carry the last period - 1 inputs into the next chunk and rerun
+# the vectorized bt_* function over carry + chunk; the EMA carries its last
+# value (or its seed values); the crossover carries the last non-zero
+# difference.
+
+
+class WindowChunkState:
+    """bt_sma / bt_lowest / bt_highest over consecutive chunks"""
+    FUNCTIONS = {'sma': bt_sma, 'min': bt_lowest, 'max': bt_highest}
+
+    def __init__(self, period, kind='sma'):
+        self.period = period
+        self.kind = kind
+        self.tail = np.empty(0)
+
+    def update(self, x):
+        x = np.concatenate((self.tail, np.asarray(x, dtype='float64')))
+        out = self.FUNCTIONS[self.kind](x, self.period)[len(self.tail):]
+        self.tail = x[max(len(x) - (self.period - 1), 0):]
+        return out
+
+
+class EMAChunkState:
+    """bt_ema over consecutive chunks, NaN warm-up prefix included.
+
+    Seeded with the mean of the first period valid inputs, then the same
+    recursion as bt_ema, so values are identical.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.value = None
+        self.seed = []
+
+    def update(self, x):
+        x = np.asarray(x, dtype='float64')
+        out = np.full(len(x), np.nan)
+        i = 0
+        if self.value is None:
+            if not self.seed:
+                valid = np.flatnonzero(~np.isnan(x))
+                i = valid[0] if len(valid) else len(x)
+            take = min(self.period - len(self.seed), len(x) - i)
+            self.seed.extend(x[i:i + take].tolist())
+            i += take
+            if len(self.seed) < self.period:
+                return out
+            self.value = np.array(self.seed).sum() / self.period
+            self.seed = []
+            out[i - 1] = self.value
+
+        alpha = 2.0 / (self.period + 1.0)
+        alpha1 = 1.0 - alpha
+        prev = self.value
+        values = []
+        for value in x[i:].tolist():
+            prev = prev * alpha1 + value * alpha
+            values.append(prev)
+        out[i:] = values
+        self.value = prev
+        return out
+
+
+class CrossOverChunkState:
+    """bt_crossover over consecutive chunks"""
+
+    def __init__(self):
+        self.last_diff = None
+
+    def update(self, a, b):
+        a = np.asarray(a, dtype='float64')
+        b = np.asarray(b, dtype='float64')
+        if self.last_diff is not None:
+            # A leading bar whose difference is the carried one
+            out = bt_crossover(np.concatenate(([self.last_diff], a)), np.concatenate(([0.0], b)))[1:]
+        else:
+            out = bt_crossover(a, b)
+        diff = a - b
+        nonzero = diff[(diff != 0) & ~np.isnan(diff)]
+        if len(nonzero):
+            self.last_diff = float(nonzero[-1])
+        elif self.last_diff is None and np.any(diff == 0):
+            self.last_diff = 0.0
+        return out
+
+
+class ChunkedIndicators:
+    """Named chunk states and the function combining them into indicator columns.
+
+    combine(states, df) returns the indicator frame for df, advancing the
+    states; update() feeds consecutive chunks of one history in order.
+    """
+
+    def __init__(self, states, combine):
+        self.states = states
+        self.combine = combine
+        self.last_timestamp = None
+
+    def update(self, df):
+        if self.last_timestamp is not None:
+            df = df[df.index > self.last_timestamp]
+        out = self.combine(self.states, df)
+        if len(df):
+            self.last_timestamp = df.index[-1]
+        return out
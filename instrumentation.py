@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import contextlib
+import pandas as pd
+
+# Pipeline instrumentation.
+#
+# An Instrumentation collects timed spans (data load, feed construction,
+# cerebro.run, analyzer extraction, metrics, rendering) and per-callback
+# latency histograms of the strategy hot path. Spans carry wall-clock
+# timestamps and the process id, so spans from worker processes (sent back
+# as to_dict() with each backtest result) merge into one timeline. Export is
+# plain JSON or Chrome trace format (chrome://tracing, Perfetto).
+#
+# Code that takes an optional instrumentation calls span(instrumentation,
+# ...), which is a no-op for None, so uninstrumented runs pay nothing.
+
+CALLBACKS = ('next', 'notify_order', 'notify_trade')
+
+
+class LatencyHistogram(object):
+    """Latencies in power-of-two nanosecond buckets.
+
+    Bucket i counts calls that took [2**(i-1), 2**i) ns. Adding a sample is
+    a bit_length() and a list increment, cheap enough for every bar.
+    """
+    BUCKETS = 40  # up to ~9 minutes
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.counts[min(ns.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, q):
+        """Upper bound (ns) of the bucket holding the q-th percentile"""
+        if not self.count:
+            return 0
+        target = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(2 ** i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {'count': self.count, 'total_ns': self.total_ns, 'max_ns': self.max_ns,
+                'counts': list(self.counts)}
+
+    @classmethod
+    def from_dict(cls, d):
+        histogram = cls()
+        histogram.counts = list(d['counts'])
+        histogram.count = d['count']
+        histogram.total_ns = d['total_ns']
+        histogram.max_ns = d['max_ns']
+        return histogram
+
+
+class Instrumentation(object):
+    """Timed spans and latency histograms of one pipeline run"""
+
+    def __init__(self):
+        self.spans = []
+        self.histograms = {}
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        start_ns = time.time_ns()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.spans.append({'name': name, 'start_ns': start_ns,
+                               'duration_ns': time.perf_counter_ns() - start,
+                               'pid': os.getpid(), 'args': args})
+
+    def histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram()
+        return self.histograms[name]
+
+    def add_latencies(self, histograms):
+        for name, histogram in histograms.items():
+            self.histogram(name).merge(histogram)
+
+    def to_dict(self):
+        return {'spans': list(self.spans),
+                'histograms': {name: h.to_dict() for name, h in self.histograms.items()}}
+
+    def merge(self, d):
+        """Add spans and histograms from another run's to_dict() (e.g. a worker's)"""
+        self.spans.extend(d['spans'])
+        self.add_latencies({name: LatencyHistogram.from_dict(h) for name, h in d['histograms'].items()})
+
+    def span_summary(self):
+        """Per span name: count, total, mean and max seconds"""
+        if not self.spans:
+            return pd.DataFrame(columns=['count', 'total_s', 'mean_s', 'max_s'])
+        spans = pd.DataFrame(self.spans)
+        seconds = spans['duration_ns'] / 1e9
+        summary = seconds.groupby(spans['name'], sort=False).agg(['count', 'sum', 'mean', 'max'])
+        summary.columns = ['count', 'total_s', 'mean_s', 'max_s']
+        return summary
+
+    def latency_summary(self):
+        """Per callback: calls, total seconds and p50/p90/p99/max microseconds"""
+        rows = {}
+        for name, h in self.histograms.items():
+            rows[name] = {'calls': h.count, 'total_s': h.total_ns / 1e9,
+                          'mean_us': h.total_ns / h.count / 1e3 if h.count else 0.0,
+                          'p50_us': h.percentile(50) / 1e3, 'p90_us': h.percentile(90) / 1e3,
+                          'p99_us': h.percentile(99) / 1e3, 'max_us': h.max_ns / 1e3}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def write_chrome_trace(self, path):
+        """Spans as complete ('X') events, histograms as trace metadata"""
+        events = [{'name': s['name'], 'ph': 'X', 'ts': s['start_ns'] / 1e3, 'dur': s['duration_ns'] / 1e3,
+                   'pid': s['pid'], 'tid': s['pid'], 'args': s['args']}
+                  for s in self.spans]
+        trace = {'traceEvents': events, 'displayTimeUnit': 'ms',
+                 'metadata': {'latency_us': self.latency_summary().to_dict(orient='index')}}
+        with open(path, "w") as f:
+            json.dump(trace, f)
+
+    def write(self, path, fmt='json'):
+        if fmt == 'chrome':
+            self.write_chrome_trace(path)
+        else:
+            self.write_json(path)
+
+
+def span(instrumentation, name, **args):
+    """instrumentation.span(), or a no-op when instrumentation is None"""
+    if instrumentation is None:
+        return contextlib.nullcontext()
+    return instrumentation.span(name, **args)
+
+
+def _timed(name, method):
+    perf_counter_ns = time.perf_counter_ns
+
+    def timed(self, *args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.latency[name].add(perf_counter_ns() - start)
+    timed.__name__ = method.__name__
+    return timed
+
+
+_instrumented = {}
+
+
+def instrument_strategy(strategy_cls, callbacks=CALLBACKS):
+    """Subclass of strategy_cls timing each callback into self.latency histograms"""
+    key = (strategy_cls, tuple(callbacks))
+    if key in _instrumented:
+        return _instrumented[key]
+
+    def __init__(self, *args, **kwargs):
+        self.latency = {name: LatencyHistogram() for name in callbacks}
+        super(cls, self).__init__(*args, **kwargs)
+
+    namespace = {name: _timed(name, getattr(strategy_cls, name)) for name in callbacks}
+    namespace['__init__'] = __init__
+    namespace['__module__'] = strategy_cls.__module__
+    cls = type(strategy_cls.__name__, (strategy_cls,), namespace)
+    _instrumented[key] = cls
+    return cls
+
+
+@contextlib.contextmanager
+def capture(mode, path):
+    """Profile the enclosed code with cProfile (pstats file) or pyinstrument (HTML).
+
+    Only the calling process is profiled; run backtests with one worker to
+    include them.
+    """
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    elif mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("pyinstrument capture requires the pyinstrument package")
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+    else:
+        raise ValueError(f"Unknown capture mode {mode!r}")
@@ -0,0 +1,127 @@
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import backtrader as bt
+import strategy_logic
+import strategy_logging
+from bar_store import PartitionedBarStore
+from backtest_runner import BROKER_SETTINGS, build_cerebro
+from streaming_feed import PartitionedData
+from trade_logger import TradeLogger
+from equity_logger import EquityLogger
+from performance_metrics import calculate_backtest_metrics
+
+# Intraday backtests streamed from a PartitionedBarStore.
+#
+# Each symbol runs through PartitionedData with preload=False, so Cerebro
+# pulls one partition at a time and the strategy's indicator lines are
+# computed per partition with carried state. exactbars=1 keeps line buffers
+# at the strategies' lookback. Memory is bounded by one partition plus the
+# trade log (which can spill to disk) rather than by the history length.
+#
+# Trade times keep their minutes, and trade duration is re-expressed in bars
+# so calculate_backtest_metrics(minutes_per_bar=...) reports hours correctly.
+
+_UNITS = {'m': 1, 'h': 60, 'D': 1440}
+
+
+def minutes_per_bar(timeframe):
+    """Minutes in one bar of a timeframe name such as '1m', '15m', '1h' or '1D'"""
+    match = re.fullmatch(r'(\d+)([mhD])', timeframe)
+    if match is None:
+        raise ValueError(f"Unknown timeframe {timeframe!r}")
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+def run_intraday_backtest(symbol, strategy=strategy_logic.EMAMACDStrategy, timeframe='1m', store_root=None,
+                          start=None, end=None, strategy_kwargs=None, broker_settings=BROKER_SETTINGS,
+                          equity=False, spill_dir=None):
+    """Stream one symbol's stored bars through Cerebro and return the TradeLogger frame.
+
+    With equity=True returns (trades, EquityLogger arrays); the equity
+    arrays grow with the number of bars. spill_dir lets the trade log spill
+    closed trades to disk.
+    """
+    strategy_kwargs = strategy_kwargs or {}
+    minutes = minutes_per_bar(timeframe)
+    cerebro = build_cerebro(broker_settings)
+    cerebro.adddata(PartitionedData(root=store_root, symbol=symbol, bars=timeframe, start=start, end=end,
+                                    strategy=strategy, strategy_kwargs=strategy_kwargs, name=symbol,
+                                    timeframe=bt.TimeFrame.Minutes, compression=minutes))
+    cerebro.addstrategy(strategy, precomputed=True, **strategy_kwargs)
+    cerebro.addanalyzer(TradeLogger, _name='trade_logger', day_precision=False, spill_dir=spill_dir)
+    if equity:
+        cerebro.addanalyzer(EquityLogger, _name='equity_logger')
+
+    strat = cerebro.run(preload=False, runonce=False, exactbars=1, stdstats=False)[0]
+    trades = strat.analyzers.trade_logger.get_analysis()
+    if not trades.empty:
+        elapsed = (trades['exit_time'] - trades['entry_time']).dt.total_seconds() / 60
+        trades['duration'] = (elapsed / minutes).where(trades['status'] == 'closed', 0.0)
+    if equity:
+        return trades, strat.analyzers.equity_logger.get_analysis()
+    return trades
+
+
+def _intraday_task(symbol, strategy, timeframe, store_root, start, end, strategy_kwargs, broker_settings):
+    try:
+        with strategy_logging.disabled():
+            trades = run_intraday_backtest(symbol, strategy, timeframe, store_root, start, end,
+                                           strategy_kwargs, broker_settings)
+    except Exception as e:
+        return symbol, None, f"{type(e).__name__}: {e}"
+    return symbol, trades, None
+
+
+def run_intraday(symbols=None, strategy=strategy_logic.EMAMACDStrategy, timeframe='1m', store_root=None,
+                 start=None, end=None, strategy_kwargs=None, broker_settings=BROKER_SETTINGS, max_workers=None):
+    """run_intraday_backtest() for many symbols across a process pool.
+
+    Yields (symbol, trades, error) as symbols finish; symbols defaults to
+    every symbol stored for timeframe.
+    """
+    if symbols is None:
+        store = PartitionedBarStore(store_root) if store_root else PartitionedBarStore()
+        symbols = store.symbols(timeframe)
+    args = (strategy, timeframe, store_root, start, end, strategy_kwargs, broker_settings)
+    if max_workers == 1:
+        for symbol in symbols:
+            yield _intraday_task(symbol, *args)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_intraday_task, symbol, *args) for symbol in symbols]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+if __name__ == '__main__':
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Backtest intraday bars streamed from the partitioned store")
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--strategy', default='EMAMACDStrategy', help="class name in strategy_logic")
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default="intraday_trades.csv")
+    args = parser.parse_args()
+
+    strategy_cls = getattr(strategy_logic, args.strategy)
+    minutes = minutes_per_bar(args.timeframe)
+    results = []
+    for symbol, trades, error in run_intraday(strategy=strategy_cls, timeframe=args.timeframe, start=args.start,
+                                              end=args.end, max_workers=args.workers):
+        if error is not None:
+            print(f"Backtest failed for {symbol}: {error}")
+            continue
+        if trades.empty:
+            print(f"No results for {symbol}")
+            continue
+        trades['symbol'] = symbol
+        results.append(trades)
+        metrics = calculate_backtest_metrics(trades.copy(), initial_capital=BROKER_SETTINGS['cash'],
+                                             minutes_per_bar=minutes)
+        print(f"{symbol}: {metrics}")
+    if results:
+        pd.concat(results, ignore_index=True).to_csv(args.out, index=False)
+        print(f"Trades written to {args.out}")
@@ -0,0 +1,138 @@
+import os
+import json
+import uuid
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+# Read-only memory-mapped OHLCV arrays shared by backtest worker processes.
+#
+# Layout of a memmap directory:
+#   datetime.GEN.npy, open.GEN.npy, ..., volume.GEN.npy
+#       float64 arrays holding every symbol back to back. datetime is stored
+#       as backtrader date numbers so feeds can copy it straight into lines.
+#       GEN names the write that produced them.
+#   index.json
+#       {"generation": GEN, "symbols": {symbol: [offset, length]}} into
+#       those arrays.
+#
+# Every process maps the same files, so the OS page cache holds one physical
+# copy of the bars no matter how many workers read them. A rewrite creates
+# new array files and replaces index.json last, so readers see either the
+# old or the new bars, never a mix, and mappings already open keep theirs.
+
+MEMMAP_DIR = os.path.join("data", "memmap")
+FIELDS = ['datetime', 'open', 'high', 'low', 'close', 'volume']
+
+
+def _array_path(root, field, generation):
+    return os.path.join(root, f"{field}.{generation}.npy")
+
+
+def write_memmap_bars(data, root):
+    """Write {symbol: OHLCV frame} into a memmap directory.
+
+    Arrays of earlier writes are removed once the new index is in place.
+    """
+    os.makedirs(root, exist_ok=True)
+    generation = uuid.uuid4().hex[:12]
+    symbols = sorted(data)
+    index = {}
+    offset = 0
+    for symbol in symbols:
+        index[symbol] = [offset, len(data[symbol])]
+        offset += len(data[symbol])
+
+    arrays = {
+        field: np.lib.format.open_memmap(_array_path(root, field, generation), mode='w+',
+                                         dtype='float64', shape=(offset,))
+        for field in FIELDS
+    }
+    for symbol in symbols:
+        df = data[symbol].rename(columns=str.lower)
+        start, length = index[symbol]
+        arrays['datetime'][start:start + length] = [bt.date2num(ts.to_pydatetime()) for ts in df.index]
+        for field in FIELDS[1:]:
+            arrays[field][start:start + length] = df[field].to_numpy(dtype='float64')
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    index_path = os.path.join(root, "index.json")
+    with open(index_path + ".tmp", "w") as f:
+        json.dump({'generation': generation, 'symbols': index}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(index_path + ".tmp", index_path)
+
+    current = {os.path.basename(_array_path(root, field, generation)) for field in FIELDS}
+    for name in os.listdir(root):
+        if name.endswith(".npy") and name not in current:
+            os.remove(os.path.join(root, name))
+
+
+class MemmapBars:
+    """Read-only view over a memmap directory. Slices are views, never copies"""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, "index.json")) as f:
+            layout = json.load(f)
+        self.index = layout['symbols']
+        self.arrays = {
+            field: np.load(_array_path(root, field, layout['generation']), mmap_mode='r')
+            for field in FIELDS
+        }
+
+    @property
+    def symbols(self):
+        return sorted(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, symbol):
+        """{field: array view} for one symbol"""
+        start, length = self.index[symbol]
+        return {field: array[start:start + length] for field, array in self.arrays.items()}
+
+    def to_frame(self, symbol):
+        """Copy one symbol into a pandas frame, for metrics and dashboards"""
+        arrays = self.get(symbol)
+        index = pd.DatetimeIndex([bt.num2date(x) for x in arrays['datetime']], name='Date')
+        return pd.DataFrame({field: np.asarray(arrays[field]) for field in FIELDS[1:]}, index=index)
+
+
+class MemmapData(bt.feed.DataBase):
+    """Backtrader feed reading one symbol straight from a memmap directory.
+
+    Pass the directory path (not a MemmapBars instance) so the feed stays
+    cheap to pickle into worker processes; each process maps the files itself.
+    """
+    params = (
+        ('root', None),
+        ('symbol', None),
+    )
+
+    def start(self):
+        super(MemmapData, self).start()
+        self._arrays = MemmapBars(self.p.root).get(self.p.symbol)
+        self._length = len(self._arrays['datetime'])
+        self._idx = -1
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= self._length:
+            return False
+
+        idx = self._idx
+        arrays = self._arrays
+        lines = self.lines
+        lines.datetime[0] = float(arrays['datetime'][idx])
+        lines.open[0] = float(arrays['open'][idx])
+        lines.high[0] = float(arrays['high'][idx])
+        lines.low[0] = float(arrays['low'][idx])
+        lines.close[0] = float(arrays['close'][idx])
+        lines.volume[0] = float(arrays['volume'][idx])
+        lines.openinterest[0] = 0.0
+        return True
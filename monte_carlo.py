@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from performance_metrics import calculate_backtest_metrics
+
+# Monte Carlo robustness checks on a backtest's closed trades.
+#
+# The closed trades' pnlcomm values are resampled, either by bootstrap
+# (drawn with replacement) or by permutation (reordered). Each resample is
+# replayed on the closed-trade equity path that calculate_backtest_metrics
+# uses. A block of resamples is one n_samples x n_trades array, so every
+# statistic is a single NumPy reduction over it. Blocks get their own child
+# seeds, so results depend only on the seed, not on the number of workers.
+#
+# Permutation leaves the final equity and the Sharpe ratio unchanged (they
+# ignore trade order) and varies the drawdown; bootstrap varies all three.
+
+STATISTICS = ['max_drawdown_pct', 'final_equity_pct', 'sharpe_ratio']
+
+
+def resample(pnl, n_samples, method='bootstrap', rng=None):
+    """n_samples x n_trades array of resampled trade P&L"""
+    rng = np.random.default_rng(rng)
+    pnl = np.asarray(pnl, dtype='float64')
+    if method == 'bootstrap':
+        return pnl[rng.integers(0, len(pnl), size=(n_samples, len(pnl)))]
+    if method == 'permutation':
+        return rng.permuted(np.broadcast_to(pnl, (n_samples, len(pnl))), axis=1)
+    raise ValueError(f"Unknown resampling method {method!r}")
+
+
+def path_statistics(samples, initial_capital=100000, minutes_per_bar=1440, trading_days=252):
+    """STATISTICS for each row of samples, as calculate_backtest_metrics computes them"""
+    equity_pct = (initial_capital + np.cumsum(samples, axis=1)) / initial_capital * 100
+    drawdown = np.round(equity_pct - np.maximum.accumulate(equity_pct, axis=1), 2)
+
+    returns = samples / initial_capital * 100
+    std = returns.std(axis=1, ddof=1)
+    bars_per_year = (trading_days * 6.5 * 60) / minutes_per_bar
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std == 0, 0.0, returns.mean(axis=1) / std * np.sqrt(bars_per_year))
+    return {
+        'max_drawdown_pct': drawdown.min(axis=1),
+        'final_equity_pct': equity_pct[:, -1],
+        'sharpe_ratio': sharpe,
+    }
+
+
+def _simulate_block(pnl, n_samples, method, seed, initial_capital, minutes_per_bar, trading_days):
+    samples = resample(pnl, n_samples, method, np.random.default_rng(seed))
+    return path_statistics(samples, initial_capital, minutes_per_bar, trading_days)
+
+
+def monte_carlo(trades_df, n_samples=10000, method='bootstrap', seed=None, confidence=0.95,
+                initial_capital=100000, minutes_per_bar=1440, trading_days=252,
+                block_size=2000, max_workers=1):
+    """Confidence intervals for max drawdown, final equity and Sharpe.
+
+    trades_df is TradeLogger output; only closed trades are resampled. The
+    n_samples resamples run in blocks of block_size, across max_workers
+    processes when that is more than 1. Returns one row per statistic with
+    the observed value (from calculate_backtest_metrics), the resampled mean
+    and the ci_low / ci_high bounds of the central confidence interval.
+    """
+    closed = trades_df[trades_df['status'] == 'closed']
+    if len(closed) < 2:
+        raise ValueError("Monte Carlo resampling needs at least two closed trades")
+    pnl = closed['pnlcomm'].to_numpy(dtype='float64')
+    observed = calculate_backtest_metrics(trades_df.copy(), initial_capital, minutes_per_bar, trading_days)
+
+    sizes = [block_size] * (n_samples // block_size)
+    if n_samples % block_size:
+        sizes.append(n_samples % block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(pnl, size, method, child, initial_capital, minutes_per_bar, trading_days)
+            for size, child in zip(sizes, seeds)]
+
+    if max_workers == 1 or len(args) == 1:
+        blocks = [_simulate_block(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            blocks = list(executor.map(_simulate_block, *zip(*args)))
+
+    alpha = (1 - confidence) / 2
+    rows = []
+    for name in STATISTICS:
+        values = np.concatenate([b[name] for b in blocks])
+        low, high = np.nanquantile(values, [alpha, 1 - alpha])
+        rows.append({'statistic': name, 'observed': observed[name], 'mean': np.nanmean(values),
+                     'ci_low': low, 'ci_high': high})
+    return pd.DataFrame(rows).set_index('statistic')
+
+
+def _symbol_report(symbol, trades_df, kwargs):
+    try:
+        return symbol, monte_carlo(trades_df, **kwargs), None
+    except ValueError as e:
+        return symbol, None, str(e)
+
+
+def robustness_report(trades_by_symbol, max_workers=None, **kwargs):
+    """monte_carlo() for {symbol: trades frame} across a process pool.
+
+    kwargs go to monte_carlo (each symbol runs in one process). Returns a
+    frame indexed by (symbol, statistic); symbols with too few closed trades
+    are left out.
+    """
+    jobs = [(symbol, trades, kwargs) for symbol, trades in trades_by_symbol.items()]
+    if max_workers == 1:
+        results = [_symbol_report(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_symbol_report, *zip(*jobs))) if jobs else []
+    frames = {symbol: report for symbol, report, error in results if report is not None}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, names=['symbol'])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monte Carlo confidence intervals for logged trades")
+    parser.add_argument('trades', nargs='?', default="backtest_trades.csv",
+                        help="trades CSV with a symbol column, as written by 04_backtest_and_log.py")
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--method', choices=['bootstrap', 'permutation'], default='bootstrap')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    trades = pd.read_csv(args.trades, parse_dates=['entry_time', 'exit_time'])
+    report = robustness_report({s: g for s, g in trades.groupby('symbol')}, max_workers=args.workers,
+                               n_samples=args.samples, method=args.method, seed=args.seed,
+                               confidence=args.confidence)
+    print(report.to_string())
@@ -0,0 +1,162 @@
+import os
+import json
+import math
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+import strategy_logic
+import strategy_logging
+from calculate_indicators import params
+from performance_metrics import calculate_backtest_metrics
+from backtest_runner import BROKER_SETTINGS, run_backtest
+from fast_simulator import simulate
+from bar_store import BarStore
+
+# Parameter grid optimizer over the keys of the shared params dict.
+#
+# Ranges are given with params-dict keys, e.g.
+#     optimize(strategy_logic.EMAMACDStrategy,
+#              {'emamacd_macd_fast': [8, 12], 'emamacd_donchian_period': range(5, 25, 5)})
+# Every combination is run for every symbol in the bar store. Each worker
+# process loads the bars once when it starts; results are appended to a
+# JSON-lines file as each (symbol, combination) finishes, so a sweep of any
+# size keeps only the in-flight tasks in memory. rank_results() reads the
+# file back and orders the combinations by a calculate_backtest_metrics key.
+
+_worker_data = {}
+
+
+def param_grid(ranges):
+    """Every combination of the ranges, as params-dict overrides"""
+    for key in ranges:
+        if key not in params:
+            raise KeyError(f"{key} is not a key of the params dict")
+    keys = list(ranges)
+    for values in product(*(list(ranges[k]) for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def load_store_bars(store_root=None, symbols=None):
+    """{symbol: lowercase OHLCV frame} from the bar store"""
+    store = BarStore(store_root) if store_root else BarStore()
+    symbols = symbols or store.symbols('1D')
+    return {s: store.read(s, '1D').rename(columns=str.lower) for s in symbols}
+
+
+def _init_worker(store_root, symbols):
+    # Preload the bars once per worker process
+    _worker_data.update(load_store_bars(store_root, symbols))
+
+
+def _json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if hasattr(value, 'item'):  # numpy scalars
+        return _json_value(value.item())
+    return value
+
+
+def evaluate(strategy_cls, symbol, df, overrides, engine='cerebro', broker_settings=BROKER_SETTINGS):
+    """Run one combination on one symbol and return a flat result row"""
+    kwargs = strategy_logic.strategy_kwargs(strategy_cls, overrides)
+    row = {'symbol': symbol, **overrides}
+    try:
+        if engine == 'fast':
+            trades = simulate(df, strategy_cls, symbol=symbol, cash=broker_settings['cash'],
+                              commission=broker_settings['commission'], **kwargs)
+        else:
+            with strategy_logging.disabled():
+                trades = run_backtest(symbol, df, strategy=strategy_cls, strategy_kwargs=kwargs,
+                                      broker_settings=broker_settings)
+        metrics = calculate_backtest_metrics(trades, initial_capital=broker_settings['cash']) \
+            if not trades.empty else {"Error": "No trades"}
+    except Exception as e:
+        metrics = {"Error": f"{type(e).__name__}: {e}"}
+    row.update({k: _json_value(v) for k, v in metrics.items()})
+    return row
+
+
+def _evaluate_task(strategy_cls, symbol, overrides, engine, broker_settings):
+    return evaluate(strategy_cls, symbol, _worker_data[symbol], overrides, engine, broker_settings)
+
+
+def optimize(strategy_cls, ranges, out_path="optimization_results.jsonl", symbols=None,
+             store_root=None, max_workers=None, engine='cerebro', broker_settings=BROKER_SETTINGS):
+    """Sweep ranges over every stored symbol, streaming rows to out_path.
+
+    engine='fast' screens with fast_simulator instead of Cerebro. Returns
+    the number of rows written.
+    """
+    if symbols is None:
+        store = BarStore(store_root) if store_root else BarStore()
+        symbols = store.symbols('1D')
+    # Fail on bad keys before any worker starts
+    strategy_logic.strategy_kwargs(strategy_cls, dict.fromkeys(ranges))
+    tasks = ((symbol, overrides) for overrides in param_grid(ranges) for symbol in symbols)
+
+    max_workers = max_workers or os.cpu_count()
+    written = 0
+    with open(out_path, "w") as out, ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(store_root, symbols)) as executor:
+        # Keep a bounded number of tasks in flight instead of submitting the whole grid
+        limit = 4 * max_workers
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < limit:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                symbol, overrides = task
+                pending.add(executor.submit(_evaluate_task, strategy_cls, symbol, overrides,
+                                            engine, broker_settings))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                out.write(json.dumps(future.result()) + "\n")
+                written += 1
+            out.flush()
+    return written
+
+
+def rank_results(path="optimization_results.jsonl", by='sharpe_ratio', ascending=False, top=None):
+    """Average each combination's metrics over symbols and sort by one of them"""
+    rows = pd.read_json(path, lines=True)
+    if rows.empty:
+        return rows
+    metric_names = [c for c in rows.columns if c not in params and c not in ('symbol', 'Error')]
+    keys = [c for c in rows.columns if c in params]
+    if not keys:
+        # Nothing was varied: each row is one symbol's run of the defaults
+        ranked = rows.sort_values(by, ascending=ascending, ignore_index=True)
+        return ranked.head(top) if top is not None else ranked
+    ranked = rows.groupby(keys, dropna=False)[metric_names].mean(numeric_only=True)
+    ranked['symbols'] = rows.groupby(keys, dropna=False)['symbol'].nunique()
+    ranked = ranked.sort_values(by, ascending=ascending).reset_index()
+    return ranked.head(top) if top is not None else ranked
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grid-search params-dict keys over the stored symbols")
+    parser.add_argument('--strategy', default='EMAMACDStrategy', help="class name in strategy_logic")
+    parser.add_argument('--range', action='append', default=[], metavar='KEY=V1,V2,...',
+                        help="values to try for one params key, e.g. emamacd_macd_fast=8,12,16")
+    parser.add_argument('--engine', choices=['cerebro', 'fast'], default='cerebro')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default="optimization_results.jsonl")
+    parser.add_argument('--rank-by', default='sharpe_ratio')
+    args = parser.parse_args()
+
+    ranges = {}
+    for item in args.range:
+        key, values = item.split('=', 1)
+        ranges[key] = [type(params[key])(v) for v in values.split(',')]
+
+    strategy_cls = getattr(strategy_logic, args.strategy)
+    count = optimize(strategy_cls, ranges, out_path=args.out, max_workers=args.workers, engine=args.engine)
+    print(f"{count} results written to {args.out}")
+    print(rank_results(args.out, by=args.rank_by, top=10).to_string())
@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 #minutes per_bar = 1440 day, 60 1 hour
 
 
@@ -45,11 +46,12 @@ def calculate_backtest_metrics(trades_df, initial_capital=100000, minutes_per_ba
         'profit_factor': (closed_trades[closed_trades['pnlcomm'] > 0]['pnlcomm'].sum() /
                         abs(closed_trades[closed_trades['pnlcomm'] < 0]['pnlcomm'].sum())),
         'avg_trade_duration_hours': closed_trades['duration_hours'].mean(),
-        'max_drawdown_pct': calculate_max_drawdown(equity_curve['equity']),
         'sharpe_ratio': calculate_sharpe(closed_trades['return_pct'], minutes_per_bar, trading_days),
         'annualized_return_pct': calculate_annualized_return(equity_curve, initial_capital, trading_days),
         'total_return_pct': (closed_trades['pnlcomm'].sum() / initial_capital) * 100,
         'average_trade_value': calculate_average_trade_value(closed_trades),
+        # Closed-trade drawdown in points of initial capital; bar-level
+        # drawdown of the account comes from equity_metrics
         'max_drawdown_pct': closed_trades['drawdown_pct'].min(),
         'peak_equity_pct': closed_trades['roll_max_pct'].max(),
         'final_equity_pct': closed_trades['equity_pct'].iloc[-1]
@@ -83,3 +85,88 @@ def calculate_average_trade_value(closed_trades):
     average_value = closed_trades['size'] * closed_trades['entry_price']
     
     return average_value.mean()
+
+
+METRIC_COLUMNS = ['total_trades', 'win_rate', 'profit_factor', 'avg_trade_duration_hours', 'sharpe_ratio',
+                  'annualized_return_pct', 'total_return_pct', 'average_trade_value', 'max_drawdown_pct',
+                  'peak_equity_pct', 'final_equity_pct']
+
+
+def batch_backtest_metrics(trades_df, run_key='run_id', initial_capital=100000, minutes_per_bar=1440,
+                           trading_days=252):
+    """calculate_backtest_metrics for every run in one concatenated trades table.
+
+    trades_df holds the trades of many runs, told apart by the run_key
+    column, each run's rows in trade order. Metrics are computed with grouped
+    NumPy operations over the whole table at once and trades_df is left
+    untouched. Returns one row per run (index run_key, columns METRIC_COLUMNS);
+    runs without closed trades get total_trades 0 and NaN metrics.
+    """
+    runs, run_ids = pd.factorize(trades_df[run_key], sort=True)
+    n_runs = len(run_ids)
+    closed = (trades_df['status'] == 'closed').to_numpy()
+
+    # Closed trades grouped by run, keeping trade order inside each run
+    order = np.flatnonzero(closed)
+    order = order[np.argsort(runs[order], kind='stable')]
+    run = runs[order]
+    pnl = trades_df['pnlcomm'].to_numpy(dtype='float64')[order]
+    duration = trades_df['duration'].to_numpy(dtype='float64')[order]
+    value = (trades_df['size'].to_numpy(dtype='float64') * trades_df['entry_price'].to_numpy(dtype='float64'))[order]
+    exit_ns = pd.to_datetime(trades_df['exit_time']).to_numpy(dtype='datetime64[ns]').view('int64')[order]
+
+    count = np.bincount(run, minlength=n_runs)
+    has = count > 0
+    starts = np.searchsorted(run, np.arange(n_runs))
+    ends = starts + count
+
+    def total(weights):
+        return np.bincount(run, weights=weights, minlength=n_runs)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Per-trade return distribution
+        returns = pnl / initial_capital * 100
+        mean = total(returns) / count
+        std = np.sqrt(total((returns - mean[run]) ** 2) / (count - 1))
+        bars_per_year = (trading_days * 6.5 * 60) / minutes_per_bar
+        sharpe = np.where(std == 0, 0.0, mean / std * np.sqrt(bars_per_year))
+
+        # Closed-trade equity path in percent of initial capital
+        run_cumulative = pd.Series(pnl).groupby(run).cumsum().to_numpy()
+        equity_pct = (initial_capital + run_cumulative) / initial_capital * 100
+        roll_max = pd.Series(equity_pct).groupby(run).cummax().to_numpy()
+        drawdown = np.round(equity_pct - roll_max, 2)
+
+        # Annualized return from the daily equity curve: the last trade of the
+        # last exit day sets the final equity, days run between exit days
+        last = np.lexsort((np.arange(len(run)), exit_ns, run))[ends[has] - 1]
+        day_ns = 86400 * 10**9
+        first_day = np.minimum.reduceat(exit_ns, starts[has]) // day_ns if has.any() else np.array([])
+        last_day = exit_ns[last] // day_ns
+        days_active = np.maximum(last_day - first_day, 1)
+        final_return = run_cumulative[last] / initial_capital
+        annualized = np.full(n_runs, np.nan)
+        annualized[has] = np.round(((1 + final_return) ** (trading_days / days_active) - 1) * 100, 2)
+
+        def per_run(reduce, values):
+            out = np.full(n_runs, np.nan)
+            if has.any():
+                out[has] = reduce(values, starts[has])
+            return out
+
+        metrics = pd.DataFrame({
+            'total_trades': count,
+            'win_rate': total(pnl > 0) / count * 100,
+            'profit_factor': total(np.where(pnl > 0, pnl, 0.0)) / np.abs(total(np.where(pnl < 0, pnl, 0.0))),
+            'avg_trade_duration_hours': total(duration) / count * minutes_per_bar / 60,
+            'sharpe_ratio': sharpe,
+            'annualized_return_pct': annualized,
+            'total_return_pct': total(pnl) / initial_capital * 100,
+            'average_trade_value': total(value) / count,
+            'max_drawdown_pct': per_run(np.minimum.reduceat, drawdown),
+            'peak_equity_pct': per_run(np.maximum.reduceat, roll_max),
+            'final_equity_pct': per_run(lambda values, _: values[ends[has] - 1], equity_pct),
+        }, index=pd.Index(run_ids, name=run_key))
+    # Runs without closed trades: every metric is undefined
+    metrics.loc[~has, METRIC_COLUMNS[1:]] = np.nan
+    return metrics
@@ -1,8 +1,70 @@
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 
-def create_backtest_dashboard(trades_df, df, metrics, symbol=''):
+# Points drawn per series before it is downsampled
+MAX_POINTS = 2000
+
+
+def lttb_indices(x, y, n_out):
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling of (x, y) to n_out points"""
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+        # Point of this bucket forming the largest triangle with a and the next average
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(np.nanargmax(area)) if not np.isnan(area).all() else start
+        keep[i + 1] = a
+    return keep
+
+
+def _downsample_line(x, y, max_points):
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    if len(x) <= max_points:
+        return x, y
+    if pd.api.types.is_datetime64_any_dtype(x):
+        # Open trades have no exit time: they are left out of the buckets
+        # (NaT would cast to the year 1677) and kept as NaT
+        missing = np.flatnonzero(x.isna().to_numpy())
+        valid = np.flatnonzero(x.notna().to_numpy())
+        numeric_x = x.iloc[valid].astype('int64')
+    else:
+        missing = np.empty(0, dtype=np.int64)
+        valid = np.arange(len(x))
+        numeric_x = valid
+    keep = valid[lttb_indices(numeric_x, y.to_numpy(dtype='float64')[valid], max_points)]
+    keep = np.sort(np.concatenate((keep, missing)))
+    return x.iloc[keep], y.iloc[keep]
+
+
+def _downsample_ohlc(df, max_points):
+    # OHLC bars merged into max_points buckets, keeping each bucket's extremes
+    if len(df) <= max_points:
+        return df
+    bucket = np.arange(len(df)) * max_points // len(df)
+    grouped = df[['open', 'high', 'low', 'close']].groupby(bucket)
+    merged = grouped.agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'})
+    merged.index = df.index[np.searchsorted(bucket, merged.index)]
+    return merged
+
+
+def create_backtest_dashboard(trades_df, df, metrics, symbol='', max_points=MAX_POINTS):
 
     # Ensure required columns exist
     #price_path = f"{price_dir}/{symbol}_1D_indicators.csv"
@@ -56,17 +118,20 @@ def create_backtest_dashboard(trades_df, df, metrics, symbol=''):
     ), row=1, col=2)
 
     # 2. Equity Curve & Drawdown -------------------------------------------------
+    # Long curves are downsampled to max_points with LTTB
+    equity_x, equity_y = _downsample_line(trades_df['exit_time'], trades_df['equity_pct'], max_points)
+    drawdown_x, drawdown_y = _downsample_line(trades_df['exit_time'], trades_df['drawdown_pct'], max_points)
     fig.add_trace(go.Scatter(
-        x=trades_df['exit_time'],
-        y=trades_df['equity_pct'],
+        x=equity_x,
+        y=equity_y,
         mode='lines',
         name='Equity',
         line=dict(color='#2c91de')
     ), row=2, col=1)
 
     fig.add_trace(go.Scatter(
-        x=trades_df['exit_time'],
-        y=trades_df['drawdown_pct'],
+        x=drawdown_x,
+        y=drawdown_y,
         mode='lines',
         name='Drawdown',
         line=dict(color='#ff4b4b')
@@ -90,32 +155,36 @@ def create_backtest_dashboard(trades_df, df, metrics, symbol=''):
     ), row=3, col=2)
 
     # 4. Price Chart with Trades -------------------------------------------------
+    # Long histories are merged into at most max_points OHLC buckets
+    price = _downsample_ohlc(df, max_points)
     fig.add_trace(go.Candlestick(
-        x=df.index,
-        open=df['open'],
-        high=df['high'],
-        low=df['low'],
-        close=df['close'],
+        x=price.index,
+        open=price['open'],
+        high=price['high'],
+        low=price['low'],
+        close=price['close'],
         name='Price',
     ), row=4, col=1)
 
+    # All entries in one WebGL trace and all exits in another
     aapl_trades = trades_df[trades_df['symbol'] == symbol]
-    for _, trade in aapl_trades.iterrows():
-        fig.add_trace(go.Scatter(
-            x=[trade['entry_time']],
-            y=[trade['entry_price']],
-            mode='markers',
-            marker=dict(color='#00cc96', size=10, symbol='triangle-up'),
-            showlegend=False
-        ), row=4, col=1)
-
-        fig.add_trace(go.Scatter(
-            x=[trade['exit_time']],
-            y=[trade['exit_price']],
-            mode='markers',
-            marker=dict(color='#ef553b', size=10, symbol='triangle-down'),
-            showlegend=False
-        ), row=4, col=1)
+    fig.add_trace(go.Scattergl(
+        x=aapl_trades['entry_time'],
+        y=aapl_trades['entry_price'],
+        mode='markers',
+        marker=dict(color='#00cc96', size=10, symbol='triangle-up'),
+        name='Entries',
+        showlegend=False
+    ), row=4, col=1)
+
+    fig.add_trace(go.Scattergl(
+        x=aapl_trades['exit_time'],
+        y=aapl_trades['exit_price'],
+        mode='markers',
+        marker=dict(color='#ef553b', size=10, symbol='triangle-down'),
+        name='Exits',
+        showlegend=False
+    ), row=4, col=1)
 
     # Layout Configuration -------------------------------------------------------
     fig.update_layout(
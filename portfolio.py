@@ -0,0 +1,143 @@
+import backtrader as bt
+import strategy_logic
+from backtest_runner import BROKER_SETTINGS, build_cerebro
+from precomputed_feed import make_precomputed_feed
+from trade_logger import TradeLogger
+from instrumentation import instrument_strategy, span
+
+# Portfolio mode: every symbol in one Cerebro, sharing one broker.
+#
+# PortfolioStrategy trades each feed with the entry_rule() and exit_rule() of
+# one of the strategy_logic strategies, reading that strategy's precomputed
+# indicator lines from the feed. The order and stop/take levels the
+# single-symbol strategies keep on self live in one Leg per feed instead. Orders map back
+# to their leg through a dict, and the broker value is read once per bar, so
+# the per-bar cost grows linearly with the number of feeds.
+#
+# With a single feed and fraction=0.9 (0.85 for the other two strategies)
+# the trades are identical to run_backtest().
+
+
+class Leg:
+    """Per-feed trade state"""
+    __slots__ = ('data', 'bar', 'warmup', 'seen', 'order', 'entry_price', 'stop_price', 'take_price')
+
+    def __init__(self, data, warmup, columns):
+        self.data = data
+        lines = {name: getattr(data.lines, name) for name in ('close', 'low', *columns)}
+        self.bar = strategy_logic.line_bar(lines)
+        self.warmup = warmup
+        self.seen = 0
+        self.order = None
+        self.entry_price = None
+        self.stop_price = None
+        self.take_price = None
+
+    def reset(self):
+        self.entry_price = None
+        self.stop_price = None
+        self.take_price = None
+
+
+class PortfolioStrategy(bt.Strategy):
+    """Trade every feed with the rules of one strategy_logic strategy.
+
+    fraction is the share of portfolio value put into each new position;
+    None splits it equally across the feeds. max_positions caps the number
+    of open positions. Buys never exceed the cash left this bar.
+    """
+    params = dict(
+        strategy_cls=strategy_logic.EMAMACDStrategy,
+        strategy_kwargs=None,
+        fraction=None,
+        max_positions=None,
+    )
+
+    def __init__(self):
+        kwargs = self.p.strategy_kwargs or {}
+        strategy_cls = self.p.strategy_cls
+        self.rules = strategy_logic._resolve_params(strategy_cls, kwargs)
+        self.entry_rule, self.exit_rule = strategy_cls.entry_rule, strategy_cls.exit_rule
+        warmup = strategy_cls.warmup_bars(self.rules)
+        self.legs = [Leg(data, warmup, strategy_cls.precomputed_lines) for data in self.datas]
+        self.fraction = self.p.fraction if self.p.fraction is not None else 1.0 / len(self.datas)
+        self.legs_by_order = {}
+        self.open_positions = 0
+
+    def prenext(self):
+        # Feeds start on different dates; trade the ones that have begun
+        self.next()
+
+    def next(self):
+        value = None
+        cash = None
+        for leg in self.legs:
+            seen = len(leg.data)
+            # Skip feeds that did not move this bar (not started, ended or a gap)
+            if seen == leg.seen:
+                continue
+            leg.seen = seen
+            if leg.order is not None or seen < leg.warmup:
+                continue
+
+            if leg.entry_price is None:
+                if self.p.max_positions is not None and self.open_positions >= self.p.max_positions:
+                    continue
+                entry, stop, take = self.entry_rule(self.rules, leg.bar)
+                if not entry:
+                    continue
+                if value is None:
+                    value = self.broker.getvalue()
+                    cash = self.broker.getcash()
+                price = leg.bar('close')
+                size = value * self.fraction / price
+                # Scale down to what the remaining cash covers, commission included.
+                # With cheat-on-open the broker re-checks cash at the next open, so a
+                # gap up can still reject a buy that takes the last of the cash
+                cost = size * price + self.broker.getcommissioninfo(leg.data).getcommission(size, price)
+                if cost > cash:
+                    size *= cash / cost * (1 - 1e-9)
+                    cost = cash
+                if size <= 0:
+                    continue
+                cash -= cost
+                leg.entry_price, leg.stop_price, leg.take_price = price, stop, take
+                leg.order = self.buy(data=leg.data, size=size)
+                self.legs_by_order[leg.order.ref] = leg
+                self.open_positions += 1
+            elif self.exit_rule(self.rules, leg.bar, leg.stop_price, leg.take_price):
+                leg.order = self.close(data=leg.data)
+                self.legs_by_order[leg.order.ref] = leg
+
+    def notify_order(self, order):
+        if order.alive():
+            return
+        leg = self.legs_by_order.pop(order.ref)
+        leg.order = None
+        filled = order.status == order.Completed
+        # Flat after a rejected entry (margin) or a filled close. A close that
+        # did not fill keeps the levels, so the exit rule is checked again
+        if order.isbuy() != filled:
+            leg.reset()
+            self.open_positions -= 1
+
+
+def run_portfolio(data, strategy=strategy_logic.EMAMACDStrategy, strategy_kwargs=None,
+                  fraction=None, max_positions=None, broker_settings=BROKER_SETTINGS, instrumentation=None):
+    """Backtest {symbol: frame} as one portfolio and return the TradeLogger frame"""
+    strategy_kwargs = strategy_kwargs or {}
+    cerebro = build_cerebro(broker_settings)
+    with span(instrumentation, 'feed', symbols=len(data)):
+        for symbol, df in data.items():
+            cerebro.adddata(make_precomputed_feed(df, strategy, name=symbol, **strategy_kwargs))
+    portfolio_cls = instrument_strategy(PortfolioStrategy) if instrumentation is not None else PortfolioStrategy
+    cerebro.addstrategy(portfolio_cls, strategy_cls=strategy, strategy_kwargs=strategy_kwargs,
+                        fraction=fraction, max_positions=max_positions)
+    cerebro.addanalyzer(TradeLogger, _name='trade_logger')
+    # The default observers (per-feed buy/sell markers) are only used for plotting
+    with span(instrumentation, 'cerebro.run', symbols=len(data)):
+        strat_results = cerebro.run(stdstats=False)
+    if instrumentation is not None:
+        instrumentation.add_latencies(strat_results[0].latency)
+    with span(instrumentation, 'analyzers'):
+        return strat_results[0].analyzers.trade_logger.get_analysis()
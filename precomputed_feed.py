@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import backtrader as bt
+import strategy_logging
+
+# PandasData feed carrying precomputed indicator columns as extra lines.
+#
+# Strategies in strategy_logic.py run with precomputed=True read these lines
+# instead of building bt.indicators, which removes backtrader's per-bar
+# indicator overhead. Each strategy's precompute() produces the columns;
+# check_precomputed() verifies they match the line-based indicators.
+
+PRECOMPUTED_LINES = ('ema', 'ema_fast', 'ema_slow', 'sma_medium', 'crossover',
+                     'volume_osc', 'macd_hist', 'donchian_low', 'donchian_high')
+
+
+class PrecomputedPandasData(bt.feeds.PandasData):
+    """PandasData with the indicator columns found by name; missing ones stay NaN.
+
+    Rows are served from plain column lists built once in start(), rather
+    than PandasData's per-field .iloc lookups on every bar, which would cost
+    more than the indicators being replaced.
+    """
+    lines = PRECOMPUTED_LINES
+    params = tuple((name, -1) for name in PRECOMPUTED_LINES)
+
+    def start(self):
+        super(PrecomputedPandasData, self).start()
+        frame = self.p.dataname
+        self._columns = []
+        for field in self.getlinealiases():
+            colindex = self._colmapping.get(field)
+            if field == 'datetime' or colindex is None:
+                continue
+            values = frame.iloc[:, colindex].to_numpy(dtype='float64').tolist()
+            self._columns.append((getattr(self.lines, field), values))
+        self._dtnums = [bt.date2num(ts.to_pydatetime()) for ts in frame.index]
+
+    def _load(self):
+        self._idx += 1
+        idx = self._idx
+        if idx >= len(self._dtnums):
+            return False
+        for line, values in self._columns:
+            line[0] = values[idx]
+        self.lines.datetime[0] = self._dtnums[idx]
+        return True
+
+
+def precomputed_frame(df, strategy_cls, indicators=None, **kwargs):
+    """OHLCV frame (lowercase columns) joined with the strategy's indicator columns.
+
+    indicators, if given, is precompute() output already computed (possibly
+    over a longer history); it is joined on df's index instead of recomputed.
+    """
+    if indicators is None:
+        indicators = strategy_cls.precompute(df, **kwargs)
+    return df.join(indicators)
+
+
+def make_precomputed_feed(df, strategy_cls, name=None, indicators=None, **kwargs):
+    """Feed for running strategy_cls with precomputed=True"""
+    feed = PrecomputedPandasData(dataname=precomputed_frame(df, strategy_cls, indicators, **kwargs),
+                                 datetime=None, openinterest=-1)
+    if name is not None:
+        feed._name = name
+    return feed
+
+
+def check_precomputed(df, strategy_cls, rtol=1e-9, atol=1e-9, **kwargs):
+    """Compare precompute() output with the strategy's line-based indicators.
+
+    Runs strategy_cls once the normal way and reads back every indicator
+    listed in its precomputed_lines. Returns a frame with one row per column:
+    max absolute difference, bars where only one side is NaN, and whether
+    the column matches within tolerance.
+    """
+    precomputed = strategy_cls.precompute(df, **kwargs)
+
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=df, datetime=None, openinterest=-1))
+    cerebro.addstrategy(strategy_cls, **kwargs)
+    with strategy_logging.disabled():
+        strat = cerebro.run()[0]
+
+    rows = []
+    for column, attr in strategy_cls.precomputed_lines.items():
+        line_values = np.asarray(getattr(strat, attr).array, dtype='float64')[:len(df)]
+        expected = precomputed[column].to_numpy(dtype='float64')
+        nan_mismatch = int((np.isnan(line_values) != np.isnan(expected)).sum())
+        both = ~np.isnan(line_values) & ~np.isnan(expected)
+        diff = np.abs(line_values[both] - expected[both])
+        rows.append({
+            'column': column,
+            'max_abs_diff': diff.max() if len(diff) else 0.0,
+            'nan_mismatch': nan_mismatch,
+            'ok': nan_mismatch == 0 and np.allclose(line_values[both], expected[both], rtol=rtol, atol=atol),
+        })
+    return pd.DataFrame(rows)
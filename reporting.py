@@ -0,0 +1,200 @@
+import io
+import os
+import json
+import html
+import math
+import hashlib
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from bar_store import BarStore
+from backtest_runner import BROKER_SETTINGS
+from performance_metrics import calculate_backtest_metrics
+from plotly_visualization import create_backtest_dashboard
+from export_to_excel import export_workbook
+from instrumentation import Instrumentation, span
+
+# Headless report stage.
+#
+# Reads the stored run results (backtest_trades.csv from
+# 04_backtest_and_log.py) and the price bars from the bar store, and renders
+# each symbol's dashboard HTML on a process pool. Nothing is opened in a
+# browser. A manifest in the output directory keeps a hash of every report's
+# inputs (the symbol's trades, its bars and the reporting code); a report
+# whose hash has not changed is not rendered again. The trades of every
+# symbol also go into one consolidated workbook, and an index.html links
+# every symbol's dashboard and the workbook.
+
+REPORT_DIR = "backtest_results"
+MANIFEST = "report_manifest.json"
+WORKBOOK = "backtest_report.xlsx"
+SUMMARY_METRICS = ['total_trades', 'win_rate', 'total_return_pct', 'annualized_return_pct',
+                   'max_drawdown_pct', 'sharpe_ratio', 'profit_factor']
+_SOURCES = ('reporting.py', 'plotly_visualization.py', 'performance_metrics.py', 'export_to_excel.py')
+
+
+def _code_digest():
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in _SOURCES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def inputs_hash(trades_df, prices, code_digest):
+    """Hash of everything a report is rendered from"""
+    digest = hashlib.sha256(code_digest.encode())
+    digest.update(pd.util.hash_pandas_object(trades_df, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(prices, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def load_prices(store, symbol, timeframe='1D_indicators'):
+    """Lowercase OHLCV bars of symbol, as the backtest ran on"""
+    df = store.read(symbol, timeframe, columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+    return df.rename(columns=str.lower)
+
+
+def report_path(out_dir, symbol):
+    return os.path.join(out_dir, f"backtest_{symbol}.html")
+
+
+def render_report(symbol, trades_df, prices, out_dir=REPORT_DIR, initial_capital=BROKER_SETTINGS['cash']):
+    """Write symbol's dashboard HTML; return its metrics (or the Error dict)"""
+    trades_df = trades_df.reset_index(drop=True)
+    metrics = calculate_backtest_metrics(trades_df, initial_capital=initial_capital)
+    if 'Error' in metrics:
+        return metrics
+    html_path = report_path(out_dir, symbol)
+
+    # Generate dashboard (its metrics printout is not wanted from a worker)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dashboard = create_backtest_dashboard(trades_df, prices, metrics, symbol=symbol)
+    # plotly.min.js is written once next to the dashboards and referenced by each
+    dashboard.write_html(html_path, include_plotlyjs='directory')
+    return metrics
+
+
+def _json_value(value):
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _report_task(symbol, trades_df, store_root, timeframe, out_dir, code_digest, previous, force, instrument):
+    instrumentation = Instrumentation() if instrument else None
+    store = BarStore(store_root) if store_root else BarStore()
+    prices = load_prices(store, symbol, timeframe)
+    digest = inputs_hash(trades_df, prices, code_digest)
+    # A symbol without closed trades has no dashboard to look for
+    has_output = 'Error' in (previous.get('metrics') or {}) or os.path.exists(report_path(out_dir, symbol))
+    if not force and digest == previous.get('hash') and has_output:
+        return symbol, digest, None, False, None
+
+    with span(instrumentation, 'render', symbol=symbol):
+        metrics = render_report(symbol, trades_df, prices, out_dir)
+    summary = {k: _json_value(metrics[k]) for k in SUMMARY_METRICS} if 'Error' not in metrics else metrics
+    profile = instrumentation.to_dict() if instrumentation is not None else None
+    return symbol, digest, summary, True, profile
+
+
+def write_index(out_dir, manifest):
+    """index.html with one row per symbol linking its dashboard, and the workbook"""
+    header = ''.join(f"<th>{html.escape(k)}</th>" for k in ['symbol'] + SUMMARY_METRICS + ['report'])
+    rows = []
+    for symbol in sorted(manifest):
+        summary = manifest[symbol]['metrics'] or {}
+        html_path = report_path('', symbol)
+        if 'Error' in summary:
+            cells = f"<td colspan=\"{len(SUMMARY_METRICS)}\">{html.escape(summary['Error'])}</td><td></td>"
+        else:
+            cells = ''.join(f"<td>{summary.get(k):.2f}</td>" if isinstance(summary.get(k), float)
+                            else f"<td>{'' if summary.get(k) is None else summary.get(k)}</td>"
+                            for k in SUMMARY_METRICS)
+            cells += f"<td><a href=\"{html.escape(html_path)}\">dashboard</a></td>"
+        rows.append(f"<tr><td>{html.escape(symbol)}</td>{cells}</tr>")
+    page = ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Backtest reports</title>"
+            "<style>body{font-family:sans-serif}table{border-collapse:collapse}"
+            "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}</style></head>\n"
+            f"<body><h1>Backtest reports</h1>\n<p><a href=\"{WORKBOOK}\">All trades (Excel)</a></p>\n"
+            f"<table><tr>{header}</tr>\n" + "\n".join(rows) +
+            "\n</table></body></html>\n")
+    path = os.path.join(out_dir, "index.html")
+    with open(path, "w") as f:
+        f.write(page)
+    return path
+
+
+def build_reports(trades_path="backtest_trades.csv", out_dir=REPORT_DIR, store_root=None,
+                  timeframe='1D_indicators', max_workers=None, force=False, instrumentation=None):
+    """Render every symbol's report from stored trades, skipping unchanged ones.
+
+    The consolidated workbook is rewritten whenever any input changed.
+    instrumentation, an Instrumentation, receives a span per rendered report.
+    A symbol whose report fails is reported and left out of the manifest and
+    index. Returns (rendered, skipped) symbol counts.
+    """
+    trades = pd.read_csv(trades_path, parse_dates=['entry_time', 'exit_time'])
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    code_digest = _code_digest()
+    jobs = [(symbol, group, store_root, timeframe, out_dir, code_digest,
+             manifest.get(symbol, {}), force, instrumentation is not None)
+            for symbol, group in trades.groupby('symbol', sort=True)]
+
+    rendered = skipped = 0
+    current = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_report_task, *job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                symbol, digest, summary, did_render, profile = future.result()
+            except Exception as e:
+                # Left out of the manifest, so the next run tries it again
+                print(f"Report failed for {futures[future]}: {type(e).__name__}: {e}")
+                continue
+            if profile is not None:
+                instrumentation.merge(profile)
+            if did_render:
+                rendered += 1
+                print(f"Rendered report for {symbol}")
+            else:
+                skipped += 1
+                summary = manifest[symbol]['metrics']
+            current[symbol] = {'hash': digest, 'metrics': summary}
+
+    # Symbols no longer in the results drop out of the manifest and index
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(current, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+    workbook_path = os.path.join(out_dir, WORKBOOK)
+    changed = any(manifest.get(s, {}).get('hash') != current[s]['hash'] for s in current)
+    if force or changed or set(manifest) != set(current) or not os.path.exists(workbook_path):
+        with span(instrumentation, 'workbook'):
+            export_workbook(trades.groupby('symbol', sort=True), workbook_path,
+                            initial_capital=BROKER_SETTINGS['cash'])
+    write_index(out_dir, current)
+    return rendered, skipped
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render backtest reports from stored results")
+    parser.add_argument('--trades', default="backtest_trades.csv")
+    parser.add_argument('--out', default=REPORT_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="render even unchanged reports")
+    args = parser.parse_args()
+
+    rendered, skipped = build_reports(args.trades, args.out, max_workers=args.workers, force=args.force)
+    print(f"{rendered} reports rendered, {skipped} unchanged. Index: {os.path.join(args.out, 'index.html')}")
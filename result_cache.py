@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import inspect
+import hashlib
+import numpy as np
+import pandas as pd
+import backtrader as bt
+import strategy_logic
+from calculate_indicators import params
+from checkpoint import bars_hash
+from trade_logger import TRADE_FIELDS
+
+# Content-addressed cache of single-symbol backtest results.
+#
+# An entry is keyed by a hash of everything the simulation depends on:
+# - the symbol and its input bars;
+# - the strategy class and the source of the module of every non-backtrader
+#   class in its MRO, plus its effective parameters and the full params dict;
+# - the broker settings and the source of the modules that build and record
+#   the run (Cerebro setup with its timer, feeds, precomputed indicators,
+#   the trade and equity loggers).
+# Changing any of those is a miss; nothing has to be invalidated by hand
+# for it. Metrics are stored next to the trades together with a digest of
+# the metrics code. When that code changes, a hit hands back only the
+# simulated trade columns for the metrics to be recomputed from, so
+# iterating on metrics or reporting never re-simulates.
+#
+# Layout: root/ab/abcdef.../ holding trades.parquet, equity.npz and
+# meta.json. Entries are written to a temporary directory and renamed into
+# place, so concurrent workers never see half an entry. A hit touches
+# meta.json; prune() evicts the least recently used entries beyond the size
+# limit.
+
+CACHE_DIR = os.path.join("cache", "results")
+MAX_BYTES = 1024 ** 3
+_SIMULATION_SOURCES = ('backtest_runner.py', 'precomputed_feed.py', 'memmap_feed.py', 'indicator_state.py',
+                       'indicator_engine.py', 'trade_logger.py', 'equity_logger.py')
+_METRICS_SOURCES = ('performance_metrics.py', 'equity_metrics.py')
+# TradeLogger's columns; calculate_backtest_metrics() adds its own to the frame
+TRADE_COLUMNS = [name for name, _ in TRADE_FIELDS] + ['duration']
+_digests = {}
+
+
+def _source_digest(names):
+    if names not in _digests:
+        digest = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in names:
+            with open(os.path.join(here, name), 'rb') as f:
+                digest.update(f.read())
+        _digests[names] = digest.hexdigest()
+    return _digests[names]
+
+
+def strategy_digest(strategy_cls):
+    """Hash of the modules defining strategy_cls and its own base classes.
+
+    Whole modules are hashed, so the module-level rule functions and helpers
+    the classes call are covered as well as the class bodies.
+    """
+    if strategy_cls not in _digests:
+        digest = hashlib.sha256()
+        modules = []
+        for cls in strategy_cls.__mro__:
+            if cls is object or cls.__module__.startswith('backtrader'):
+                continue
+            digest.update(f"{cls.__module__}.{cls.__qualname__}\n".encode())
+            if cls.__module__ not in modules:
+                modules.append(cls.__module__)
+        for name in modules:
+            digest.update(inspect.getsource(sys.modules[name]).encode())
+        _digests[strategy_cls] = digest.hexdigest()
+    return _digests[strategy_cls]
+
+
+def metrics_digest():
+    return _source_digest(_METRICS_SOURCES)
+
+
+def result_key(symbol, df, strategy_cls, strategy_kwargs=None, precomputed=True, broker_settings=None):
+    """Cache key of one backtest_symbol() run"""
+    strategy_kwargs = strategy_kwargs or {}
+    effective = vars(strategy_logic._resolve_params(strategy_cls, strategy_kwargs))
+    inputs = {
+        'symbol': symbol,
+        'bars': bars_hash(df),
+        'strategy': f"{strategy_cls.__module__}.{strategy_cls.__qualname__}",
+        'strategy_source': strategy_digest(strategy_cls),
+        'strategy_params': effective,
+        'precomputed': precomputed,
+        'params': params,
+        'broker_settings': broker_settings,
+        'simulation_source': _source_digest(_SIMULATION_SOURCES),
+        'backtrader': bt.__version__,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _json_value(value):
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class ResultCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Cached {'trades', 'equity', 'metrics', 'equity_metrics'} for key, or None.
+
+        metrics and equity_metrics are None when they were stored by
+        different metrics code; trades then only has TRADE_COLUMNS.
+        Recompute the metrics and store them with update_metrics().
+        """
+        path = self.path(key)
+        meta_path = os.path.join(path, "meta.json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            trades = pd.read_parquet(os.path.join(path, "trades.parquet"))
+            with np.load(os.path.join(path, "equity.npz")) as arrays:
+                equity = {name: arrays[name] for name in ('datetime', 'value', 'cash')}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            # Unreadable entries are dropped and recomputed
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        os.utime(meta_path)
+        current = meta['metrics_digest'] == metrics_digest()
+        if not current:
+            trades = trades[TRADE_COLUMNS]
+        return {'trades': trades, 'equity': equity,
+                'metrics': meta['metrics'] if current else None,
+                'equity_metrics': meta['equity_metrics'] if current else None}
+
+    def _write_meta(self, directory, meta):
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, default=_json_value)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    def put(self, key, trades, equity, metrics, equity_metrics, symbol=None, strategy=None):
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = os.path.join(self.root, f"tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        try:
+            trades.to_parquet(os.path.join(tmp_path, "trades.parquet"), index=False)
+            np.savez(os.path.join(tmp_path, "equity.npz"), **equity)
+            self._write_meta(tmp_path, {'symbol': symbol, 'strategy': strategy, 'created': time.time(),
+                                        'metrics_digest': metrics_digest(), 'metrics': metrics,
+                                        'equity_metrics': equity_metrics})
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process stored the same key first
+            if not os.path.exists(path):
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def update_metrics(self, key, trades, metrics, equity_metrics):
+        """Replace an entry's trades and metrics after recomputing them with the current code"""
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        tmp_path = os.path.join(path, "trades.parquet.tmp")
+        trades.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(path, "trades.parquet"))
+        meta.update(metrics_digest=metrics_digest(), metrics=metrics, equity_metrics=equity_metrics)
+        self._write_meta(path, meta)
+
+    def entries(self):
+        """One row per entry: key, symbol, strategy, bytes and last_used time"""
+        rows = []
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for key in os.listdir(shard_path):
+                path = os.path.join(shard_path, key)
+                try:
+                    with open(os.path.join(path, "meta.json")) as f:
+                        meta = json.load(f)
+                    size = sum(e.stat().st_size for e in os.scandir(path))
+                    last_used = os.path.getmtime(os.path.join(path, "meta.json"))
+                except (OSError, ValueError):
+                    continue
+                rows.append({'key': key, 'symbol': meta['symbol'], 'strategy': meta['strategy'],
+                             'bytes': size, 'last_used': pd.Timestamp(last_used, unit='s')})
+        return pd.DataFrame(rows, columns=['key', 'symbol', 'strategy', 'bytes', 'last_used'])
+
+    def _remove(self, keys):
+        for key in keys:
+            shutil.rmtree(self.path(key), ignore_errors=True)
+        return len(keys)
+
+    def prune(self, max_bytes=None):
+        """Evict least recently used entries until the cache fits max_bytes; returns how many"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries().sort_values('last_used', ascending=False, kind='stable')
+        over = entries['bytes'].cumsum() > max_bytes
+        return self._remove(list(entries.loc[over, 'key']))
+
+    def invalidate(self, symbols=None, strategy=None):
+        """Remove entries of the given symbols and/or strategy class name (all when neither)"""
+        entries = self.entries()
+        selected = pd.Series(True, index=entries.index)
+        if symbols is not None:
+            selected &= entries['symbol'].isin(symbols)
+        if strategy is not None:
+            selected &= entries['strategy'] == strategy
+        return self._remove(list(entries.loc[selected, 'key']))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect, prune or invalidate the backtest result cache")
+    parser.add_argument('--cache', default=CACHE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help="entries and size per strategy")
+    prune = commands.add_parser('prune', help="evict least recently used entries")
+    prune.add_argument('--max-mb', type=float, default=MAX_BYTES / 1024 ** 2)
+    invalidate = commands.add_parser('invalidate', help="remove entries (all of them by default)")
+    invalidate.add_argument('--symbol', action='append', default=None)
+    invalidate.add_argument('--strategy', default=None, help="strategy class name")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache)
+    if args.command == 'stats':
+        entries = cache.entries()
+        print(f"{len(entries)} entries, {entries['bytes'].sum() / 1024 ** 2:.1f} MB in {args.cache}")
+        if not entries.empty:
+            print(entries.groupby('strategy')['bytes'].agg(['count', 'sum']).to_string())
+    elif args.command == 'prune':
+        print(f"{cache.prune(int(args.max_mb * 1024 ** 2))} entries evicted")
+    else:
+        print(f"{cache.invalidate(args.symbol, args.strategy)} entries removed")
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import backtrader as bt
+import strategy_logic
+from bar_store import BAR_COLUMNS, BarStore
+
+# Universe-wide entry scan on the latest bar, without Cerebro.
+#
+# The last `window` bars of every symbol are loaded into (symbols x bars)
+# matrices, right-aligned on each symbol's latest bar and NaN-padded on the
+# left for shorter histories. Each strategy's entry_rule() is then evaluated
+# for all symbols at once: EMAs run as one recursion step per bar across
+# every symbol, and the rolling windows and crossovers are only evaluated
+# at the bars the rule looks at.
+#
+# Indicator values follow backtrader's (the bt_* functions of
+# indicator_engine), with each symbol's history starting at the first bar
+# of its window. The EMAs are seeded at the start of the window, so a window
+# covering the whole history gives exactly the values the strategies see;
+# shorter windows converge to them as the seed decays (over the default
+# 1000 bars, the seed of a 200-bar EMA keeps a weight of ~3e-4).
+
+FIELDS = [column.lower() for column in BAR_COLUMNS]
+DEFAULT_WINDOW = 1000
+
+CANDIDATE_COLUMNS = ['rank', 'symbol', 'strategy', 'time', 'close', 'stop', 'take', 'risk', 'risk_pct',
+                     'reward_risk', 'stale']
+
+
+class BarWindow:
+    """The latest bars of many symbols as (symbols x bars) float64 matrices.
+
+    fields maps lowercase OHLCV names to matrices whose last column is each
+    symbol's latest bar; lengths counts the real (non-padding) bars per row
+    and last_time holds each row's latest bar time.
+    """
+
+    def __init__(self, symbols, fields, lengths, last_time):
+        self.symbols = list(symbols)
+        self.fields = fields
+        self.lengths = np.asarray(lengths, dtype='int64')
+        self.last_time = pd.DatetimeIndex(last_time)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def n_bars(self):
+        return self.fields['close'].shape[1]
+
+    @classmethod
+    def from_frames(cls, frames, window=DEFAULT_WINDOW):
+        """From (symbol, OHLCV frame) pairs; column names of any case"""
+        frames = [(symbol, df) for symbol, df in frames if len(df)]
+        n = min(window, max((len(df) for _, df in frames), default=0))
+        fields = {field: np.full((len(frames), n), np.nan) for field in FIELDS}
+        lengths = np.zeros(len(frames), dtype='int64')
+        last_time = []
+        for row, (symbol, df) in enumerate(frames):
+            df = df.rename(columns=str.lower).iloc[-n:]
+            lengths[row] = len(df)
+            for field in FIELDS:
+                fields[field][row, n - len(df):] = df[field].to_numpy(dtype='float64')
+            last_time.append(df.index[-1])
+        return cls([symbol for symbol, _ in frames], fields, lengths, last_time)
+
+    @classmethod
+    def from_store(cls, store=None, symbols=None, window=DEFAULT_WINDOW, timeframe='1D', max_workers=8):
+        """Read the latest window of each stored symbol (all stored symbols by default).
+
+        Parquet reads run on a thread pool; the decoding releases the GIL,
+        so thousands of small files load in parallel.
+        """
+        store = store if store is not None else BarStore()
+        symbols = store.symbols(timeframe) if symbols is None else symbols
+
+        def read(symbol):
+            return symbol, store.read(symbol, timeframe, columns=BAR_COLUMNS).iloc[-window:]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(read, symbols))
+        return cls.from_frames(frames, window)
+
+    @classmethod
+    def from_memmap(cls, bars, symbols=None, window=DEFAULT_WINDOW):
+        """Slice the latest window of each symbol from a memmap_feed.MemmapBars"""
+        symbols = [s for s in (bars.symbols if symbols is None else symbols) if bars.index[s][1]]
+        n = min(window, max((bars.index[s][1] for s in symbols), default=0))
+        fields = {field: np.full((len(symbols), n), np.nan) for field in FIELDS}
+        lengths = np.zeros(len(symbols), dtype='int64')
+        last_num = np.zeros(len(symbols))
+        for row, symbol in enumerate(symbols):
+            start, length = bars.index[symbol]
+            take = min(length, n)
+            lengths[row] = take
+            for field in FIELDS:
+                fields[field][row, n - take:] = bars.arrays[field][start + length - take:start + length]
+            last_num[row] = bars.arrays['datetime'][start + length - 1]
+        last_time = [bt.num2date(x) for x in last_num]
+        return cls(symbols, fields, lengths, last_time)
+
+
+def _first_valid(x):
+    # Column of each row's first non-NaN value; the width for all-NaN rows
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), x.shape[1])
+
+
+def ema_matrix(x, period):
+    """bt_ema of every row, each seeded at its own first valid value"""
+    n_rows, n = x.shape
+    out = np.full((n_rows, n), np.nan)
+    seed_at = _first_valid(x) + period - 1
+    rows = np.flatnonzero(seed_at < n)
+    if len(rows) == 0:
+        return out
+    # Seed with the mean of the first period valid values, summed as bt_ema does
+    columns = seed_at[rows, None] - (period - 1) + np.arange(period)[None, :]
+    seed = x[rows[:, None], columns].sum(axis=1) / period
+
+    # Rows grouped by the bar they are seeded at
+    order = np.argsort(seed_at[rows], kind='stable')
+    rows, seed, seed_at = rows[order], seed[order], seed_at[rows][order]
+    bounds = np.searchsorted(seed_at, np.arange(seed_at[0], n + 1))
+
+    alpha = 2.0 / (period + 1.0)
+    alpha1 = 1.0 - alpha
+    prev = np.full(n_rows, np.nan)
+    for i, t in enumerate(range(seed_at[0], n)):
+        prev = prev * alpha1 + x[:, t] * alpha
+        prev[rows[bounds[i]:bounds[i + 1]]] = seed[bounds[i]:bounds[i + 1]]
+        out[:, t] = prev
+    return out
+
+
+def sma_matrix(x, period):
+    """bt_sma of every row"""
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(x, period, axis=1)
+        out[:, period - 1:] = windows.sum(axis=2) / period
+    return out
+
+
+def lowest_last(x, period):
+    """bt_lowest at the last bar of every row (NaN until period bars exist)"""
+    if x.shape[1] < period:
+        return np.full(len(x), np.nan)
+    return x[:, -period:].min(axis=1)
+
+
+def highest_last(x, period):
+    """bt_highest at the last bar of every row (NaN until period bars exist)"""
+    if x.shape[1] < period:
+        return np.full(len(x), np.nan)
+    return x[:, -period:].max(axis=1)
+
+
+def crossover_last(a, b):
+    """bt_crossover at the last bar of every row"""
+    diff = a - b
+    n_rows, n = diff.shape
+    if n < 2:
+        return np.full(n_rows, np.nan)
+    start = _first_valid(diff)
+    # Last non-zero difference before the last bar, seeded with the first valid one
+    cols = np.arange(n - 1)[None, :]
+    keep = ((diff[:, :-1] != 0) & ~np.isnan(diff[:, :-1])) | (cols == start[:, None])
+    last = np.where(keep, cols, -1).max(axis=1)
+    previous = np.where(last >= 0, diff[np.arange(n_rows), np.maximum(last, 0)], np.nan)
+    with np.errstate(invalid='ignore'):
+        up = (previous < 0.0) & (a[:, -1] > b[:, -1])
+        down = (previous > 0.0) & (a[:, -1] < b[:, -1])
+    out = up.astype('float64') - down.astype('float64')
+    out[last < 0] = np.nan
+    return out
+
+
+# Indicator values each strategy's entry_rule() reads, one function per
+# strategy. Each returns {column: matrix} with a column per bar the rule
+# looks at, ending on each symbol's latest bar.
+
+def _emavolmacd_values(bars, p):
+    close = bars.fields['close']
+    macd = ema_matrix(close, p.macd_fast) - ema_matrix(close, p.macd_slow)
+    return {'ema': ema_matrix(close, p.ema_period)[:, -1:],
+            'macd_hist': (macd - ema_matrix(macd, p.macd_signal))[:, -2:],
+            'donchian_low': lowest_last(bars.fields['low'], p.donchian_period)[:, None]}
+
+
+def _emacrossover_values(bars, p):
+    close = bars.fields['close']
+    cross = crossover_last(ema_matrix(close, p.ema_fast), sma_matrix(close, p.sma_medium))
+    return {'crossover': cross[:, None]}
+
+
+def _emamacd_values(bars, p):
+    close = bars.fields['close']
+    # MACD line as difference between fast SMA and slow EMA
+    macd = sma_matrix(close, p.macd_fast) - ema_matrix(close, p.macd_slow)
+    return {'ema': ema_matrix(close, p.ema_period)[:, -1:],
+            'crossover': crossover_last(macd, ema_matrix(macd, p.macd_signal))[:, None],
+            'donchian_low': lowest_last(bars.fields['low'], p.donchian_period)[:, None],
+            'donchian_high': highest_last(bars.fields['high'], p.donchian_period)[:, None]}
+
+
+SCANS = {
+    strategy_logic.EMAVolMACDStrategy: _emavolmacd_values,
+    strategy_logic.EMACrossoverStrategy: _emacrossover_values,
+    strategy_logic.EMAMACDStrategy: _emamacd_values,
+}
+
+
+def scan(bars, strategies=tuple(SCANS), strategy_kwargs=None, include_stale=False):
+    """Ranked entry candidates on each symbol's latest bar.
+
+    strategy_kwargs maps a strategy class to its parameter overrides.
+    Symbols whose latest bar is older than the newest in the window are
+    stale (delisted, halted or not yet updated) and skipped unless
+    include_stale. Candidates are ranked by reward/risk, then by the
+    tightest stop relative to price.
+    """
+    strategy_kwargs = strategy_kwargs or {}
+    if not len(bars):
+        return pd.DataFrame(columns=CANDIDATE_COLUMNS)
+    stale = np.asarray(bars.last_time < bars.last_time.max())
+    close = bars.fields['close'][:, -1]
+    frames = []
+    for strategy_cls in strategies:
+        p = strategy_logic._resolve_params(strategy_cls, strategy_kwargs.get(strategy_cls, {}))
+        values = {'close': bars.fields['close'][:, -1:], 'low': bars.fields['low'][:, -1:]}
+        values.update(SCANS[strategy_cls](bars, p))
+        with np.errstate(invalid='ignore'):
+            entry, stop, take = (x[:, 0] for x in strategy_cls.entry_rule(p, strategy_logic.array_bar(values, -1)))
+        # The strategies wait for their indicators' warm-up before trading
+        entry &= bars.lengths >= strategy_cls.warmup_bars(p)
+        if not include_stale:
+            entry &= ~stale
+        rows = np.flatnonzero(entry)
+        frames.append(pd.DataFrame({
+            'symbol': [bars.symbols[i] for i in rows], 'strategy': strategy_cls.__name__,
+            'time': bars.last_time[rows], 'close': close[rows], 'stop': stop[rows], 'take': take[rows],
+            'stale': stale[rows]}))
+
+    candidates = pd.concat(frames, ignore_index=True)
+    candidates['risk'] = candidates['close'] - candidates['stop']
+    candidates['risk_pct'] = candidates['risk'] / candidates['close'] * 100
+    # A stop at or above the close leaves no risk to measure the reward against
+    risk = candidates['risk'].where(candidates['risk'] > 0)
+    candidates['reward_risk'] = (candidates['take'] - candidates['close']) / risk
+    candidates = candidates.sort_values(['reward_risk', 'risk_pct'], ascending=[False, True],
+                                        na_position='last', kind='stable', ignore_index=True)
+    candidates['rank'] = np.arange(1, len(candidates) + 1)
+    return candidates[CANDIDATE_COLUMNS]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Scan every stored symbol for entry signals on the latest bar")
+    parser.add_argument('--store', default=None, help="BarStore root (default data/store)")
+    parser.add_argument('--memmap', default=None, help="read bars from a memmap directory instead")
+    parser.add_argument('--timeframe', default='1D')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help="bars loaded per symbol")
+    parser.add_argument('--strategy', action='append', default=[], help="class name in strategy_logic")
+    parser.add_argument('--include-stale', action='store_true')
+    parser.add_argument('--top', type=int, default=None, help="only print the best N candidates")
+    parser.add_argument('--out', default=None, help="write the candidates as CSV")
+    args = parser.parse_args()
+
+    strategies = tuple(getattr(strategy_logic, name) for name in args.strategy) or tuple(SCANS)
+    started = time.perf_counter()
+    if args.memmap:
+        from memmap_feed import MemmapBars
+        bars = BarWindow.from_memmap(MemmapBars(args.memmap), window=args.window)
+    else:
+        store = BarStore(args.store) if args.store else BarStore()
+        bars = BarWindow.from_store(store, window=args.window, timeframe=args.timeframe)
+    loaded = time.perf_counter()
+    candidates = scan(bars, strategies, include_stale=args.include_stale)
+    done = time.perf_counter()
+
+    print(f"{len(bars)} symbols x {bars.n_bars} bars: loaded in {loaded - started:.2f}s, "
+          f"scanned in {done - loaded:.2f}s, {len(candidates)} candidates")
+    shown = candidates if args.top is None else candidates.head(args.top)
+    if not shown.empty:
+        print(shown.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    if args.out:
+        candidates.to_csv(args.out, index=False)
+        print(f"Candidates written to {args.out}")
@@ -0,0 +1,141 @@
+import logging
+import contextlib
+from collections import deque
+import backtrader as bt
+
+# Leveled, buffered logging for strategies.
+#
+# Strategies call self.log(msg, *args, level=INFO) with a %-style message.
+# A call below the active level returns before anything is formatted, so a
+# disabled log costs one comparison. Records keep the bar's date number and
+# the raw arguments; the date and message are formatted only when a sink
+# renders them.
+#
+# The active log is per process. capture() installs a ring-buffer log for
+# the duration of one run, so a worker can return its run's lines with the
+# results instead of printing them interleaved with other workers. Outside
+# any capture, records go to the console as the strategies always printed
+# them.
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+OFF = logging.CRITICAL + 10
+
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+
+
+def format_record(record):
+    """'YYYY-MM-DD: message' for a (dtnum, level, msg, args) record"""
+    dtnum, level, msg, args = record
+    return f"{bt.num2date(dtnum).date().isoformat()}: {msg % args if args else msg}"
+
+
+class ConsoleSink(object):
+    """Print each record as it arrives"""
+
+    def emit(self, record):
+        print(format_record(record))
+
+    def close(self):
+        pass
+
+
+class RingBufferSink(object):
+    """Keep the last capacity records in memory, unformatted"""
+
+    def __init__(self, capacity=10000):
+        self.records = deque(maxlen=capacity)
+        self.emit = self.records.append
+
+    def lines(self):
+        return [format_record(r) for r in self.records]
+
+    def close(self):
+        pass
+
+
+class BatchedFileSink(object):
+    """Append records to a file in batches of batch_size lines.
+
+    Each batch is one write() of already-joined lines, so files shared by
+    processes opened in append mode get whole batches, not torn lines.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+
+    def emit(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def write_lines(self, lines):
+        with open(self.path, "a") as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def flush(self):
+        if self.pending:
+            self.write_lines([format_record(r) for r in self.pending])
+            self.pending = []
+
+    def close(self):
+        self.flush()
+
+
+class StrategyLog(object):
+    """A level threshold in front of a sink"""
+
+    def __init__(self, level=INFO, sink=None):
+        self.level = level
+        self.sink = sink if sink is not None else ConsoleSink()
+
+
+_active = StrategyLog()
+
+
+def active_log():
+    return _active
+
+
+def enabled_for(level):
+    """Whether a record at level would be kept; guards costly arguments"""
+    return level >= _active.level
+
+
+@contextlib.contextmanager
+def use_log(log):
+    """Route strategy logging to log for the enclosed code"""
+    global _active
+    previous = _active
+    _active = log
+    try:
+        yield log
+    finally:
+        _active = previous
+        log.sink.close()
+
+
+def capture(level=INFO, capacity=10000):
+    """Collect the enclosed run's records in a RingBufferSink (yielded)"""
+    return use_log(StrategyLog(level, RingBufferSink(capacity)))
+
+
+def disabled():
+    """Drop all strategy logging for the enclosed code"""
+    return use_log(StrategyLog(OFF))
+
+
+class LoggingMixin(object):
+    """log() for bt.Strategy subclasses, through the active StrategyLog"""
+
+    def log(self, msg, *args, level=INFO):
+        log = _active
+        if level < log.level:
+            return
+        log.sink.emit((self.datetime[0], level, msg, args))
+
+
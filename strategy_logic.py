@@ -1,24 +1,118 @@
 import backtrader as bt
-import math
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
 from calculate_indicators import params
+from indicator_state import ChunkedIndicators, WindowChunkState, EMAChunkState, CrossOverChunkState
+from strategy_logging import LoggingMixin
 
-class EMAVolMACDStrategy(bt.Strategy):
+
+def _resolve_params(strategy_cls, kwargs):
+    # Strategy defaults overridden by kwargs, as cerebro.addstrategy would
+    p = dict(strategy_cls.params._getitems())
+    p.update(kwargs)
+    return SimpleNamespace(**p)
+
+
+def strategy_kwargs(strategy_cls, overrides):
+    """Translate params-dict keys into strategy_cls keyword arguments.
+
+    'emamacd_macd_fast' becomes macd_fast for EMAMACDStrategy; unprefixed
+    keys such as 'volume_short_period' pass through when the strategy has a
+    param of that name. Keys belonging to no param of strategy_cls raise
+    KeyError.
+    """
+    names = set(dict(strategy_cls.params._getitems()))
+    kwargs = {}
+    for key, value in overrides.items():
+        name = key[len(strategy_cls.param_prefix):] if key.startswith(strategy_cls.param_prefix) else key
+        if name not in names:
+            raise KeyError(f"{key} is not a parameter of {strategy_cls.__name__}")
+        kwargs[name] = value
+    return kwargs
+
+
+# Trading rules, shared by the strategies' next(), the fast simulator, the
+# portfolio strategy and the signal scanner. Each strategy's
+# entry_rule(p, bar) returns (entry, stop, take) at the signal bar and
+# exit_rule(p, bar, stop, take) whether to close the position. bar(name, ago)
+# reads close, low or a precomputed column `ago` bars back (0 or -1), either
+# one value from backtrader lines or whole numpy arrays, so the same rule
+# runs per bar in Cerebro and vectorized over bars or symbols.
+
+def line_bar(lines):
+    """bar() over a {name: line or indicator} mapping, one float per call"""
+    return lambda name, ago=0: lines[name][ago]
+
+
+def array_bar(arrays, start=0):
+    """bar() over a {name: array} mapping, along the last axis from start on.
+
+    ago=-1 shifts an array one bar to the right, NaN-padding the first bar.
+    """
+    def bar(name, ago=0):
+        values = arrays[name]
+        if ago:
+            pad = np.full(values.shape[:-1] + (-ago,), np.nan)
+            values = np.concatenate((pad, values[..., :ago]), axis=-1)
+        return values[..., start:]
+    return bar
+
+
+def _strategy_bar(strategy):
+    # bar() over the strategy's data and indicators, precomputed or not
+    lines = {'close': strategy.data.close, 'low': strategy.data.low}
+    lines.update((column, getattr(strategy, attr)) for column, attr in strategy.precomputed_lines.items())
+    return line_bar(lines)
+
+
+def _stop_take_exit(p, bar, stop, take):
+    close = bar('close')
+    return (close <= stop) | (close >= take)
+
+
+class EMAVolMACDStrategy(LoggingMixin, bt.Strategy):
     params = dict(
         donchian_period=params['emavolmacd_donchian_period'],
         risk_reward_ratio=params['emavolmacd_risk_reward_ratio'],
         ema_period=params['emavolmacd_ema_period'],
         macd_fast=params['emavolmacd_macd_fast'],
         macd_slow=params['emavolmacd_macd_slow'],
-        macd_signal=params['emavolmacd_macd_signal']
+        macd_signal=params['emavolmacd_macd_signal'],
+        volume_short_period=params['volume_short_period'],
+        volume_long_period=params['volume_long_period'],
+        precomputed=False
     )
+    # Keys of the shared params dict are this prefix plus the strategy param name
+    param_prefix = 'emavolmacd_'
+
+    # Feed column -> indicator attribute, read from the data when precomputed=True
+    precomputed_lines = dict(ema='ema', volume_osc='volume_osc', macd_hist='macd_hist', donchian_low='donchian_low')
+    # Share of portfolio value put into a new position
+    position_fraction = 0.85
 
     def __init__(self):
         super(EMAVolMACDStrategy, self).__init__()
-        
+        self.warmup = 0
+
+        # Trade tracking
+        self.order = None
+        self.entry_price = None
+        self.stop_price = None
+        self.take_price = None
+
+        if self.p.precomputed:
+            for column, attr in self.precomputed_lines.items():
+                setattr(self, attr, getattr(self.data.lines, column))
+            self.macd_hist_prev = self.macd_hist(-1)
+            self.warmup = self.warmup_bars(self.p)
+            self.bar = _strategy_bar(self)
+            return
+
         # Indicators
         self.ema = bt.indicators.EMA(self.data.close, period=self.p.ema_period)
-        self.vol_short = bt.indicators.SMA(self.data.volume, period=params['volume_short_period'])
-        self.vol_long = bt.indicators.SMA(self.data.volume, period=params['volume_long_period'])
+        self.vol_short = bt.indicators.SMA(self.data.volume, period=self.p.volume_short_period)
+        self.vol_long = bt.indicators.SMA(self.data.volume, period=self.p.volume_long_period)
         self.volume_osc = (self.vol_short - self.vol_long) / self.vol_long
         
         # MACD with custom parameters
@@ -32,55 +126,93 @@ class EMAVolMACDStrategy(bt.Strategy):
         self.macd_hist_prev = self.macd_hist(-1)  # Previous value
         
         self.donchian_low = bt.indicators.Lowest(self.data.low, period=self.p.donchian_period)
-        
-        # Trade tracking
-        self.order = None
-        self.entry_price = None
-        self.stop_price = None
-        self.take_price = None
+        self.bar = _strategy_bar(self)
+
+    @staticmethod
+    def warmup_bars(p):
+        # Bars before the line-based indicators all have values
+        return max(p.ema_period, p.volume_short_period, p.volume_long_period,
+                   max(p.macd_fast, p.macd_slow) + p.macd_signal, p.donchian_period)
+
+    @staticmethod
+    def entry_rule(p, bar):
+        """MACD histogram turning positive above the EMA; stop at the Donchian low"""
+        close = bar('close')
+        entry = (close > bar('ema')) & (bar('macd_hist', -1) < 0) & (bar('macd_hist') > 0)
+        #entry &= bar('volume_osc') > 0
+        stop = bar('donchian_low')
+        return entry, stop, close + (close - stop) * p.risk_reward_ratio
+
+    exit_rule = staticmethod(_stop_take_exit)
+
+    @classmethod
+    def precompute(cls, df, **kwargs):
+        """Indicator columns equal to the line-based indicators, for precomputed=True"""
+        return cls.precompute_state(**kwargs).update(df)
+
+    @classmethod
+    def precompute_state(cls, **kwargs):
+        """precompute() for a history fed in consecutive chunks"""
+        p = _resolve_params(cls, kwargs)
+        return ChunkedIndicators({
+            'ema': EMAChunkState(p.ema_period),
+            'vol_short': WindowChunkState(p.volume_short_period),
+            'vol_long': WindowChunkState(p.volume_long_period),
+            'macd_fast': EMAChunkState(p.macd_fast),
+            'macd_slow': EMAChunkState(p.macd_slow),
+            'macd_signal': EMAChunkState(p.macd_signal),
+            'donchian_low': WindowChunkState(p.donchian_period, 'min'),
+        }, cls._precompute_chunk)
+
+    @staticmethod
+    def _precompute_chunk(states, df):
+        close = df['close'].to_numpy(dtype='float64')
+        volume = df['volume'].to_numpy(dtype='float64')
+        vol_short = states['vol_short'].update(volume)
+        vol_long = states['vol_long'].update(volume)
+        macd = states['macd_fast'].update(close) - states['macd_slow'].update(close)
+        return pd.DataFrame({
+            'ema': states['ema'].update(close),
+            'volume_osc': (vol_short - vol_long) / vol_long,
+            'macd_hist': macd - states['macd_signal'].update(macd),
+            'donchian_low': states['donchian_low'].update(df['low'].to_numpy(dtype='float64')),
+        }, index=df.index)
 
     def next(self):
         # Cancel any pending orders
         if self.order:
             return
+        # Precomputed lines exist from the first bar; wait as the indicators would
+        if len(self) < self.warmup:
+            return
 
         # Entry conditions
         if not self.position:
-            if self._buy_signal():
-                self._enter_trade()
+            entry, stop, take = self.entry_rule(self.p, self.bar)
+            if entry:
+                self._enter_trade(stop, take)
         
         # Exit conditions
         else:
-            if self._exit_signal():
+            if self.exit_rule(self.p, self.bar, self.stop_price, self.take_price):
                 self._close_trade()
 
-    def _buy_signal(self):
-        return (self.data.close[0] > self.ema[0] and
-                #self.volume_osc[0] > 0 and
-                self.macd_hist_prev[0] < 0 and 
-                self.macd_hist[0] > 0)
-
-    def _enter_trade(self):
+    def _enter_trade(self, stop, take):
         # Calculate position size using 100% equity
-        total_value = self.broker.getvalue() * 0.85
+        total_value = self.broker.getvalue() * self.position_fraction
         price = self.data.close[0]
         size = total_value / price
         
         self.entry_price = price
-        self.stop_price = self.donchian_low[0]
-        risk = self.entry_price - self.stop_price
-        self.take_price = self.entry_price + (risk * self.p.risk_reward_ratio)
+        self.stop_price = stop
+        self.take_price = take
         
         self.order = self.buy(size=size)
-        self.log(f'BUY ORDER: {size:.2f} shares @ {price:.2f}')
-
-    def _exit_signal(self):
-        return (self.data.close[0] <= self.stop_price or 
-                self.data.close[0] >= self.take_price)
+        self.log('BUY ORDER: %.2f shares @ %.2f', size, price)
 
     def _close_trade(self):
         self.order = self.close()
-        self.log(f'CLOSE ORDER: Position @ {self.data.close[0]:.2f}')
+        self.log('CLOSE ORDER: Position @ %.2f', self.data.close[0])
         self._reset_trade_vars()
 
     def _reset_trade_vars(self):
@@ -91,27 +223,46 @@ class EMAVolMACDStrategy(bt.Strategy):
     def notify_order(self, order):
         if order.status in [order.Completed]:
             if order.isbuy():
-                self.log(f'BUY EXECUTED: {order.executed.size:.2f} @ {order.executed.price:.2f}')
+                self.log('BUY EXECUTED: %.2f @ %.2f', order.executed.size, order.executed.price)
             elif order.issell():
-                self.log(f'SELL EXECUTED: {order.executed.size:.2f} @ {order.executed.price:.2f}')
+                self.log('SELL EXECUTED: %.2f @ %.2f', order.executed.size, order.executed.price)
             self.order = None
 
-    def log(self, txt):
-        print(f'{self.datetime.date().isoformat()}: {txt}')
-
 # 5 ema 13 sma mit 100 ema als filter 10 ema 20 sma tages kein+mit-20 40 50 100  
 # 200/100 ema filter macd risk reward 1.5 mit und ohne null linie
 
-class EMACrossoverStrategy(bt.Strategy):
+class EMACrossoverStrategy(LoggingMixin, bt.Strategy):
     params = dict(
         ema_fast=params['emacrossover_ema_fast'],
         sma_medium=params['emacrossover_sma_medium'],
         ema_slow=params['emacrossover_ema_slow'],
         risk_reward=params['emacrossover_risk_reward'],
-        trail_stop=params['emacrossover_trail_stop']
+        trail_stop=params['emacrossover_trail_stop'],
+        precomputed=False
     )
+    param_prefix = 'emacrossover_'
+
+    # Feed column -> indicator attribute, read from the data when precomputed=True
+    precomputed_lines = dict(ema_slow='ema_slow', ema_fast='ema_fast', sma_medium='sma_medium', crossover='crossover')
+    # Share of portfolio value put into a new position
+    position_fraction = 0.85
 
     def __init__(self):
+        self.warmup = 0
+
+        # Trade management variables
+        self.order = None
+        self.entry_price = None
+        self.stop_price = None
+        self.take_price = None
+
+        if self.p.precomputed:
+            for column, attr in self.precomputed_lines.items():
+                setattr(self, attr, getattr(self.data.lines, column))
+            self.warmup = self.warmup_bars(self.p)
+            self.bar = _strategy_bar(self)
+            return
+
         # Trend filter (200-period EMA)
         self.ema_slow = bt.indicators.EMA(self.data.close, period=self.p.ema_slow)
         
@@ -121,36 +272,71 @@ class EMACrossoverStrategy(bt.Strategy):
         
         # Crossover signals
         self.crossover = bt.indicators.CrossOver(self.ema_fast, self.sma_medium)
-        
-
-        # Trade management variables
-        self.order = None
-        self.entry_price = None
-        self.stop_price = None
-        self.take_price = None
+        self.bar = _strategy_bar(self)
+
+    @staticmethod
+    def warmup_bars(p):
+        # Bars before the line-based indicators all have values
+        return max(p.ema_slow, p.ema_fast, p.sma_medium, max(p.ema_fast, p.sma_medium) + 1)
+
+    @staticmethod
+    def entry_rule(p, bar):
+        """Fast EMA crossing above the medium SMA; stop at the signal bar's low"""
+        close = bar('close')
+        risk = close - bar('low')
+        return bar('crossover') > 0, close - risk, close + risk * p.risk_reward
+
+    exit_rule = staticmethod(_stop_take_exit)
+
+    @classmethod
+    def precompute(cls, df, **kwargs):
+        """Indicator columns equal to the line-based indicators, for precomputed=True"""
+        return cls.precompute_state(**kwargs).update(df)
+
+    @classmethod
+    def precompute_state(cls, **kwargs):
+        """precompute() for a history fed in consecutive chunks"""
+        p = _resolve_params(cls, kwargs)
+        return ChunkedIndicators({
+            'ema_slow': EMAChunkState(p.ema_slow),
+            'ema_fast': EMAChunkState(p.ema_fast),
+            'sma_medium': WindowChunkState(p.sma_medium),
+            'crossover': CrossOverChunkState(),
+        }, cls._precompute_chunk)
+
+    @staticmethod
+    def _precompute_chunk(states, df):
+        close = df['close'].to_numpy(dtype='float64')
+        ema_fast = states['ema_fast'].update(close)
+        sma_medium = states['sma_medium'].update(close)
+        return pd.DataFrame({
+            'ema_slow': states['ema_slow'].update(close),
+            'ema_fast': ema_fast,
+            'sma_medium': sma_medium,
+            'crossover': states['crossover'].update(ema_fast, sma_medium),
+        }, index=df.index)
 
     def next(self):
         if self.order:
             return  # Wait for pending order execution
+        # Precomputed lines exist from the first bar; wait as the indicators would
+        if len(self) < self.warmup:
+            return
         
-        # Trend direction check
-        in_uptrend = self.data.close > self.ema_slow
-        in_downtrend = self.data.close < self.ema_slow
-
         # Long entry condition
         if not self.position:
-            if self.crossover > 0:
+            entry, stop, take = self.entry_rule(self.p, self.bar)
+            if entry:
                 self.entry_price = self.data.close[0]
-                size = (self.broker.getvalue() * 0.85 )/ self.entry_price
-                risk = self.entry_price - self.data.low[0]
-                self.stop_price = self.entry_price - risk
-                self.take_price = self.entry_price + (risk * self.p.risk_reward)
+                size = (self.broker.getvalue() * self.position_fraction) / self.entry_price
+                self.stop_price = stop
+                self.take_price = take
                 self.order = self.buy(size=size)
                 
 
         # Exit conditions for long position
         elif self.position.size > 0:
-            if self.data.close[0] <= self.stop_price or self.data.close[0] >= self.take_price:
+            if self.exit_rule(self.p, self.bar, self.stop_price, self.take_price):
                 self.order = self.close()
                 
        
@@ -158,28 +344,47 @@ class EMACrossoverStrategy(bt.Strategy):
     def notify_order(self, order):
         if order.status in [order.Completed]:
             if order.isbuy():
-                self.log(f'LONG ENTRY: {order.executed.size:.2f} @ {order.executed.price:.2f}')
+                self.log('LONG ENTRY: %.2f @ %.2f', order.executed.size, order.executed.price)
             else:
-                self.log(f'POSITION CLOSED: PnL {order.executed.pnl:.2f}')
+                self.log('POSITION CLOSED: PnL %.2f', order.executed.pnl)
             self.order = None
             self.entry_price = None
 
-    def log(self, txt):
-        dt = self.datas[0].datetime.date(0).isoformat()
-        print(f'{dt}: {txt}')
-
 
-class EMAMACDStrategy(bt.Strategy):
+class EMAMACDStrategy(LoggingMixin, bt.Strategy):
     params = dict(
         ema_period=params['emamacd_ema_period'],
         macd_fast=params['emamacd_macd_fast'],
         macd_slow=params['emamacd_macd_slow'],
         macd_signal=params['emamacd_macd_signal'],
         risk_reward=params['emamacd_risk_reward'],
-        donchian_period=params['emamacd_donchian_period']
+        donchian_period=params['emamacd_donchian_period'],
+        precomputed=False
     )
+    param_prefix = 'emamacd_'
+
+    # Feed column -> indicator attribute, read from the data when precomputed=True
+    precomputed_lines = dict(ema='ema200', crossover='macd_crossover',
+                             donchian_low='donchian_low', donchian_high='donchian_high')
+    # Share of portfolio value put into a new position
+    position_fraction = 0.9
 
     def __init__(self):
+        self.warmup = 0
+
+        # Trade management variables
+        self.order = None
+        self.entry_price = None
+        self.stop_price = None
+        self.take_price = None
+
+        if self.p.precomputed:
+            for column, attr in self.precomputed_lines.items():
+                setattr(self, attr, getattr(self.data.lines, column))
+            self.warmup = self.warmup_bars(self.p)
+            self.bar = _strategy_bar(self)
+            return
+
         # Trend filter (200 EMA)
         self.ema200 = bt.indicators.EMA(self.data.close, period=self.p.ema_period)
         
@@ -198,45 +403,92 @@ class EMAMACDStrategy(bt.Strategy):
         self.donchian_low = bt.indicators.Lowest(self.data.low, period=self.p.donchian_period)
         self.donchian_high = bt.indicators.Highest(self.data.high, period=self.p.donchian_period)
         #self.donchian_cross = bt.indicators.CrossOver(self.data., self.donchian_low)
-        # Trade management variables
-        self.order = None
-        self.entry_price = None
-        self.stop_price = None
-        self.take_price = None
+        self.bar = _strategy_bar(self)
+
+    @staticmethod
+    def warmup_bars(p):
+        # Bars before the line-based indicators all have values
+        return max(p.ema_period, max(p.macd_fast, p.macd_slow) + p.macd_signal, p.donchian_period)
+
+    @staticmethod
+    def entry_rule(p, bar):
+        """MACD crossing above its signal line above the EMA; stop at the Donchian low.
+
+        take is the Donchian high at the signal bar; the position is closed
+        at the Donchian high of the exit bar.
+        """
+        close = bar('close')
+        entry = (close > bar('ema')) & (bar('crossover') > 0)
+        return entry, bar('donchian_low'), bar('donchian_high')
+
+    @staticmethod
+    def exit_rule(p, bar, stop, take):
+        close = bar('close')
+        return (close <= stop) | (close >= bar('donchian_high'))
+
+    @classmethod
+    def precompute(cls, df, **kwargs):
+        """Indicator columns equal to the line-based indicators, for precomputed=True"""
+        return cls.precompute_state(**kwargs).update(df)
+
+    @classmethod
+    def precompute_state(cls, **kwargs):
+        """precompute() for a history fed in consecutive chunks"""
+        p = _resolve_params(cls, kwargs)
+        return ChunkedIndicators({
+            'ema': EMAChunkState(p.ema_period),
+            'macd_fast': WindowChunkState(p.macd_fast),
+            'macd_slow': EMAChunkState(p.macd_slow),
+            'macd_signal': EMAChunkState(p.macd_signal),
+            'crossover': CrossOverChunkState(),
+            'donchian_low': WindowChunkState(p.donchian_period, 'min'),
+            'donchian_high': WindowChunkState(p.donchian_period, 'max'),
+        }, cls._precompute_chunk)
+
+    @staticmethod
+    def _precompute_chunk(states, df):
+        close = df['close'].to_numpy(dtype='float64')
+        # MACD line as difference between fast SMA and slow EMA
+        macd = states['macd_fast'].update(close) - states['macd_slow'].update(close)
+        return pd.DataFrame({
+            'ema': states['ema'].update(close),
+            'crossover': states['crossover'].update(macd, states['macd_signal'].update(macd)),
+            'donchian_low': states['donchian_low'].update(df['low'].to_numpy(dtype='float64')),
+            'donchian_high': states['donchian_high'].update(df['high'].to_numpy(dtype='float64')),
+        }, index=df.index)
 
     def next(self):
         if self.order:
             return  # Wait for pending order execution
+        # Precomputed lines exist from the first bar; wait as the indicators would
+        if len(self) < self.warmup:
+            return
         
         # Long entry condition
         if not self.position:
-            if self._buy_signal():
-                self._enter_long()
+            entry, stop, take = self.entry_rule(self.p, self.bar)
+            if entry:
+                self._enter_long(stop, take)
         
         # Exit conditions for long position
         else:
-            if self.data.close[0] <= self.stop_price or self.data.close[0] >= self.donchian_high[0]:
+            if self.exit_rule(self.p, self.bar, self.stop_price, self.take_price):
                 self._close_position()
 
-    def _buy_signal(self):
-        return (self.data.close[0] > self.ema200[0] and 
-                self.macd_crossover[0] > 0)
-
-    def _enter_long(self):
+    def _enter_long(self, stop, take):
         # Calculate position size using 100% equity
-        total_equity = self.broker.getvalue() * 0.9
+        total_equity = self.broker.getvalue() * self.position_fraction
         self.entry_price = self.data.close[0]
-        self.stop_price = self.donchian_low[0]
-        risk = self.entry_price - self.donchian_low[0]
-        self.take_price = self.entry_price + (risk*2)
+        self.stop_price = stop
+        self.take_price = take
         size = total_equity / self.entry_price
         self.order = self.buy(size=size)
-        self.log(f'LONG ENTRY: {size:.2f} shares @ {self.entry_price:.2f}')
+        self.log('LONG ENTRY: %.2f shares @ %.2f', size, self.entry_price)
 
 
     def _close_position(self):
         self.order = self.close()
-        self.log(f'EXIT: {self.position.size:.2f} shares @ {self.data.close[0]:.2f}')
+        self.log('EXIT: %.2f shares @ %.2f', self.position.size, self.data.close[0])
         self._reset_trade_vars()
 
     def _reset_trade_vars(self):
@@ -247,14 +499,12 @@ class EMAMACDStrategy(bt.Strategy):
     def notify_order(self, order):
         if order.status in [order.Completed]:
             if order.isbuy():
-                self.log(f'BUY EXECUTED: {order.executed.size:.2f} @ {order.executed.price:.2f}')
+                self.log('BUY EXECUTED: %.2f @ %.2f', order.executed.size, order.executed.price)
             elif order.issell():
-                pnl = order.executed.pnl
-                self.log(f'SELL EXECUTED: {order.executed.size:.2f} @ {order.executed.price:.2f} | PnL: ${pnl:.2f}')
+                self.log('SELL EXECUTED: %.2f @ %.2f | PnL: $%.2f', order.executed.size, order.executed.price,
+                         order.executed.pnl)
             self.order = None
 
-    def log(self, txt):
-        dt = self.datas[0].datetime.date(0).isoformat()
-        print(f'{dt}: {txt}')
-
 
+# Strategies with entry_rule() and exit_rule()
+STRATEGIES = (EMAVolMACDStrategy, EMACrossoverStrategy, EMAMACDStrategy)
@@ -0,0 +1,76 @@
+import numpy as np
+import backtrader as bt
+from bar_store import BAR_COLUMNS, PartitionedBarStore
+from precomputed_feed import PRECOMPUTED_LINES
+
+# Backtrader feed streaming bars from a PartitionedBarStore.
+#
+# Partitions are read lazily, one at a time, as Cerebro asks for the next
+# bar; only the current partition is held as plain column lists. With a
+# strategy class given, its precompute_state() turns each partition into
+# the precomputed indicator lines as it is loaded, carrying indicator state
+# across partition boundaries. Run Cerebro with preload=False (and
+# exactbars=1 to keep line buffers at the strategies' lookback) so memory
+# stays bounded by one partition whatever the length of the history.
+
+_ORIGIN = np.datetime64('0001-01-01', 'us')
+
+
+def date2num_array(index):
+    """Vectorized bt.date2num for a (naive) DatetimeIndex"""
+    micros = (index.values.astype('datetime64[us]') - _ORIGIN).astype('int64')
+    # bt date numbers count days from 0001-01-01 as day 1
+    return micros / 86400e6 + 1.0
+
+
+class PartitionedData(bt.feed.DataBase):
+    """One symbol of a PartitionedBarStore, plus precomputed indicator lines.
+
+    Pass the store root rather than a store instance, like MemmapData, so
+    the feed stays cheap to pickle. Indicator lines the strategy does not
+    produce stay NaN.
+    """
+    lines = PRECOMPUTED_LINES
+    params = (
+        ('root', None),
+        ('symbol', None),
+        ('bars', '1m'),  # store timeframe name; 'timeframe' is backtrader's own param
+        ('start', None),
+        ('end', None),
+        ('strategy', None),
+        ('strategy_kwargs', None),
+    )
+
+    def start(self):
+        super(PartitionedData, self).start()
+        store = PartitionedBarStore(self.p.root) if self.p.root else PartitionedBarStore()
+        self._chunks = store.iter_chunks(self.p.symbol, self.p.bars, columns=BAR_COLUMNS,
+                                         start=self.p.start, end=self.p.end)
+        self._state = None
+        if self.p.strategy is not None:
+            self._state = self.p.strategy.precompute_state(**(self.p.strategy_kwargs or {}))
+        self._columns = []
+        self._dtnums = []
+        self._idx = 0
+
+    def _next_chunk(self):
+        for df in self._chunks:
+            df = df.rename(columns=str.lower)
+            if self._state is not None:
+                df = df.join(self._state.update(df))
+            self._columns = [(getattr(self.lines, field), df[field].to_numpy(dtype='float64').tolist())
+                             for field in self.getlinealiases() if field in df.columns]
+            self._dtnums = date2num_array(df.index).tolist()
+            self._idx = 0
+            return True
+        return False
+
+    def _load(self):
+        if self._idx >= len(self._dtnums) and not self._next_chunk():
+            return False
+        idx = self._idx
+        self._idx += 1
+        for line, values in self._columns:
+            line[0] = values[idx]
+        self.lines.datetime[0] = self._dtnums[idx]
+        return True
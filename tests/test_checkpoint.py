@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+from checkpoint import MANIFEST, ShardedRun, bars_hash
+from downloader import generate_ohlcv
+
+CONFIG = {'strategy': 'EMAMACDStrategy', 'cash': 100000}
+
+
+def result(symbol, n_trades=2, error=None):
+    trades = pd.DataFrame({'trade_id': range(n_trades), 'pnlcomm': [10.0 * (i + 1) for i in range(n_trades)]})
+    return {'symbol': symbol, 'trades': None if error else trades, 'metrics': {'total_trades': n_trades},
+            'error': error, 'elapsed': 0.1}
+
+
+@pytest.mark.parametrize('torn', [b'{"symbol": "X", "sta', b'{"symbol": "X", "status": "done", '
+                                  b'"rows": 1, "bars_hash": "h", "error": null}'],
+                         ids=['partial-json', 'no-newline'])
+def test_resume_after_torn_manifest_line(torn, tmp_path):
+    root = str(tmp_path / 'shards')
+    bars = {symbol: generate_ohlcv(30, seed=i) for i, symbol in enumerate('ABCDX')}
+    digests = {symbol: bars_hash(df) for symbol, df in bars.items()}
+
+    run = ShardedRun(root, CONFIG)
+    run.record(result('A'), digests['A'])
+    run.record(result('B', n_trades=0), digests['B'])
+    # The process dies halfway through appending the next manifest line
+    with open(run.manifest_path, 'ab') as f:
+        f.write(torn)
+
+    run = ShardedRun(root, CONFIG, resume=True)
+    assert run.symbols() == ['A', 'B']
+    todo, _ = run.pending(bars)
+    assert sorted(todo) == ['C', 'D', 'X']
+    run.record(result('C', n_trades=3), digests['C'])
+    run.record(result('D', error='ValueError: boom'), digests['D'])
+
+    run = ShardedRun(root, CONFIG, resume=True)
+    assert run.symbols() == ['A', 'B', 'C', 'D']
+    assert run.symbols('done') == ['A', 'C']
+    assert run.entries['D']['status'] == 'failed'
+    with open(run.manifest_path, 'rb') as f:
+        assert torn not in f.read()
+    # The failed symbol and the one lost with the torn line run again
+    todo, _ = run.pending(bars)
+    assert sorted(todo) == ['D', 'X']
+    assert run.consolidate(str(tmp_path / 'trades.csv')) == 5
+
+
+def test_resume_with_other_config_is_refused(tmp_path):
+    root = str(tmp_path / 'shards')
+    ShardedRun(root, CONFIG).record(result('A'), 'h')
+    with pytest.raises(ValueError):
+        ShardedRun(root, {**CONFIG, 'cash': 1}, resume=True)
+    # A fresh run with the new config starts an empty manifest
+    run = ShardedRun(root, {**CONFIG, 'cash': 1})
+    assert run.symbols() == []
+    assert not (tmp_path / 'shards' / MANIFEST).exists()
@@ -0,0 +1,57 @@
+from downloader import BarProvider, download_symbols, generate_ohlcv
+
+
+class PartialProvider(BarProvider):
+    """Drops symbols from its results, as yf.download does for failed tickers"""
+    batch_size = 10
+
+    def __init__(self, flaky=(), dead=(), missing_is_error=True):
+        self.flaky = set(flaky)
+        self.dead = set(dead)
+        self.missing_is_error = missing_is_error
+        self.calls = []
+
+    def fetch(self, symbols, start, end=None, interval="1D"):
+        self.calls.append(list(symbols))
+        data = {}
+        for symbol in symbols:
+            if symbol in self.dead or symbol in self.flaky:
+                self.flaky.discard(symbol)
+                continue
+            data[symbol] = generate_ohlcv(10, start=start)
+        return data
+
+
+def test_missing_symbols_are_retried_alone():
+    provider = PartialProvider(flaky=['B'])
+    data, failures = download_symbols(provider, ['A', 'B', 'C'], '2024-01-01', backoff=0)
+    assert sorted(data) == ['A', 'B', 'C']
+    assert failures == {}
+    assert provider.calls == [['A', 'B', 'C'], ['B']]
+
+
+def test_symbols_missing_after_retries_are_failures():
+    provider = PartialProvider(dead=['B'])
+    data, failures = download_symbols(provider, ['A', 'B'], '2024-01-01', retries=2, backoff=0)
+    assert sorted(data) == ['A']
+    assert list(failures) == ['B']
+    assert provider.calls == [['A', 'B'], ['B'], ['B']]
+
+
+def test_missing_symbols_without_bars_are_not_failures():
+    provider = PartialProvider(dead=['B'], missing_is_error=False)
+    data, failures = download_symbols(provider, ['A', 'B'], '2024-01-01', backoff=0)
+    assert sorted(data) == ['A'] and failures == {}
+    assert len(provider.calls) == 1
+
+
+def test_raising_fetch_reports_every_symbol_of_the_batch():
+    class Failing(BarProvider):
+        batch_size = 5
+
+        def fetch(self, symbols, start, end=None, interval="1D"):
+            raise ConnectionError("offline")
+
+    data, failures = download_symbols(Failing(), ['A', 'B'], '2024-01-01', retries=1, backoff=0)
+    assert data == {}
+    assert failures == {'A': "ConnectionError: offline", 'B': "ConnectionError: offline"}
@@ -0,0 +1,12 @@
+import pytest
+import strategy_logic
+from downloader import generate_ohlcv
+from fast_simulator import compare_with_cerebro
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('strategy_cls', strategy_logic.STRATEGIES, ids=lambda cls: cls.__name__)
+def test_simulator_matches_cerebro(strategy_cls, seed):
+    df = generate_ohlcv(1260, seed=seed).rename(columns=str.lower)
+    ok, report = compare_with_cerebro(df, strategy_cls, symbol=f"SYN{seed}")
+    assert ok, report
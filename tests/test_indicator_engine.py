@@ -0,0 +1,89 @@
+import backtrader as bt
+import numpy as np
+import pytest
+import indicator_engine as ie
+from downloader import generate_ohlcv
+
+
+@pytest.fixture(scope='module')
+def bars():
+    return generate_ohlcv(300, seed=7)
+
+
+def assert_columns(values, expected):
+    assert values.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(values), np.isnan(expected))
+    np.testing.assert_allclose(values, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_ema_grid_matches_pandas(bars):
+    periods = [3, 12, 26, 50]
+    expected = np.column_stack([bars['Close'].ewm(span=p, adjust=False).mean() for p in periods])
+    assert_columns(ie.ema_grid(bars['Close'], periods), expected)
+
+
+def test_sma_grid_matches_pandas(bars):
+    periods = [1, 5, 20, 301]
+    expected = np.column_stack([bars['Close'].rolling(p).mean() for p in periods])
+    assert_columns(ie.sma_grid(bars['Close'], periods), expected)
+
+
+def test_donchian_grids_match_pandas(bars):
+    periods = [1, 2, 7, 20, 64]
+    low = np.column_stack([bars['Low'].rolling(p).min() for p in periods])
+    high = np.column_stack([bars['High'].rolling(p).max() for p in periods])
+    assert_columns(ie.donchian_low_grid(bars['Low'], periods), low)
+    assert_columns(ie.donchian_high_grid(bars['High'], periods), high)
+
+
+def test_macd_hist_grid_matches_pandas(bars):
+    combos = ie.macd_combos([8, 12], [26, 40], [9])
+    close = bars['Close']
+    expected = []
+    for fast, slow, signal in combos:
+        macd = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+        expected.append(macd - macd.ewm(span=signal, adjust=False).mean())
+    assert_columns(ie.macd_hist_grid(close, combos), np.column_stack(expected))
+
+
+def test_volume_osc_grid_matches_pandas(bars):
+    pairs = [(5, 20), (10, 50)]
+    volume = bars['Volume']
+    expected = [(volume.rolling(s).mean() - volume.rolling(l).mean()) / volume.rolling(l).mean() for s, l in pairs]
+    assert_columns(ie.volume_osc_grid(volume, pairs), np.column_stack(expected))
+
+
+class _Lines(bt.Strategy):
+    def __init__(self):
+        close = self.data.close
+        self.ind = {
+            'sma': bt.indicators.SMA(close, period=20),
+            'ema': bt.indicators.EMA(close, period=12),
+            'ema_of_sma': bt.indicators.EMA(bt.indicators.SMA(close, period=20), period=9),
+            'lowest': bt.indicators.Lowest(self.data.low, period=10),
+            'highest': bt.indicators.Highest(self.data.high, period=10),
+            'crossover': bt.indicators.CrossOver(bt.indicators.EMA(close, period=5),
+                                                 bt.indicators.EMA(close, period=20)),
+        }
+
+
+def test_bt_functions_match_backtrader(bars):
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=bars.rename(columns=str.lower), openinterest=-1))
+    cerebro.addstrategy(_Lines)
+    strat = cerebro.run()[0]
+    lines = {name: np.asarray(ind.array, dtype='float64')[:len(bars)] for name, ind in strat.ind.items()}
+
+    close = bars['Close'].to_numpy()
+    expected = {
+        'sma': ie.bt_sma(close, 20),
+        'ema': ie.bt_ema(close, 12),
+        'ema_of_sma': ie.bt_ema(ie.bt_sma(close, 20), 9),
+        'lowest': ie.bt_lowest(bars['Low'], 10),
+        'highest': ie.bt_highest(bars['High'], 10),
+        'crossover': ie.bt_crossover(ie.bt_ema(close, 5), ie.bt_ema(close, 20)),
+    }
+    for name, values in expected.items():
+        assert_columns(values, lines[name])
+    # The seeded series crosses, so the CrossOver comparison is not all zeros
+    assert np.nanmax(np.abs(lines['crossover'])) == 1.0
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+import calculate_indicators as ci
+from downloader import generate_ohlcv
+from indicator_state import IndicatorState, emavolmacd_state, emacrossover_state, emamacd_state
+
+BUILDERS = [
+    (emavolmacd_state, ci.calculate_indicators_emavolmacd),
+    (emacrossover_state, ci.calculate_indicatorsEMACrossOver),
+    (emamacd_state, ci.calculate_indicatorsEMAMACD),
+]
+
+
+def incremental(bars, state, cuts, path):
+    """Feed bars through state in chunks, saving and reloading it between chunks"""
+    parts = []
+    for start, stop in zip(cuts[:-1], cuts[1:]):
+        # Each refresh also hands over bars the state has already seen
+        parts.append(state.update(bars.iloc[max(start - 3, 0):stop]))
+        state.save(str(path))
+        state = IndicatorState.load(str(path))
+    return pd.concat(parts)
+
+
+def assert_frames_match(result, expected):
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_index_equal(result.index, expected.index)
+    for column in expected.columns:
+        values = result[column].to_numpy(dtype='float64')
+        full = expected[column].to_numpy(dtype='float64')
+        np.testing.assert_array_equal(np.isnan(values), np.isnan(full), err_msg=column)
+        np.testing.assert_allclose(values, full, rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+@pytest.mark.parametrize('build, calculate', BUILDERS, ids=lambda f: f.__name__)
+def test_chunked_updates_match_full_recompute(build, calculate, tmp_path):
+    bars = generate_ohlcv(400, seed=3)
+    cuts = [0, 1, 25, 26, 190, 400]
+    result = incremental(bars, build(), cuts, tmp_path / 'state.json')
+    assert_frames_match(result, calculate(bars.copy()))
+
+
+def test_update_without_new_bars_returns_empty_columns():
+    bars = generate_ohlcv(50, seed=4)
+    state = emacrossover_state()
+    state.update(bars)
+    result = state.update(bars)
+    assert result.empty
+    assert list(result.columns) == list(ci.calculate_indicatorsEMACrossOver(bars.copy()).columns)
+
+
+def test_volume_osc_with_zero_volume_matches_pandas(tmp_path):
+    bars = generate_ohlcv(200, seed=5)
+    # A run of zero-volume bars longer than the long window, so both means
+    # drop to exactly zero and the oscillator is 0 / 0
+    bars.iloc[60:110, bars.columns.get_loc('Volume')] = 0.0
+    cuts = [0, 70, 95, 200]
+    result = incremental(bars, emavolmacd_state(), cuts, tmp_path / 'state.json')
+    expected = ci.calculate_indicators_emavolmacd(bars.copy())
+    assert expected['Volume_Osc'].iloc[90:110].isna().all()
+    assert_frames_match(result, expected)
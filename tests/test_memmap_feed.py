@@ -0,0 +1,54 @@
+import json
+import os
+import numpy as np
+import pytest
+import memmap_feed
+from memmap_feed import MemmapBars, write_memmap_bars
+from downloader import generate_ohlcv
+
+
+def _data(seed, n=50):
+    return {s: generate_ohlcv(n + i, seed=seed + i).rename(columns=str.lower) for i, s in enumerate(['A', 'B'])}
+
+
+def test_round_trip(tmp_path):
+    data = _data(0)
+    write_memmap_bars(data, tmp_path)
+    bars = MemmapBars(tmp_path)
+    assert bars.symbols == ['A', 'B']
+    for symbol, df in data.items():
+        frame = bars.to_frame(symbol)
+        assert frame.index.equals(df.index)
+        assert np.array_equal(frame.to_numpy(), df[frame.columns].to_numpy())
+
+
+def test_rewrite_keeps_open_mappings_and_removes_old_arrays(tmp_path):
+    old, new = _data(0), _data(10, n=80)
+    write_memmap_bars(old, tmp_path)
+    reader = MemmapBars(tmp_path)
+    write_memmap_bars(new, tmp_path)
+
+    # A reader opened before the rewrite still sees the bars it mapped
+    assert np.array_equal(reader.get('A')['close'], old['A']['close'].to_numpy())
+    assert np.array_equal(MemmapBars(tmp_path).get('A')['close'], new['A']['close'].to_numpy())
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.npy')]) == len(memmap_feed.FIELDS)
+
+
+def test_interrupted_write_leaves_the_previous_bars_readable(tmp_path, monkeypatch):
+    old = _data(0)
+    write_memmap_bars(old, tmp_path)
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    # Arrays of the new write are complete, but the index is never replaced
+    monkeypatch.setattr(memmap_feed.json, 'dump', crash)
+    with pytest.raises(OSError):
+        write_memmap_bars(_data(10, n=80), tmp_path)
+    monkeypatch.undo()
+
+    bars = MemmapBars(tmp_path)
+    for symbol, df in old.items():
+        assert np.array_equal(bars.get(symbol)['close'], df['close'].to_numpy())
+    with open(tmp_path / "index.json") as f:
+        assert json.load(f)['symbols'] == bars.index
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from performance_metrics import METRIC_COLUMNS, batch_backtest_metrics, calculate_backtest_metrics
+
+
+def make_trades(n, seed, open_every=5):
+    """TradeLogger-style trades: random P&L, some trades still open, exits out of order"""
+    rng = np.random.default_rng(seed)
+    entry = pd.Timestamp('2021-01-04') + pd.to_timedelta(np.sort(rng.integers(0, 700, n)), unit='D')
+    exit_ = entry + pd.to_timedelta(rng.integers(0, 30, n), unit='D')
+    status = np.where(np.arange(n) % open_every == open_every - 1, 'open', 'closed')
+    pnl = rng.normal(50, 400, n).round(2)
+    trades = pd.DataFrame({
+        'entry_time': entry,
+        'exit_time': exit_,
+        'entry_price': rng.uniform(20, 200, n),
+        'exit_price': rng.uniform(20, 200, n),
+        'size': rng.integers(1, 100, n).astype('float64'),
+        'status': status,
+        'pnl': pnl,
+        'pnlcomm': pnl - 1.0,
+    })
+    trades['duration'] = np.where(status == 'closed', (exit_ - entry).total_seconds() / 86400, 0.0)
+    trades.loc[status == 'open', ['pnl', 'pnlcomm']] = 0.0
+    return trades
+
+
+def test_batch_matches_per_run_metrics():
+    runs = {
+        'a': make_trades(40, 0),
+        'b': make_trades(3, 1),
+        'c': make_trades(1, 2),                          # one trade: undefined Sharpe
+        'd': make_trades(6, 3).assign(pnlcomm=0.0),      # flat returns: Sharpe 0
+        'e': make_trades(4, 4, open_every=1),            # only open trades
+        'f': make_trades(25, 5),
+    }
+    # Runs interleaved in the table, each run's rows still in trade order
+    table = pd.concat([df.assign(run_id=key) for key, df in runs.items()], ignore_index=True)
+    slots = np.random.default_rng(9).permutation(len(table))
+    for rows in table.groupby('run_id').indices.values():
+        slots[rows] = np.sort(slots[rows])
+    table = table.iloc[np.argsort(slots)]
+    before = table.copy()
+
+    batch = batch_backtest_metrics(table, initial_capital=50000, minutes_per_bar=60)
+
+    pd.testing.assert_frame_equal(table, before)
+    assert list(batch.columns) == METRIC_COLUMNS
+    assert list(batch.index) == sorted(runs)
+    for key, trades in runs.items():
+        expected = calculate_backtest_metrics(trades.copy(), initial_capital=50000, minutes_per_bar=60)
+        row = batch.loc[key]
+        if 'Error' in expected:
+            assert row['total_trades'] == 0
+            assert row[METRIC_COLUMNS[1:]].isna().all()
+            continue
+        for column in METRIC_COLUMNS:
+            np.testing.assert_allclose(row[column], expected[column], rtol=1e-9, atol=1e-9,
+                                       equal_nan=True, err_msg=f"{key} {column}")
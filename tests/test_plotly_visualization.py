@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+from plotly_visualization import _downsample_line
+
+
+def test_downsampling_keeps_open_trades_as_nat():
+    x = pd.Series(pd.date_range('2020-01-01', periods=500, freq='D'))
+    x.iloc[[100, 499]] = pd.NaT
+    y = pd.Series(np.sin(np.arange(500) / 10.0))
+    out_x, out_y = _downsample_line(x, y, 50)
+
+    assert out_x.isna().sum() == 2
+    assert list(out_x.index[out_x.isna()]) == [100, 499]
+    assert out_x.dropna().min() >= pd.Timestamp('2020-01-01')
+    assert out_x.dropna().is_monotonic_increasing
+    assert len(out_x) == 52
+    assert out_y.index.equals(out_x.index)
+
+
+def test_short_series_are_returned_unchanged():
+    x = pd.Series(pd.to_datetime(['2020-01-01', None]))
+    out_x, out_y = _downsample_line(x, [1.0, 2.0], 10)
+    assert out_x.isna().tolist() == [False, True]
+    assert out_y.tolist() == [1.0, 2.0]
@@ -0,0 +1,55 @@
+import importlib
+import sys
+import textwrap
+import pytest
+import result_cache
+from downloader import generate_ohlcv
+
+RULE_MODULE = '''
+import strategy_logic
+
+
+def _exit(p, bar, stop, take):
+    close = bar('close')
+    return (close <= stop) | (close >= take)
+
+
+class RuleStrategy(strategy_logic.EMAVolMACDStrategy):
+    exit_rule = staticmethod(_exit)
+'''
+
+
+@pytest.fixture
+def rule_module(tmp_path, monkeypatch):
+    path = tmp_path / "rule_module.py"
+    path.write_text(textwrap.dedent(RULE_MODULE))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield path
+    sys.modules.pop("rule_module", None)
+
+
+def test_editing_a_module_level_rule_changes_the_key(rule_module):
+    df = generate_ohlcv(300, seed=1).rename(columns=str.lower)
+    module = importlib.import_module("rule_module")
+    before = result_cache.result_key("X", df, module.RuleStrategy)
+    assert result_cache.result_key("X", df, module.RuleStrategy) == before
+
+    # Move the stop: only the function outside the class body changes
+    rule_module.write_text(RULE_MODULE.replace("close <= stop", "close <= stop * 0.99"))
+    module = importlib.reload(module)
+    assert result_cache.result_key("X", df, module.RuleStrategy) != before
+
+
+def test_strategy_logic_module_is_hashed(monkeypatch):
+    import strategy_logic
+    cls = strategy_logic.EMAMACDStrategy
+    before = result_cache.strategy_digest(cls)
+    original = result_cache.inspect.getsource
+
+    def edited(obj):
+        source = original(obj)
+        return source + "\n# edited\n" if obj is strategy_logic else source
+
+    monkeypatch.setattr(result_cache, '_digests', {})
+    monkeypatch.setattr(result_cache.inspect, 'getsource', edited)
+    assert result_cache.strategy_digest(cls) != before
@@ -0,0 +1,61 @@
+import os
+import backtrader as bt
+import pandas as pd
+import pytest
+from downloader import generate_ohlcv
+from trade_logger import TradeLogger
+
+
+class _Churn(bt.Strategy):
+    """Opens a trade on each feed every few bars and holds it for a feed-specific time.
+
+    The long holds on the first feed overlap many short trades on the
+    second, so open trades are in memory whenever a chunk is spilled.
+    """
+    params = (('holds', (17, 3)),)
+
+    def __init__(self):
+        self.opened = {}
+
+    def next(self):
+        for data, hold in zip(self.datas, self.p.holds):
+            position = self.getposition(data)
+            if position.size and len(data) - self.opened[data] >= hold:
+                self.close(data=data)
+            elif not position.size and len(data) % 5 == 0:
+                self.buy(data=data, size=10)
+                self.opened[data] = len(data)
+
+
+def run_trades(**kwargs):
+    cerebro = bt.Cerebro(stdstats=False)
+    for seed in (0, 1):
+        df = generate_ohlcv(400, seed=seed).rename(columns=str.lower)
+        cerebro.adddata(bt.feeds.PandasData(dataname=df, openinterest=-1), name=f"SYN{seed}")
+    cerebro.addstrategy(_Churn)
+    cerebro.addanalyzer(TradeLogger, _name='trade_logger', **kwargs)
+    analyzer = cerebro.run()[0].analyzers.trade_logger
+    trades = analyzer.get_analysis()
+    # Trade refs count up across runs; keep them relative to the run's first trade
+    trades['trade_id'] -= trades['trade_id'].min()
+    return analyzer, trades
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 7])
+def test_spilled_trades_read_back_in_order(chunk_size, tmp_path):
+    _, expected = run_trades()
+    spill_dir = tmp_path / 'spill'
+    analyzer, trades = run_trades(spill_dir=str(spill_dir), chunk_size=chunk_size)
+
+    assert len(expected) > 4 * chunk_size
+    assert (expected['status'] == 'open').any()
+    # Rows came back from disk and the chunk files are gone
+    assert analyzer.spilled is not None and len(analyzer.spilled)
+    assert os.listdir(spill_dir) == []
+    # Trades are created in ref order, so the ids show the original order
+    assert trades['trade_id'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(trades, expected)
+    # A second call returns the same rows
+    again = analyzer.get_analysis()
+    again['trade_id'] -= again['trade_id'].min()
+    pd.testing.assert_frame_equal(again, expected)
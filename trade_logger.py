@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import backtrader as bt
+import pandas as pd
+
+# Trade fields and the numpy dtype each is stored as. exit_price is NaN while
+# a trade is open; duration is derived in get_analysis().
+TRADE_FIELDS = (
+    ('trade_id', 'int64'),
+    ('symbol', 'object'),
+    ('entry_time', 'datetime64[us]'),
+    ('exit_time', 'datetime64[us]'),
+    ('entry_price', 'float64'),
+    ('exit_price', 'float64'),
+    ('size', 'float64'),
+    ('status', 'object'),
+    ('pnl', 'float64'),
+    ('pnlcomm', 'float64'),
+)
+
+
+class TradeLogger(bt.Analyzer):
+    """One row per trade, kept in typed column arrays.
+
+    Rows are found through a trade_id -> row dict, so each notification is
+    O(1) however many trades the run produces. Arrays start at
+    initial_capacity rows and double when full. Times are day-precision, so
+    each day's converted timestamp is cached; day_precision=False keeps the
+    bar's full timestamp instead, for intraday bars.
+
+    With spill_dir set, once chunk_size rows are held every closed trade is
+    written to a parquet file in spill_dir and dropped from memory; open
+    trades stay. Each chunk keeps the rows' creation order in a seq column,
+    so get_analysis() reads the chunks back in trade order, then removes
+    them. A spill is attempted again only after another chunk_size rows.
+    """
+    params = (
+        ('initial_capacity', 256),
+        ('spill_dir', None),
+        ('chunk_size', 10000),
+        ('day_precision', True),
+    )
+
+    def __init__(self):
+        self.columns = {name: np.empty(self.p.initial_capacity, dtype=dtype) for name, dtype in TRADE_FIELDS}
+        self.rows = {}
+        self.seq = np.empty(self.p.initial_capacity, dtype='int64')
+        self.count = 0
+        self.created = 0
+        self.next_spill = self.p.chunk_size
+        self.chunks = []
+        self.spilled = None
+        self.spill_dir = None
+        self.dates = {}
+
+    def notify_trade(self, trade):
+        current_dt = self._convert_datetime(trade.data, trade.data.datetime[0])
+        trade_id = trade.ref or id(trade)
+
+        row = self.rows.get(trade_id)
+        if row is None:
+            self._create_trade(trade, trade_id, current_dt)
+        else:
+            self._update_trade(trade, row, current_dt)
+
+    def _create_trade(self, trade, trade_id, dt):
+        if self.count == len(self.columns['trade_id']):
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.rows[trade_id] = row
+        self.seq[row] = self.created
+        self.created += 1
+
+        c = self.columns
+        c['trade_id'][row] = trade_id
+        c['symbol'][row] = trade.data._name
+        c['entry_time'][row] = dt
+        c['exit_time'][row] = np.datetime64('NaT')
+        c['entry_price'][row] = trade.price
+        c['exit_price'][row] = np.nan
+        c['size'][row] = trade.size
+        c['status'][row] = 'open'
+        c['pnl'][row] = 0
+        c['pnlcomm'][row] = 0
+
+    def _update_trade(self, trade, row, dt):
+        c = self.columns
+        # Update exit information
+        is_closed = trade.isclosed
+        c['exit_time'][row] = self._convert_datetime(trade.data, trade.dtclose) if is_closed else dt
+        c['exit_price'][row] = trade.price if is_closed else np.nan
+        c['status'][row] = 'closed' if is_closed else 'open'
+        c['pnl'][row] = trade.pnl
+        c['pnlcomm'][row] = trade.pnlcomm
+
+        if is_closed and self.p.spill_dir is not None and self.count >= self.next_spill:
+            self._spill()
+
+    def _grow(self):
+        capacity = 2 * len(self.columns['trade_id'])
+        for name, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.count] = values[:self.count]
+            self.columns[name] = grown
+        grown = np.empty(capacity, dtype='int64')
+        grown[:self.count] = self.seq[:self.count]
+        self.seq = grown
+
+    def _spill(self):
+        # Every closed trade goes to disk; the open ones move to the front
+        closed = self.columns['status'][:self.count] == 'closed'
+        if closed.any():
+            if self.spill_dir is None:
+                os.makedirs(self.p.spill_dir, exist_ok=True)
+                self.spill_dir = tempfile.mkdtemp(prefix='trades-', dir=self.p.spill_dir)
+            path = os.path.join(self.spill_dir, f"chunk_{len(self.chunks):05d}.parquet")
+            frame = self._frame(0, self.count)[closed]
+            frame['seq'] = self.seq[:self.count][closed]
+            frame.to_parquet(path, index=False)
+            self.chunks.append(path)
+
+            keep = np.flatnonzero(~closed)
+            for values in self.columns.values():
+                values[:len(keep)] = values[keep]
+            self.seq[:len(keep)] = self.seq[keep]
+            self.count = len(keep)
+            self.rows = {trade_id: row for row, trade_id in enumerate(self.columns['trade_id'][:self.count].tolist())}
+        # Open trades alone can fill a chunk; wait for another chunk_size rows
+        self.next_spill = self.count + self.p.chunk_size
+
+    def _frame(self, start, stop):
+        # Object columns go in as lists so pandas picks the dtype it would for a list of dicts
+        frame = pd.DataFrame({name: values[start:stop].tolist() if values.dtype == object else values[start:stop]
+                              for name, values in self.columns.items()})
+        # Duration of closed trades in days, 0 while open or when a time is missing
+        duration = (frame['exit_time'] - frame['entry_time']).dt.total_seconds() / (3600 * 24)
+        frame['duration'] = duration.where(frame['status'] == 'closed', 0).fillna(0)
+        return frame
+
+    def _convert_datetime(self, data, dt):
+        if not self.p.day_precision:
+            try:
+                return np.datetime64(data.num2date(dt).replace(tzinfo=None), 'us')
+            except:
+                return np.datetime64('NaT')
+        try:
+            key = (id(data), int(dt))
+        except:
+            return np.datetime64('NaT')
+        converted = self.dates.get(key)
+        if converted is None:
+            try:
+                converted = np.datetime64(data.num2date(key[1]).replace(tzinfo=None), 'us')
+            except:
+                converted = np.datetime64('NaT')
+            self.dates[key] = converted
+        return converted
+
+    def _read_spilled(self):
+        # Chunks are read back once and their directory removed
+        if self.chunks:
+            frames = [pd.read_parquet(path) for path in self.chunks]
+            if self.spilled is not None:
+                frames.insert(0, self.spilled)
+            self.spilled = pd.concat(frames, ignore_index=True)
+            self.chunks = []
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+        return self.spilled
+
+    def get_analysis(self):
+        spilled = self._read_spilled()
+        if spilled is None:
+            return self._frame(0, self.count) if self.count else pd.DataFrame()
+        frames = [spilled]
+        if self.count:
+            frame = self._frame(0, self.count)
+            frame['seq'] = self.seq[:self.count]
+            frames.append(frame)
+        trades = pd.concat(frames, ignore_index=True) if len(frames) > 1 else spilled
+        return trades.sort_values('seq', kind='stable', ignore_index=True).drop(columns='seq')
@@ -0,0 +1,246 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import strategy_logic
+import strategy_logging
+from performance_metrics import calculate_backtest_metrics
+from backtest_runner import BROKER_SETTINGS, run_backtest
+from fast_simulator import simulate
+from optimizer import param_grid, load_store_bars
+
+# Walk-forward optimization.
+#
+# Each symbol's bars are cut into windows: a training slice followed by an
+# out-of-sample (OOS) slice. The params-dict ranges are swept on the training
+# slice, the best combination is run on the OOS slice, and the OOS trades of
+# every window are stitched into one trade list that goes through
+# calculate_backtest_metrics. Rolling windows move the training slice forward
+# by test_bars; anchored windows keep it starting at the first bar.
+#
+# Indicators are causal, so each (symbol, combination) is precomputed once
+# over the full history and every window reads a slice of it. Slices start
+# warmup_bars() - 1 bars early so the strategy's first bar that can trade is
+# the first bar of the slice proper. An OOS slice is simulated up to the bar
+# after its window, so a signal on the window's last bar still fills, and a
+# trade still open there is closed at that bar's close. Windows therefore
+# never hold overlapping positions, and each window only simulates its own
+# bars.
+
+_worker_data = {}
+_indicator_cache = OrderedDict()
+INDICATOR_CACHE_SIZE = 256
+
+
+def walk_forward_windows(n_bars, train_bars, test_bars, anchored=False):
+    """(train_start, test_start, test_end) bar positions; the last test slice may be short"""
+    windows = []
+    test_start = train_bars
+    while test_start < n_bars:
+        train_start = 0 if anchored else test_start - train_bars
+        windows.append((train_start, test_start, min(test_start + test_bars, n_bars)))
+        test_start += test_bars
+    return windows
+
+
+def _init_worker(data):
+    _worker_data.update(data)
+
+
+def _indicators(strategy_cls, symbol, kwargs):
+    # precompute() over the symbol's whole history, kept in a small per-process LRU
+    key = (strategy_cls.__name__, symbol, tuple(sorted(kwargs.items())))
+    if key in _indicator_cache:
+        _indicator_cache.move_to_end(key)
+        return _indicator_cache[key]
+    indicators = strategy_cls.precompute(_worker_data[symbol], **kwargs)
+    _indicator_cache[key] = indicators
+    if len(_indicator_cache) > INDICATOR_CACHE_SIZE:
+        _indicator_cache.popitem(last=False)
+    return indicators
+
+
+def _run_slice(strategy_cls, symbol, start, end, kwargs, engine, broker_settings):
+    """Trades for signals on bars [start, end) of the symbol, from cached indicators"""
+    df = _worker_data[symbol]
+    lead = strategy_cls.warmup_bars(strategy_logic._resolve_params(strategy_cls, kwargs)) - 1
+    frame = df.iloc[max(start - lead, 0):end]
+    indicators = _indicators(strategy_cls, symbol, kwargs)
+    if engine == 'fast':
+        return simulate(frame, strategy_cls, symbol=symbol, cash=broker_settings['cash'],
+                        commission=broker_settings['commission'], indicators=indicators, **kwargs)
+    with strategy_logging.disabled():
+        return run_backtest(symbol, frame, strategy=strategy_cls, strategy_kwargs=kwargs,
+                            broker_settings=broker_settings, indicators=indicators)
+
+
+def _score(trades, metric, min_trades, initial_capital):
+    if trades.empty:
+        return np.nan
+    metrics = calculate_backtest_metrics(trades, initial_capital=initial_capital)
+    if 'Error' in metrics or metrics['total_trades'] < min_trades:
+        return np.nan
+    value = metrics[metric]
+    return value if np.isfinite(value) else np.nan
+
+
+def _window_task(strategy_cls, symbol, window, ranges, engine, metric, min_trades, broker_settings):
+    train_start, test_start, test_end = window
+    df = _worker_data[symbol]
+    best, best_score = None, np.nan
+    for overrides in param_grid(ranges):
+        kwargs = strategy_logic.strategy_kwargs(strategy_cls, overrides)
+        trades = _run_slice(strategy_cls, symbol, train_start, test_start, kwargs, engine, broker_settings)
+        score = _score(trades, metric, min_trades, broker_settings['cash'])
+        if not np.isnan(score) and (best is None or score > best_score):
+            best, best_score = overrides, score
+
+    row = {
+        'symbol': symbol,
+        'train_start': df.index[train_start],
+        'test_start': df.index[test_start],
+        'test_end': df.index[test_end - 1],
+        **{k: (best or {}).get(k) for k in ranges},
+        f'train_{metric}': best_score,
+    }
+    if best is None:
+        # No combination traded enough in sample; the window sits out
+        row['oos_trades'] = 0
+        return row, None
+
+    kwargs = strategy_logic.strategy_kwargs(strategy_cls, best)
+    end = min(test_end + 1, len(df))
+    trades = _run_slice(strategy_cls, symbol, test_start, end, kwargs, engine, broker_settings)
+    if trades.empty:
+        row['oos_trades'] = 0
+        return row, trades
+    # Signals on bars [test_start, test_end) fill on the following bar
+    days = df.index.normalize()
+    entry = pd.to_datetime(trades['entry_time'])
+    trades = trades[entry > days[test_start]].copy()
+    if test_end < len(df):
+        trades = _close_open_trades(trades, days[test_end], df['close'].iloc[test_end],
+                                    broker_settings['commission'])
+    row['oos_trades'] = len(trades)
+    return row, trades
+
+
+def _close_open_trades(trades, day, price, commission):
+    # Close trades still open at the window's end at that bar's close, with
+    # TradeLogger's conventions (exit_price repeats the entry price)
+    trades = trades.reset_index(drop=True)
+    # A slice with only open trades can carry integer or object columns
+    trades = trades.astype({'pnl': 'float64', 'pnlcomm': 'float64', 'exit_price': 'float64',
+                            'duration': 'float64'})
+    trades['exit_time'] = pd.to_datetime(trades['exit_time'])
+    still_open = trades['status'] == 'open'
+    if not still_open.any():
+        return trades
+    size = trades.loc[still_open, 'size'].astype('float64')
+    entry_price = trades.loc[still_open, 'entry_price'].astype('float64')
+    pnl = size * (price - entry_price)
+    trades.loc[still_open, 'pnl'] = pnl
+    trades.loc[still_open, 'pnlcomm'] = pnl - size.abs() * (entry_price + price) * commission
+    trades.loc[still_open, 'exit_time'] = day
+    trades.loc[still_open, 'exit_price'] = entry_price
+    trades.loc[still_open, 'status'] = 'closed'
+    duration = (day - pd.to_datetime(trades.loc[still_open, 'entry_time'])).dt.total_seconds() / (3600 * 24)
+    trades.loc[still_open, 'duration'] = duration
+    return trades
+
+
+def walk_forward(strategy_cls, ranges, data=None, train_bars=756, test_bars=126, anchored=False,
+                 engine='fast', metric='sharpe_ratio', min_trades=3, max_workers=None,
+                 broker_settings=BROKER_SETTINGS, store_root=None):
+    """Walk-forward optimize ranges (params-dict keys) over each symbol.
+
+    data is {symbol: lowercase OHLCV frame}, read from the bar store when
+    omitted. Windows run in parallel. Returns {symbol: result} where result
+    holds 'windows' (chosen params and in-sample score per window), 'trades'
+    (the stitched OOS trades) and 'metrics' (calculate_backtest_metrics of
+    those trades).
+    """
+    if data is None:
+        data = load_store_bars(store_root)
+    # Fail on bad keys before any worker starts
+    strategy_logic.strategy_kwargs(strategy_cls, dict.fromkeys(ranges))
+    tasks = [(symbol, window) for symbol, df in data.items()
+             for window in walk_forward_windows(len(df), train_bars, test_bars, anchored)]
+
+    outputs = {}
+    args = (ranges, engine, metric, min_trades, broker_settings)
+    if max_workers == 1:
+        _init_worker(data)
+        for symbol, window in tasks:
+            outputs[(symbol, window)] = _window_task(strategy_cls, symbol, window, *args)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(data,)) as executor:
+            futures = {executor.submit(_window_task, strategy_cls, symbol, window, *args): (symbol, window)
+                       for symbol, window in tasks}
+            for future in as_completed(futures):
+                outputs[futures[future]] = future.result()
+
+    results = {}
+    for symbol in data:
+        rows, oos = [], []
+        for (s, window), (row, trades) in sorted(outputs.items(), key=lambda item: item[0][1]):
+            if s != symbol:
+                continue
+            rows.append(row)
+            if trades is not None and not trades.empty:
+                oos.append(trades.assign(window=len(rows) - 1))
+        trades = pd.concat(oos, ignore_index=True) if oos else pd.DataFrame()
+        if not trades.empty:
+            trades = trades.sort_values('entry_time', kind='stable', ignore_index=True)
+            trades['trade_id'] = np.arange(1, len(trades) + 1)
+            metrics = calculate_backtest_metrics(trades, initial_capital=broker_settings['cash'])
+        else:
+            metrics = {"Error": "No out-of-sample trades"}
+        results[symbol] = {'windows': pd.DataFrame(rows), 'trades': trades, 'metrics': metrics}
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    from calculate_indicators import params
+
+    parser = argparse.ArgumentParser(description="Walk-forward optimize params-dict keys over the stored symbols")
+    parser.add_argument('--strategy', default='EMAMACDStrategy', help="class name in strategy_logic")
+    parser.add_argument('--range', action='append', default=[], metavar='KEY=V1,V2,...',
+                        help="values to try for one params key, e.g. emamacd_macd_fast=8,12,16")
+    parser.add_argument('--train-bars', type=int, default=756)
+    parser.add_argument('--test-bars', type=int, default=126)
+    parser.add_argument('--anchored', action='store_true', help="grow the training slice from the first bar")
+    parser.add_argument('--engine', choices=['cerebro', 'fast'], default='fast')
+    parser.add_argument('--metric', default='sharpe_ratio', help="in-sample score to maximize")
+    parser.add_argument('--min-trades', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default="walk_forward_trades.csv")
+    args = parser.parse_args()
+
+    ranges = {}
+    for item in args.range:
+        key, values = item.split('=', 1)
+        ranges[key] = [type(params[key])(v) for v in values.split(',')]
+
+    strategy_cls = getattr(strategy_logic, args.strategy)
+    results = walk_forward(strategy_cls, ranges, train_bars=args.train_bars, test_bars=args.test_bars,
+                           anchored=args.anchored, engine=args.engine, metric=args.metric,
+                           min_trades=args.min_trades, max_workers=args.workers)
+
+    all_trades = []
+    for symbol, result in results.items():
+        print(f"\n{symbol}")
+        print(result['windows'].to_string(index=False))
+        metrics = result['metrics']
+        if 'Error' in metrics:
+            print(f"  {metrics['Error']}")
+            continue
+        for k, v in metrics.items():
+            print(f"  {k}: {v}")
+        all_trades.append(result['trades'])
+    if all_trades:
+        pd.concat(all_trades, ignore_index=True).to_csv(args.out, index=False)
+        print(f"\nOut-of-sample trades written to {args.out}")